@@ -1,51 +1,50 @@
-from asgiref.sync import sync_to_async
 from django.contrib import admin
 from django.utils.html import format_html
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
 from django.urls import reverse, path
+from django.core.handlers.asgi import ASGIRequest
 from django.template.response import TemplateResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.shortcuts import redirect
 import asyncio
-from .models import TelegramUser, Statistics, UserActivity
-from .services.status_checker import StatusChecker
-from .services.message_sender import MessageSender
-from .forms import MessageForm
+import json
 import os
+import tempfile
+import time
+from .models import TelegramUser, Statistics, UserActivity, UserActivityArchive, BroadcastJob
+from .services.status_checker import StatusChecker
+from .services.telegram_transport import closing_transport
+from .services.broadcast_queue import enqueue_broadcast, job_progress, progress_task_id
+from .services.progress import ProgressTracker, aget_progress, get_progress, new_task_id, run_in_background
+from .services.json_stream import users_reader
+from .services.user_importer import UserImporter
+from .forms import ImportUsersForm, MessageForm
+from .paginators import EstimatedCountPaginator, KeysetChangeList
 
 @admin.action(description="Перевірити статус вибраних користувачів")
 def check_users_status(modeladmin, request, queryset):
-    """Масова перевірка статусу користувачів"""
-    async def async_check():
-        try:
-            checker = StatusChecker()
-            users_count = await sync_to_async(queryset.count)()
-            
-            await sync_to_async(messages.info)(
-                request, 
-                f'Починаємо перевірку {users_count} користувачів. '
-                f'Це займе приблизно {(users_count / 30):.1f} секунд'
-            )
-
-            users_list = await sync_to_async(list)(queryset)
-            results = await checker.check_users_status(users_list)
+    """Масова перевірка статусу у фоновому потоці; прогрес - на окремій сторінці"""
+    users_count = queryset.count()
+    tracker = ProgressTracker(
+        new_task_id('status'), 'status', f'Перевірка статусу {users_count} користувачів', users_count
+    )
 
-            message = (
-                f"Перевірено {results['checked']} користувачів:\n"
-                f"Активні боти: {results['active_bot']}\n"
-                f"Неактивні боти: {results['inactive_bot']}\n"
-                f"У чаті: {results['in_chat']}\n"
-                f"Не в чаті: {results['not_in_chat']}"
-            )
-            await sync_to_async(messages.success)(request, message)
-            
-        except Exception as e:
-            await sync_to_async(messages.error)(
-                request, 
-                f"Помилка при перевірці: {str(e)}"
-            )
+    def check():
+        checker = StatusChecker()
+        # QuerySet читається потоком, без list(queryset)
+        results = asyncio.run(closing_transport(
+            checker.check_users_status(queryset, progress_callback=tracker.update)
+        ))
+        return (
+            f"Перевірено {results['checked']} користувачів: "
+            f"активні боти {results['active_bot']}, неактивні боти {results['inactive_bot']}, "
+            f"у чаті {results['in_chat']}, не в чаті {results['not_in_chat']}"
+        )
 
-    asyncio.run(async_check())
+    run_in_background(tracker, check)
+    messages.info(request, f'Перевірку {users_count} користувачів запущено у фоні')
+    return redirect('admin:task_progress', task_id=tracker.task_id)
 
 @admin.action(description="Відправити повідомлення вибраним користувачам")
 def send_message_to_users(modeladmin, request, queryset):
@@ -66,9 +65,9 @@ class HasReferralsFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         if self.value() == 'yes':
-            return queryset.annotate(refs_count=Count('referrals')).filter(refs_count__gt=0)
+            return queryset.filter(referrals_count__gt=0)
         if self.value() == 'no':
-            return queryset.annotate(refs_count=Count('referrals')).filter(refs_count=0)
+            return queryset.filter(referrals_count=0)
 
 class UserStatusFilter(admin.SimpleListFilter):
     title = 'Статус користувача'
@@ -83,15 +82,20 @@ class UserStatusFilter(admin.SimpleListFilter):
             ('never_checked', 'Ніколи не перевірявся'),
         )
 
+    # (is_active, in_chat) для кожного статусу
+    STATUSES = {
+        'active_in_chat': (True, True),
+        'active_no_chat': (True, False),
+        'inactive_in_chat': (False, True),
+        'inactive_no_chat': (False, False),
+    }
+
     def queryset(self, request, queryset):
-        if self.value() == 'active_in_chat':
-            return queryset.filter(is_active=True, in_chat=True)
-        if self.value() == 'active_no_chat':
-            return queryset.filter(is_active=True, in_chat=False)
-        if self.value() == 'inactive_in_chat':
-            return queryset.filter(is_active=False, in_chat=True)
-        if self.value() == 'inactive_no_chat':
-            return queryset.filter(is_active=False, in_chat=False)
+        if self.value() in self.STATUSES:
+            is_active, in_chat = self.STATUSES[self.value()]
+            # __in, а не =True: SQLite пише булеве поле без "= 1" і тоді
+            # не використовує індекс tguser_status_join_idx
+            return queryset.filter(is_active__in=[is_active], in_chat__in=[in_chat])
         if self.value() == 'never_checked':
             return queryset.filter(last_status_check__isnull=True)
 
@@ -122,50 +126,30 @@ class TelegramUserAdmin(admin.ModelAdmin):
                    'chat_status', 'last_check_display', 'join_date')
     list_filter = (UserStatusFilter, HasReferralsFilter, ReferralFilter, 
                   'language', 'in_chat', 'is_active')
+    list_select_related = ('referred_by',)
     search_fields = ('user_id', 'username', 'referral_code')
+    readonly_fields = ('referrals_count',)
     ordering = ('-join_date',)
     actions = [check_users_status, send_message_to_users]
-
-    def get_ordering(self, request):
-        params = request.GET.copy()
-        ordering = params.get('o', '')
-        
-        try:
-            ordering = str(ordering)
-            desc = ordering.startswith('-')
-            if desc:
-                ordering = ordering[1:]
-            
-            ordering_fields = {
-                '0': 'user_id',
-                '1': 'username',
-                '2': 'language',
-                '3': 'referrals_count',
-                '4': 'referred_by__username',
-                '5': 'is_active',
-                '6': 'in_chat',
-                '7': 'last_status_check',
-                '8': 'join_date'
-            }
-            
-            field = ordering_fields.get(ordering, 'join_date')
-            if desc:
-                field = f'-{field}'
-                
-            return [field]
-            
-        except (ValueError, KeyError):
-            return ['-join_date']
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.annotate(referrals_count=Count('referrals'))
-        ordering = request.GET.get('o', '')
-        
-        if ordering in ['3', '-3', '4', '-4']:
-            queryset = queryset.select_related('referred_by')
-        
-        return queryset
+    # Мільйон+ рядків: оцінка кількості і курсор «далі» замість OFFSET
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """Пошук по індексах: user_id - точний збіг, username - префікс, referral_code - точний"""
+        term = search_term.strip().lstrip('@')
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(user_id=int(term)), False
+        # UNION замість OR: кожна половина йде своїм індексом
+        matches = queryset.order_by().filter(username__istartswith=term).values('pk').union(
+            queryset.order_by().filter(referral_code=term).values('pk')
+        )
+        return queryset.filter(pk__in=matches), False
 
     def get_urls(self):
         urls = super().get_urls()
@@ -185,6 +169,21 @@ class TelegramUserAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.send_message_view),
                 name='send_message'
             ),
+            path(
+                'progress/<str:task_id>/',
+                self.admin_site.admin_view(self.progress_view),
+                name='task_progress'
+            ),
+            path(
+                'progress/<str:task_id>/json/',
+                self.admin_site.admin_view(self.progress_json_view),
+                name='task_progress_json'
+            ),
+            path(
+                'progress/<str:task_id>/stream/',
+                self.admin_site.admin_view(self.progress_stream_view),
+                name='task_progress_stream'
+            ),
         ]
         return my_urls + urls
 
@@ -200,7 +199,7 @@ class TelegramUserAdmin(admin.ModelAdmin):
     username_display.short_description = 'Username'
 
     def referrals_display(self, obj):
-        count = obj.referrals_count if hasattr(obj, 'referrals_count') else obj.referrals.count()
+        count = obj.referrals_count
         if count > 0:
             url = f"?referred_by={obj.user_id}"
             return format_html(
@@ -280,17 +279,15 @@ class TelegramUserAdmin(admin.ModelAdmin):
                             }]]
                         }
 
-                sender = MessageSender()
-                results = asyncio.run(
-                    sender.send_bulk_message(list(users), text, photo_url, buttons)
-                )
+                # Відправку виконує воркер run_broadcast_worker
+                job = enqueue_broadcast(users, text, photo_url, buttons)
                 
                 self.message_user(
                     request,
-                    f'Повідомлення відправлено: {results["sent"]} успішно, '
-                    f'{results["failed"]} помилок, {results["inactive"]} неактивних користувачів'
+                    f'Розсилку #{job.pk} поставлено в чергу: {job.total - job.inactive} отримувачів, '
+                    f'{job.inactive} неактивних користувачів'
                 )
-                return redirect('..')
+                return redirect('admin:task_progress', task_id=progress_task_id(job.pk))
         else:
             form = MessageForm()
 
@@ -308,41 +305,137 @@ class TelegramUserAdmin(admin.ModelAdmin):
             context
         )
 
+    # Скільки триває одне SSE-з'єднання; далі браузер перепідключається сам
+    PROGRESS_STREAM_SECONDS = 60
+
+    def get_progress_state(self, task_id):
+        state = get_progress(task_id)
+        kind, _, pk = task_id.partition('-')
+        if state is None and kind == 'broadcast' and pk.isdigit():
+            # Воркер в іншому процесі без спільного кешу - лічильники з бази
+            job = BroadcastJob.objects.filter(pk=pk).first()
+            if job:
+                state = job_progress(job)
+        return state
+
+    async def aget_progress_state(self, task_id):
+        state = await aget_progress(task_id)
+        kind, _, pk = task_id.partition('-')
+        if state is None and kind == 'broadcast' and pk.isdigit():
+            job = await BroadcastJob.objects.filter(pk=pk).afirst()
+            if job:
+                state = job_progress(job)
+        return state
+
+    def progress_view(self, request, task_id):
+        state = self.get_progress_state(task_id)
+        if state is None:
+            raise Http404('Операцію не знайдено')
+        context = {
+            'title': state['title'] or 'Прогрес операції',
+            'state': state,
+            'json_url': reverse('admin:task_progress_json', args=[task_id]),
+            'stream_url': reverse('admin:task_progress_stream', args=[task_id]),
+            'opts': self.model._meta,
+        }
+        return TemplateResponse(request, 'admin/dashboard/progress.html', context)
+
+    def progress_json_view(self, request, task_id):
+        state = self.get_progress_state(task_id)
+        if state is None:
+            raise Http404('Операцію не знайдено')
+        return JsonResponse(state)
+
+    def progress_stream_view(self, request, task_id):
+        """Server-sent events: новий стан щойно він змінився в кеші.
+
+        Під ASGI - асинхронний генератор: відкритий потік не тримає потік
+        воркера, поки чекає наступного опитування. Під WSGI Django 5.0
+        дочитує асинхронний ітератор до кінця, перш ніж щось віддати, тому
+        там звичайний генератор.
+        """
+        deadline = time.monotonic() + self.PROGRESS_STREAM_SECONDS
+
+        def events():
+            last = None
+            while time.monotonic() < deadline:
+                state = self.get_progress_state(task_id)
+                if state != last:
+                    yield f'data: {json.dumps(state)}\n\n'
+                    last = state
+                if state is None or state['status'] != 'running':
+                    return
+                time.sleep(1)
+
+        async def aevents():
+            last = None
+            while time.monotonic() < deadline:
+                state = await self.aget_progress_state(task_id)
+                if state != last:
+                    yield f'data: {json.dumps(state)}\n\n'
+                    last = state
+                if state is None or state['status'] != 'running':
+                    return
+                await asyncio.sleep(1)
+
+        stream = aevents() if isinstance(request, ASGIRequest) else events()
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Nginx не повинен буферизувати потік
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
     def import_users_view(self, request):
         if request.method == 'POST':
-            try:
-                json_path = r'C:\1\drophelper-bot\data\users.json'
-                if not os.path.exists(json_path):
-                    raise FileNotFoundError(f"File not found: {json_path}")
-                
-                from django.core.management import call_command
-                call_command('import_users', json_path)
-                
-                self.message_user(
-                    request,
-                    'Users successfully imported from users.json',
-                    messages.SUCCESS
-                )
-            except Exception as e:
-                self.message_user(
-                    request,
-                    f'Error importing users: {str(e)}',
-                    messages.ERROR
+            form = ImportUsersForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['users_file']
+                # Файл запиту Django видаляє після відповіді - копія для фонового імпорту
+                with tempfile.NamedTemporaryFile(prefix='import-users-', delete=False) as copy:
+                    for chunk in upload.chunks():
+                        copy.write(chunk)
+                tracker = ProgressTracker(new_task_id('import'), 'import', f'Імпорт користувачів з {upload.name}')
+                errors = []
+                importer = UserImporter(
+                    referral_code=(
+                        (lambda user_id, data: f"REF{user_id}")
+                        if form.cleaned_data['generate_referral_codes'] else None
+                    ),
+                    on_error=lambda user_id, e: errors.append(f'{user_id}: {e}'),
+                    on_chunk=lambda results: tracker.update(
+                        results['created'] + results['updated'], counts=results
+                    ),
                 )
-        return redirect('admin:dashboard_telegramuser_changelist')
+
+                def run_import():
+                    try:
+                        # Читаємо потоково; пачки комітяться одна за одною
+                        with open(copy.name, 'rb') as file:
+                            results = importer.run(users_reader(file, upload.name).users())
+                    finally:
+                        os.unlink(copy.name)
+                    message = (
+                        f'Imported {results["created"]} new users, updated {results["updated"]}, '
+                        f'linked {results["referrals"]} referrals'
+                    )
+                    if errors:
+                        message += f'. {len(errors)} errors: ' + '; '.join(errors[:20])
+                    return message
+
+                run_in_background(tracker, run_import)
+                self.message_user(request, f'Імпорт {upload.name} запущено у фоні')
+                return redirect('admin:task_progress', task_id=tracker.task_id)
+        else:
+            form = ImportUsersForm()
+
+        context = {
+            'title': 'Import users',
+            'form': form,
+            'opts': self.model._meta,
+        }
+        return TemplateResponse(request, 'admin/dashboard/import_users.html', context)
 
     def referral_stats_view(self, request):
-        total_users = TelegramUser.objects.count()
-        users_with_refs = TelegramUser.objects.annotate(
-            refs_count=Count('referrals')
-        ).filter(refs_count__gt=0)
-       
-        total_referrals = sum(user.refs_count for user in users_with_refs)
-       
-        top_referrers = users_with_refs.order_by('-refs_count')[:20]
-        for user in top_referrers:
-            user.refs_count = user.referrals.count()
-       
         ranges = [
             {'min': 0, 'max': 0, 'name': 'Без рефералів'},
             {'min': 1, 'max': 2, 'name': '1-2 реферали'},
@@ -351,20 +444,31 @@ class TelegramUserAdmin(admin.ModelAdmin):
             {'min': 11, 'max': None, 'name': '11+ рефералів'}
         ]
 
+        # Гістограма та підсумки одним проходом по індексованому referrals_count
+        buckets = {}
+        for i, r in enumerate(ranges):
+            condition = Q(referrals_count__gte=r['min'])
+            if r['max'] is not None:
+                condition &= Q(referrals_count__lte=r['max'])
+            buckets[f'range_{i}'] = Count('id', filter=condition)
+
+        stats = TelegramUser.objects.aggregate(
+            total_users=Count('id'),
+            users_with_referrals=Count('id', filter=Q(referrals_count__gt=0)),
+            total_referrals=Sum('referrals_count'),
+            **buckets
+        )
+        total_users = stats['total_users']
+        users_with_refs = stats['users_with_referrals']
+        total_referrals = stats['total_referrals'] or 0
+
+        top_referrers = TelegramUser.objects.filter(
+            referrals_count__gt=0
+        ).order_by('-referrals_count')[:20]
+
         referral_ranges = []
-        for r in ranges:
-            if r['max'] is None:
-                count = users_with_refs.filter(refs_count__gte=r['min']).count()
-            elif r['min'] == 0:
-                count = TelegramUser.objects.annotate(
-                    refs_count=Count('referrals')
-                ).filter(refs_count=0).count()
-            else:
-                count = users_with_refs.filter(
-                    refs_count__gte=r['min'], 
-                    refs_count__lte=r['max']
-                ).count()
-           
+        for i, r in enumerate(ranges):
+            count = stats[f'range_{i}']
             referral_ranges.append({
                 'name': r['name'],
                 'count': count,
@@ -374,8 +478,8 @@ class TelegramUserAdmin(admin.ModelAdmin):
         context = {
             'title': 'Статистика рефералів',
             'total_users': total_users,
-            'users_with_referrals': users_with_refs.count(),
-            'referral_percentage': (users_with_refs.count() / total_users * 100) if total_users > 0 else 0,
+            'users_with_referrals': users_with_refs,
+            'referral_percentage': (users_with_refs / total_users * 100) if total_users > 0 else 0,
             'total_referrals': total_referrals,
             'top_referrers': top_referrers,
             'referral_ranges': referral_ranges,
@@ -414,12 +518,67 @@ class StatisticsAdmin(admin.ModelAdmin):
         return '0 з 0 (0%)'
     chat_members_display.short_description = 'Учасники чату'
 
+@admin.action(description="Відновити вибрані розсилки")
+def resume_broadcast_jobs(modeladmin, request, queryset):
+    # Лише зупинені з помилкою: 'running' ще розсилає воркер (покинуті він підхопить сам),
+    # а повторна постановка в чергу віддала б їх другому воркеру
+    resumed = queryset.filter(status='failed').update(status='queued', error='')
+    modeladmin.message_user(request, f'Повернуто в чергу розсилок: {resumed}')
+
+@admin.register(BroadcastJob)
+class BroadcastJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'short_text', 'status', 'progress_display',
+                    'sent', 'failed', 'inactive', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'photo_file_id', 'total', 'sent', 'failed', 'inactive', 'error',
+                       'created_at', 'started_at', 'finished_at', 'heartbeat_at')
+    ordering = ('-created_at',)
+    actions = [resume_broadcast_jobs]
+
+    def short_text(self, obj):
+        return obj.text[:50] + ('...' if len(obj.text) > 50 else '')
+    short_text.short_description = 'Текст'
+
+    def progress_display(self, obj):
+        recipients = obj.total - obj.inactive
+        done = obj.sent + obj.failed
+        percentage = (done * 100 / recipients) if recipients > 0 else 100
+        return format_html(
+            '<a href="{}">{} з {} ({}%)</a>',
+            reverse('admin:task_progress', args=[progress_task_id(obj.pk)]),
+            done,
+            recipients,
+            round(percentage, 1)
+        )
+    progress_display.short_description = 'Прогрес'
+
 @admin.register(UserActivity)
 class UserActivityAdmin(admin.ModelAdmin):
     list_display = ('user', 'action_type', 'created_at')
     list_filter = ('action_type', 'created_at')
-    search_fields = ('user__username', 'user__user_id')
-    ordering = ('-created_at',)
+    list_select_related = ('user',)
+    search_fields = ('^user__username',)
+    # Порядок збігається з індексом activity_created_idx
+    ordering = ('-created_at', '-id')
+    # Десятки мільйонів рядків: без точних COUNT(*) на кожній сторінці
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Числовий запит - точний збіг user_id по індексу, а не icontains
+        if search_term.strip().lstrip('-').isdigit():
+            return queryset.filter(user__user_id=int(search_term)), False
+        return super().get_search_results(request, queryset, search_term)
+
+@admin.register(UserActivityArchive)
+class UserActivityArchiveAdmin(UserActivityAdmin):
+    """Архів старих подій (лише перегляд)"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 # Налаштування заголовків адмінки
 admin.site.site_header = "DropHelper Bot Адміністрування"
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+class DashboardConfig(AppConfig):
+    name = 'dashboard'
+
+    def ready(self):
+        from . import signals  # noqa: F401
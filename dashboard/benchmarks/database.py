@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+@contextmanager
+def benchmark_database(keep: bool = False):
+    """Тимчасова база для бенчмарків, щоб не чіпати робочі дані.
+
+    Для SQLite база створюється у файлі поруч з проєктом (а не в пам'яті),
+    щоб вимірювання враховували реальний запис на диск.
+    """
+    if connection.vendor == 'sqlite':
+        connection.settings_dict.setdefault('TEST', {})
+        connection.settings_dict['TEST']['NAME'] = str(settings.BASE_DIR / 'benchmark.sqlite3')
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keep)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keep)
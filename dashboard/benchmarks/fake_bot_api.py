@@ -0,0 +1,200 @@
+import asyncio
+import json
+import re
+import time
+from collections import Counter, defaultdict, deque
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+CHAT_ID_MULTIPART = re.compile(rb'name="(chat_id|user_id|photo)"\r\n\r\n([^\r]+)')
+
+
+class FakeBotAPI:
+    """Локальний фейковий Bot API сервер (HTTP/1.1 keep-alive) для бенчмарків.
+
+    Імітує затримку мережі, ліміт запитів на токен (429 + retry_after)
+    та користувачів, які заблокували бота або не є учасниками чату.
+    """
+
+    def __init__(self, rate_limit: Optional[int] = 30, latency: float = 0.05,
+                 blocked_ratio: float = 0.0, member_ratio: float = 1.0,
+                 photo_fetch_latency: float = 0.2, connect_latency: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.photo_fetch_latency = photo_fetch_latency  # Telegram завантажує фото з URL
+        self.connect_latency = connect_latency  # як TCP + TLS рукостискання з api.telegram.org
+        self.blocked_ratio = blocked_ratio
+        self.member_ratio = member_ratio
+        self.host = host
+        self.port = port
+        self.server = None
+
+        self.requests = Counter()  # запити за методом
+        self.requests_by_token = Counter()
+        self.throttled = 0  # скільки разів віддали 429
+        self.photo_fetches = 0  # скільки разів фото передали за URL, а не file_id
+        self.connections = 0  # скільки TCP з'єднань було відкрито
+        self.open_connections = 0  # скільки відкрито зараз
+        self._windows: Dict[str, deque] = defaultdict(deque)
+        self._message_id = 0
+        self._handlers = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            for task in self._handlers:
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self.server.wait_closed()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def _is_blocked(self, chat_id: int) -> bool:
+        return chat_id % 100 < self.blocked_ratio * 100
+
+    def _is_member(self, user_id: int) -> bool:
+        return user_id % 100 < self.member_ratio * 100
+
+    def _throttle(self, token: str) -> bool:
+        """Ковзне вікно в 1 секунду на кожен токен"""
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        window = self._windows[token]
+        while window and now - window[0] >= 1:
+            window.popleft()
+        if len(window) >= self.rate_limit:
+            return True
+        window.append(now)
+        return False
+
+    @staticmethod
+    def _parse_params(headers: Dict[str, str], body: bytes) -> Dict[str, str]:
+        content_type = headers.get('content-type', '')
+        if content_type.startswith('multipart/'):
+            return {name.decode(): value.decode() for name, value in CHAT_ID_MULTIPART.findall(body)}
+        if content_type.startswith('application/json'):
+            return {key: str(value) for key, value in json.loads(body or b'{}').items()}
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    def _message(self, chat_id: int, **extra) -> Dict:
+        self._message_id += 1
+        return {
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            **extra,
+        }
+
+    async def _dispatch(self, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict]:
+        _, _, rest = path.partition('/bot')
+        token, _, method = rest.partition('/')
+        self.requests[method] += 1
+        self.requests_by_token[token] += 1
+
+        if self._throttle(token):
+            self.throttled += 1
+            return 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            }
+
+        await asyncio.sleep(self.latency)
+        params = self._parse_params(headers, body)
+        chat_id = params.get('chat_id', '0')
+        chat_id = int(chat_id) if chat_id.lstrip('-').isdigit() else 0  # @username публічного чату
+        user_id = int(params.get('user_id') or 0)
+
+        if method in ('sendMessage', 'sendPhoto', 'sendChatAction') and self._is_blocked(chat_id):
+            return 403, {
+                'ok': False,
+                'error_code': 403,
+                'description': 'Forbidden: bot was blocked by the user',
+            }
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        elif method == 'sendMessage':
+            result = self._message(chat_id, text=params.get('text', ''))
+        elif method == 'sendPhoto':
+            if params.get('photo', '').startswith(('http://', 'https://')):
+                self.photo_fetches += 1
+                await asyncio.sleep(self.photo_fetch_latency)
+            result = self._message(chat_id, photo=[{
+                'file_id': f'fake-file-{self._message_id}',
+                'file_unique_id': f'fake-unique-{self._message_id}',
+                'width': 1,
+                'height': 1,
+            }])
+        elif method == 'getChatMember':
+            result = {
+                'status': 'member' if self._is_member(user_id) else 'left',
+                'user': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+            }
+        elif method == 'getUpdates':
+            result = []
+        elif method == 'getWebhookInfo':
+            result = {'url': '', 'has_custom_certificate': False, 'pending_update_count': 0}
+        else:
+            result = True
+
+        return 200, {'ok': True, 'result': result}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self.open_connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            if self.connect_latency:
+                await asyncio.sleep(self.connect_latency)
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                _, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                status, payload = await self._dispatch(path, headers, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    b'HTTP/1.1 %d %s\r\n'
+                    b'Content-Type: application/json\r\n'
+                    b'Content-Length: %d\r\n\r\n' % (status, b'OK' if status == 200 else b'Error', len(data))
+                    + data
+                )
+                await writer.drain()
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self.open_connections -= 1
+            self._handlers.discard(task)
+            writer.close()
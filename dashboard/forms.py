@@ -20,4 +20,14 @@ class MessageForm(forms.Form):
     button_url = forms.URLField(
         required=False,
         label="URL кнопки"
-    )
\ No newline at end of file
+    )
+
+class ImportUsersForm(forms.Form):
+    users_file = forms.FileField(
+        label="Файл користувачів",
+        help_text="users.json, JSON Lines (.jsonl) або стиснутий .gz"
+    )
+    generate_referral_codes = forms.BooleanField(
+        required=False,
+        label="Генерувати реферальні коди REF{user_id}"
+    )
@@ -0,0 +1,50 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.models import TelegramUser, UserActivity
+from dashboard.services.activity_sink import ActivitySink
+
+class Command(BaseCommand):
+    help = 'Порівнює запис UserActivity по одному рядку та через ActivitySink'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Кількість подій')
+        parser.add_argument('--flush-size', type=int, default=500, help='Розмір пачки ActivitySink')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with benchmark_database():
+            TelegramUser.objects.bulk_create(
+                [TelegramUser(user_id=i) for i in range(1, rows + 1)],
+                batch_size=1000
+            )
+            user_pks = list(TelegramUser.objects.values_list('pk', flat=True))
+
+            per_row = asyncio.run(self.run_per_row(user_pks))
+            buffered = asyncio.run(self.run_sink(user_pks, options['flush_size']))
+            written = UserActivity.objects.count()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Записано рядків: {written}\n"
+            f"По одному (objects.create): {rows / per_row:.0f} рядків/с ({per_row:.2f} с)\n"
+            f"ActivitySink (bulk_create): {rows / buffered:.0f} рядків/с ({buffered:.2f} с)\n"
+            f"Прискорення: x{per_row / buffered:.1f}"
+        ))
+
+    async def run_per_row(self, user_pks):
+        started = time.perf_counter()
+        for user_pk in user_pks:
+            await asyncio.to_thread(
+                UserActivity.objects.create,
+                user_id=user_pk,
+                action_type='message_received'
+            )
+        return time.perf_counter() - started
+
+    async def run_sink(self, user_pks, flush_size):
+        started = time.perf_counter()
+        async with ActivitySink(flush_size=flush_size) as sink:
+            for user_pk in user_pks:
+                await sink.add(user_pk, 'message_received')
+        return time.perf_counter() - started
@@ -0,0 +1,97 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.models import TelegramUser
+
+class Command(BaseCommand):
+    help = 'Час завантаження списку користувачів в адмінці на великій таблиці'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help='Скільки користувачів згенерувати')
+        parser.add_argument('--requests', type=int, default=5, help='Скільки разів відкрити кожну сторінку')
+        parser.add_argument('--max-ms', type=float, default=200, help='Ліміт медіани на сторінку, мс')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with benchmark_database():
+                self.stdout.write(f"Генерація {options['users']} користувачів...")
+                self.seed(options['users'])
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                report = self.measure(options['users'], options['requests'])
+        finally:
+            teardown_test_environment()
+
+        slow = []
+        self.stdout.write(f"\n{'Сторінка':<28} {'медіана, мс':>12} {'запитів':>8}")
+        for name, result in report.items():
+            self.stdout.write(f"{name:<28} {result['ms']:>12.1f} {result['queries']:>8}")
+            if result['ms'] > options['max_ms']:
+                slow.append(name)
+        if slow:
+            raise CommandError(f"Повільніше {options['max_ms']:.0f} мс: {', '.join(slow)}")
+        self.stdout.write(self.style.SUCCESS(f"Всі сторінки швидші за {options['max_ms']:.0f} мс"))
+
+    def seed(self, count):
+        now = timezone.now()
+        languages = ['en', 'ru', 'ua']
+        batch = []
+        for i in range(1, count + 1):
+            batch.append(TelegramUser(
+                user_id=1000000000 + i,
+                username=f'user{i}' if i % 4 else None,
+                language=random.choice(languages),
+                join_date=now - timedelta(minutes=random.randint(0, 60 * 24 * 365)),
+                is_active=i % 10 != 0,
+                in_chat=i % 3 == 0,
+                referrals_count=random.randint(0, 5) if i % 20 == 0 else 0,
+            ))
+            if len(batch) >= 5000:
+                TelegramUser.objects.bulk_create(batch)
+                batch = []
+        TelegramUser.objects.bulk_create(batch)
+
+    def measure(self, users, requests):
+        admin = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+        client = Client()
+        client.force_login(admin)
+        url = reverse('admin:dashboard_telegramuser_changelist')
+
+        first_page = client.get(url)
+        if first_page.status_code != 200:
+            raise CommandError(f'Адмінка повернула {first_page.status_code}')
+        next_url = first_page.context['cl'].keyset_next_url
+
+        pages = {
+            'first_page': url,
+            'keyset_next_page': url + next_url,
+            'offset_page_50': url + '?p=50',
+            'status_filter': url + '?user_status=active_in_chat',
+            'language_filter': url + '?language__exact=ua',
+            'search_user_id': url + f'?q={1000000000 + users // 2}',
+            'search_username': url + f'?q=user{users // 3}',
+            # 0 - чекбокс дій, 4 - referrals_display
+            'order_by_referrals': url + '?o=-4',
+        }
+        report = {}
+        for name, page_url in pages.items():
+            timings = []
+            for _ in range(requests):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(page_url)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{name}: адмінка повернула {response.status_code}')
+            report[name] = {'ms': statistics.median(timings), 'queries': len(queries)}
+        return report
@@ -0,0 +1,131 @@
+import asyncio
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from telegram import Update
+from telegram.ext import TypeHandler
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.benchmarks.fake_bot_api import FakeBotAPI
+from dashboard.models import TelegramUser, UserActivity
+from dashboard.services.bot_app import build_application, stop_application, update_key
+from dashboard.services.db_executor import shutdown_db_executor
+
+CHAT_ID = -1001000000000
+
+def make_updates(users: int, per_user: int):
+    """Для кожного користувача: вхід у чат і per_user команд /start упереміш з іншими"""
+    updates = []
+    update_id = 0
+    for round_number in range(per_user + 1):
+        for i in range(users):
+            update_id += 1
+            user = {'id': 1000000 + i, 'is_bot': False, 'first_name': 'User'}
+            if round_number == 0:
+                updates.append({
+                    'update_id': update_id,
+                    'chat_member': {
+                        'chat': {'id': CHAT_ID, 'type': 'supergroup', 'title': 'Benchmark'},
+                        'from': user,
+                        'date': int(time.time()),
+                        'old_chat_member': {'status': 'left', 'user': user},
+                        'new_chat_member': {'status': 'member', 'user': user},
+                    },
+                })
+            else:
+                updates.append({
+                    'update_id': update_id,
+                    'message': {
+                        'message_id': update_id,
+                        'date': int(time.time()),
+                        'chat': {'id': user['id'], 'type': 'private'},
+                        'from': user,
+                        'text': '/start',
+                        'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+                    },
+                })
+    return updates
+
+class Command(BaseCommand):
+    help = 'Пропускна здатність обробників бота: послідовно проти паралельно з порядком на користувача'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Скільки користувачів')
+        parser.add_argument('--per-user', type=int, default=5, help='Скільки /start від кожного')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 32],
+                            help='Ліміт одночасних оновлень (можна кілька значень)')
+        parser.add_argument('--latency', type=float, default=0.05, help='Затримка фейкового API, с')
+
+    def handle(self, *args, **options):
+        updates = make_updates(options['users'], options['per_user'])
+        reports = []
+        with benchmark_database(), override_settings(TELEGRAM_CHAT_ID=str(CHAT_ID)):
+            for concurrency in options['concurrency']:
+                TelegramUser.objects.all().delete()
+                UserActivity.objects.all().delete()
+                TelegramUser.objects.bulk_create(
+                    [TelegramUser(user_id=1000000 + i) for i in range(options['users'])]
+                )
+                reports.append(asyncio.run(self.run(updates, concurrency, options['latency'])))
+                reports[-1]['in_chat'] = TelegramUser.objects.filter(in_chat=True).count()
+                reports[-1]['starts'] = UserActivity.objects.filter(action_type='start').count()
+            shutdown_db_executor()
+
+        for report in reports:
+            self.stdout.write(
+                f"Одночасно {report['concurrency']}: {report['handled']} оновлень за {report['elapsed']:.2f} с "
+                f"({report['handled'] / report['elapsed']:.0f} оновлень/с), "
+                f"p50 {report['p50']:.0f} мс, p99 {report['p99']:.0f} мс, "
+                f"у чаті {report['in_chat']}, подій start {report['starts']}, "
+                f"порушень порядку {report['out_of_order']}"
+            )
+            if (report['handled'] != len(updates) or report['out_of_order']
+                    or report['in_chat'] != options['users']
+                    or report['starts'] != options['users'] * options['per_user']):
+                raise CommandError(f"Неправильна обробка при concurrency={report['concurrency']}")
+        self.stdout.write(self.style.SUCCESS('Всі оновлення оброблені по черзі для кожного користувача'))
+
+    async def run(self, updates, concurrency, latency):
+        queued = {}
+        latencies = []
+        last_seen = {}
+        out_of_order = 0
+        all_handled = asyncio.Event()
+
+        async def handled(update: Update, context):
+            # Група 1 - після обробників бота (група 0)
+            nonlocal out_of_order
+            latencies.append(time.perf_counter() - queued[update.update_id])
+            key = update_key(update)
+            if last_seen.get(key, 0) > update.update_id:
+                out_of_order += 1
+            last_seen[key] = update.update_id
+            if len(latencies) == len(updates):
+                all_handled.set()
+
+        async with FakeBotAPI(rate_limit=None, latency=latency) as api:
+            application = build_application('100000:BENCH', api_url=api.base_url, concurrency=concurrency)
+            application.add_handler(TypeHandler(Update, handled), group=1)
+            await application.initialize()
+            await application.start()
+            started = time.perf_counter()
+            # Як Updater при polling: оновлення в update_queue
+            for data in updates:
+                queued[data['update_id']] = time.perf_counter()
+                await application.update_queue.put(Update.de_json(data, application.bot))
+            try:
+                await asyncio.wait_for(all_handled.wait(), timeout=300)
+            except asyncio.TimeoutError:
+                pass
+            elapsed = time.perf_counter() - started
+            await stop_application(application)
+
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+        return {
+            'concurrency': concurrency,
+            'handled': len(latencies),
+            'elapsed': elapsed,
+            'p50': quantiles[49] * 1000,
+            'p99': quantiles[98] * 1000,
+            'out_of_order': out_of_order,
+        }
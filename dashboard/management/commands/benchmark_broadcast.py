@@ -0,0 +1,58 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+from dashboard.benchmarks.fake_bot_api import FakeBotAPI
+from dashboard.services.message_sender import MessageSender
+from dashboard.services.rate_limiter import RateLimiter
+from dashboard.services.telegram_transport import close_transport
+
+class Command(BaseCommand):
+    help = 'Бенчмарк розсилки проти локального фейкового Bot API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=900, help='Кількість повідомлень')
+        parser.add_argument('--rate', type=float, default=30, help='Налаштований ліміт повідомлень/с')
+        parser.add_argument('--concurrency', type=int, default=20, help='Одночасних відправок')
+        parser.add_argument('--latency', type=float, default=0.05, help='Затримка фейкового API, с')
+        parser.add_argument('--server-limit', type=int, default=30, help='Ліміт фейкового API, запитів/с')
+        parser.add_argument('--photo-url', default=None, help='Розсилка з фото за цим URL')
+        parser.add_argument('--media-chat', default=None,
+                            help='Службовий чат для одноразового завантаження фото')
+        parser.add_argument('--buttons', type=int, default=0, help='Кількість кнопок у клавіатурі')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        async with FakeBotAPI(rate_limit=options['server_limit'], latency=options['latency']) as api:
+            sender = MessageSender(
+                bot_token='123456:BENCHMARK',
+                api_url=api.base_url,
+                rate_limiter=RateLimiter(options['rate']),
+            )
+            sender.MAX_CONCURRENT_SENDS = options['concurrency']
+            sender.media_cache_chat_id = options['media_chat']
+
+            buttons = None
+            if options['buttons']:
+                buttons = {'inline_keyboard': [
+                    [{'text': f'Button {i}', 'url': f'https://example.com/{i}'}]
+                    for i in range(options['buttons'])
+                ]}
+
+            chat_ids = range(1, options['messages'] + 1)
+            started = time.perf_counter()
+            results = await sender.deliver(chat_ids, 'Benchmark message', options['photo_url'], buttons)
+            elapsed = time.perf_counter() - started
+
+            await close_transport()
+
+        throughput = results['sent'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Відправлено: {results['sent']}, помилок: {results['failed']}\n"
+            f"Час: {elapsed:.2f} с\n"
+            f"Пропускна здатність: {throughput:.1f} повідомлень/с "
+            f"({throughput / options['rate'] * 100:.0f}% від ліміту {options['rate']:g})\n"
+            f"Відповідей 429: {api.throttled}, з'єднань: {api.connections}\n"
+            f"Фото завантажено з URL: {api.photo_fetches} раз"
+        ))
@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.models import TelegramUser
+
+class Command(BaseCommand):
+    help = 'Кількість запитів і затримка головної сторінки дашборду (регресійна перевірка)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50000, help='Скільки користувачів згенерувати')
+        parser.add_argument('--requests', type=int, default=20, help='Скільки разів відкрити сторінку')
+        parser.add_argument('--max-queries', type=int, default=6,
+                            help='Максимум SQL запитів без кешу (інакше помилка)')
+        parser.add_argument('--max-cached-queries', type=int, default=2,
+                            help='Максимум SQL запитів з кешем (сесія та користувач)')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with benchmark_database():
+                self.seed(options['users'])
+                report = self.measure(options['requests'])
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"Без кешу: {report['cold_queries']} запитів, "
+            f"медіана {report['cold_ms']:.1f} мс\n"
+            f"З кешем: {report['warm_queries']} запитів, "
+            f"медіана {report['warm_ms']:.1f} мс"
+        )
+
+        if report['cold_queries'] > options['max_queries']:
+            raise CommandError(
+                f"Дашборд виконує {report['cold_queries']} запитів (ліміт {options['max_queries']})"
+            )
+        if report['warm_queries'] > options['max_cached_queries']:
+            raise CommandError(
+                f"Дашборд з кешем виконує {report['warm_queries']} запитів "
+                f"(ліміт {options['max_cached_queries']})"
+            )
+        self.stdout.write(self.style.SUCCESS('Кількість запитів у межах ліміту'))
+
+    def seed(self, count):
+        now = timezone.now()
+        languages = ['en', 'ru', 'ua']
+        users = []
+        for i in range(1, count + 1):
+            joined = now - timedelta(minutes=random.randint(0, 60 * 24 * 30))
+            deleted = joined + timedelta(days=1) if i % 10 == 0 else None
+            users.append(TelegramUser(
+                user_id=i,
+                language=random.choice(languages),
+                join_date=joined,
+                is_active=deleted is None,
+                deleted_bot_at=deleted,
+                in_chat=i % 3 == 0,
+            ))
+        TelegramUser.objects.bulk_create(users, batch_size=2000)
+
+    def measure(self, requests):
+        admin = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+        client = Client()
+        client.force_login(admin)
+        url = reverse('dashboard:index')
+
+        cold, warm = [], []
+        cold_queries = warm_queries = 0
+        for _ in range(requests):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                cold.append((time.perf_counter() - started) * 1000)
+            cold_queries = len(queries)
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                client.get(url)
+                warm.append((time.perf_counter() - started) * 1000)
+            warm_queries = len(queries)
+
+            if response.status_code != 200:
+                raise CommandError(f'Дашборд повернув {response.status_code}')
+
+        return {
+            'cold_queries': cold_queries,
+            'warm_queries': warm_queries,
+            'cold_ms': statistics.median(cold),
+            'warm_ms': statistics.median(warm),
+        }
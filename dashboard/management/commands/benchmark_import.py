@@ -0,0 +1,130 @@
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.models import TelegramUser
+from dashboard.services.json_stream import users_reader
+from dashboard.services.user_importer import UserImporter
+
+class Command(BaseCommand):
+    help = 'Швидкість (рядків/с) і пам\'ять потокового імпорту на синтетичному users.json'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500000, help='Скільки користувачів у файлі')
+        parser.add_argument('--referred', type=float, default=0.3, help='Частка запрошених користувачів')
+        parser.add_argument('--chunk-size', type=int, default=UserImporter.CHUNK_SIZE)
+        parser.add_argument('--gzip', action='store_true', help='Стиснути файл gzip')
+        parser.add_argument('--trace-memory', action='store_true',
+                            help="Виміряти пікову пам'ять першого імпорту (tracemalloc, повільніше)")
+        parser.add_argument('--legacy-sample', type=int, default=2000,
+                            help='Скільки рядків імпортувати старим способом для порівняння (0 - пропустити)')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'users.json' + ('.gz' if options['gzip'] else ''))
+            self.write_file(path, options['users'], options['referred'], options['gzip'])
+            self.stdout.write(f"Файл: {options['users']} користувачів, {os.path.getsize(path) / 1e6:.1f} МБ")
+
+            with benchmark_database():
+                first = self.run_import(path, options['chunk_size'], options['trace_memory'])
+                second = self.run_import(path, options['chunk_size'], False)
+                users = TelegramUser.objects.count()
+                linked = TelegramUser.objects.filter(referred_by__isnull=False).count()
+                legacy = None
+                if options['legacy_sample']:
+                    with open(path, 'rb') as file:
+                        records = users_reader(file, path).users()
+                        sample = dict(islice(records, options['legacy_sample']))
+                    legacy = self.run_legacy(sample)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Перший імпорт (вставка): {first['rate']:.0f} рядків/с ({first['elapsed']:.1f} с)\n"
+            f"Повторний імпорт (оновлення): {second['rate']:.0f} рядків/с ({second['elapsed']:.1f} с)\n"
+            f"Створено {first['created']}, оновлено {second['updated']}, "
+            f"у базі {users}, з реферером {linked}"
+        ))
+        if first['peak_memory'] is not None:
+            self.stdout.write(self.style.SUCCESS(
+                f"Пікова пам'ять Python під час імпорту: {first['peak_memory'] / 1e6:.1f} МБ"
+            ))
+        if legacy:
+            self.stdout.write(self.style.SUCCESS(
+                f"update_or_create + get/save ({options['legacy_sample']} рядків): "
+                f"{legacy:.0f} рядків/с, прискорення x{first['rate'] / legacy:.1f}"
+            ))
+
+    def write_file(self, path, count, referred, compress):
+        """Файл пишеться по одному користувачу, без словника на весь файл"""
+        now = timezone.now()
+        opener = gzip.open if compress else open
+        with opener(path, 'wt', encoding='utf-8') as file:
+            file.write('{"users": {')
+            for user_id in range(1, count + 1):
+                data = {
+                    'username': f'user{user_id}',
+                    'language': random.choice(['en', 'ru', 'ua']),
+                    'tokens': 5000,
+                    'referral_code': f'REF{user_id}',
+                    'join_date': (now - timedelta(minutes=random.randint(0, 60 * 24 * 365))).isoformat(),
+                }
+                if random.random() < referred:
+                    # Реферер може бути і далі у файлі (посилання вперед)
+                    data['referred_by'] = str(random.randint(1, count))
+                if user_id > 1:
+                    file.write(', ')
+                file.write(f'"{user_id}": {json.dumps(data)}')
+            file.write('}, "statistics": {"total_bot_users": %d}}' % count)
+
+    def run_import(self, path, chunk_size, trace_memory):
+        importer = UserImporter(chunk_size=chunk_size)
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        # Без DEBUG, інакше журнал SQL запитів займає пам'ять і час
+        with override_settings(DEBUG=False), open(path, 'rb') as file:
+            results = importer.run(users_reader(file, path).users())
+        elapsed = time.perf_counter() - started
+        peak_memory = None
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return {
+            **results,
+            'elapsed': elapsed,
+            'rate': (results['created'] + results['updated']) / elapsed,
+            'peak_memory': peak_memory,
+        }
+    def run_legacy(self, users_data):
+        """Старий шлях: update_or_create на кожного і get/save на кожен реферальний зв'язок"""
+        TelegramUser.objects.all().delete()
+        started = time.perf_counter()
+        for user_id, user_data in users_data.items():
+            TelegramUser.objects.update_or_create(
+                user_id=int(user_id),
+                defaults={
+                    'username': user_data.get('username'),
+                    'language': user_data.get('language', 'en'),
+                    'tokens': user_data.get('tokens', 5000),
+                    'referral_code': user_data.get('referral_code'),
+                    'join_date': user_data['join_date'],
+                    'is_active': True,
+                }
+            )
+        for user_id, user_data in users_data.items():
+            if user_data.get('referred_by'):
+                try:
+                    user = TelegramUser.objects.get(user_id=int(user_id))
+                    user.referred_by = TelegramUser.objects.get(user_id=int(user_data['referred_by']))
+                    user.save()
+                except TelegramUser.DoesNotExist:
+                    continue
+        return len(users_data) / (time.perf_counter() - started)
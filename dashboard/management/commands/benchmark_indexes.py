@@ -0,0 +1,140 @@
+import random
+import re
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.models import TelegramUser, UserActivity
+
+class Command(BaseCommand):
+    help = 'Плани і час гарячих запитів до і після додавання індексів'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help='Скільки користувачів згенерувати')
+        parser.add_argument('--activities', type=int, default=None,
+                            help='Скільки записів активності (за замовчуванням = users)')
+        parser.add_argument('--repeat', type=int, default=5, help='Скільки разів виконати кожен запит')
+        parser.add_argument('--plans', action='store_true', help='Показати повні плани запитів')
+
+    def handle(self, *args, **options):
+        activities = options['activities']
+        if activities is None:
+            activities = options['users']
+
+        with benchmark_database():
+            self.stdout.write(f"Генерація {options['users']} користувачів і {activities} подій...")
+            self.seed(options['users'], activities)
+
+            indexes = self.model_indexes()
+            self.set_indexes(indexes, add=False)
+            before = self.measure(options['repeat'])
+            self.set_indexes(indexes, add=True)
+            after = self.measure(options['repeat'])
+
+        self.stdout.write(f"\n{'Запит':<28} {'без індексів, мс':>18} {'з індексами, мс':>18}")
+        for name in before:
+            self.stdout.write(
+                f"{name:<28} {before[name]['ms']:>18.1f} {after[name]['ms']:>18.1f}"
+            )
+        for name in before:
+            self.stdout.write(f"\n{name}\n  без індексів: {self.short_plan(before[name]['plan'], options['plans'])}")
+            self.stdout.write(f"  з індексами:  {self.short_plan(after[name]['plan'], options['plans'])}")
+
+    def seed(self, users_count, activities_count):
+        now = timezone.now()
+        languages = ['en', 'ru', 'ua']
+        batch = []
+        for i in range(1, users_count + 1):
+            joined = now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+            deleted = joined + timedelta(days=random.randint(0, 30)) if i % 10 == 0 else None
+            left = joined + timedelta(days=random.randint(0, 30)) if i % 7 == 0 else None
+            batch.append(TelegramUser(
+                user_id=i,
+                language=random.choice(languages),
+                join_date=joined,
+                is_active=deleted is None,
+                deleted_bot_at=deleted,
+                in_chat=i % 3 == 0 and left is None,
+                left_chat_at=left,
+                # Кожен 50-й ще жодного разу не перевірявся
+                last_status_check=None if i % 50 == 0 else now - timedelta(minutes=random.randint(0, 60 * 72)),
+            ))
+            if len(batch) >= 5000:
+                TelegramUser.objects.bulk_create(batch)
+                batch = []
+        TelegramUser.objects.bulk_create(batch)
+
+        pks = list(TelegramUser.objects.values_list('pk', flat=True)[:10000])
+        action_types = ['start', 'webapp_open', 'join_chat', 'leave_chat', 'bot_blocked', 'message_received']
+        batch = []
+        for _ in range(activities_count):
+            batch.append(UserActivity(user_id=random.choice(pks), action_type=random.choice(action_types)))
+            if len(batch) >= 5000:
+                UserActivity.objects.bulk_create(batch)
+                batch = []
+        UserActivity.objects.bulk_create(batch)
+
+    def model_indexes(self):
+        return [(model, index) for model in (TelegramUser, UserActivity) for index in model._meta.indexes]
+
+    def set_indexes(self, indexes, add):
+        """Видалення або створення індексів з Meta.indexes моделей"""
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                if add:
+                    schema_editor.add_index(model, index)
+                else:
+                    schema_editor.remove_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def queries(self):
+        now = timezone.now()
+        week_ago = now - timedelta(days=7)
+        return {
+            # Фільтр статусу в адмінці + сортування за замовчуванням
+            'admin_active_in_chat': TelegramUser.objects.filter(
+                is_active=True, in_chat=True).order_by('-join_date')[:100],
+            'admin_first_page': TelegramUser.objects.order_by('-join_date')[:100],
+            'admin_language': TelegramUser.objects.filter(language='ua').order_by('-join_date')[:100],
+            # Дашборд: нові та видалені по днях
+            'dashboard_new_by_day': TelegramUser.objects.filter(join_date__gte=week_ago)
+                .annotate(day=TruncDate('join_date')).values('day').annotate(count=Count('id')),
+            'dashboard_deleted_by_day': TelegramUser.objects.filter(deleted_bot_at__gte=week_ago)
+                .annotate(day=TruncDate('deleted_bot_at')).values('day').annotate(count=Count('id')),
+            # Планувальник перевірок
+            'scheduler_never_checked': TelegramUser.objects.filter(
+                last_status_check__isnull=True).order_by('pk').values_list('pk', flat=True)[:300],
+            'scheduler_stalest': TelegramUser.objects.filter(
+                last_status_check__lt=now - timedelta(hours=24)
+            ).order_by('last_status_check').values_list('pk', flat=True)[:300],
+            'scheduler_left_chat': TelegramUser.objects.filter(
+                left_chat_at__gte=week_ago).values_list('pk', flat=True),
+            # Список активності в адмінці
+            'activity_first_page': UserActivity.objects.order_by('-created_at')[:100],
+            'activity_by_type': UserActivity.objects.filter(
+                action_type='bot_blocked').order_by('-created_at')[:100],
+        }
+
+    def measure(self, repeat):
+        results = {}
+        for name, queryset in self.queries().items():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {'plan': plan, 'ms': min(timings)}
+        return results
+
+    def short_plan(self, plan, full):
+        if full:
+            return '\n    ' + plan.replace('\n', '\n    ')
+        # Лише рядки зі способом доступу до таблиць
+        lines = [re.sub(r'^\d+ \d+ \d+ ', '', line).strip(' -|`') for line in plan.splitlines()]
+        return '; '.join(line for line in lines if 'SCAN' in line or 'SEARCH' in line or 'Scan' in line) or plan
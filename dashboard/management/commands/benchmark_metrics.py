@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from dashboard.services.metrics import Registry
+
+class Command(BaseCommand):
+    help = 'Вартість виклику хуків метрик: вимкнені (заглушка) проти увімкнених'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=1000000, help='Скільки викликів кожного хука')
+
+    def handle(self, *args, **options):
+        calls = options['calls']
+        for enabled in (False, True):
+            registry = Registry(enabled)
+            counter = registry.counter('bench_total', 'Benchmark', ['outcome'])
+            histogram = registry.histogram('bench_seconds', 'Benchmark', ['sink'])
+
+            started = time.perf_counter()
+            for _ in range(calls):
+                counter.inc(outcome='ok')
+            inc_ns = (time.perf_counter() - started) / calls * 1e9
+
+            started = time.perf_counter()
+            for _ in range(calls):
+                with histogram.time(sink='activity'):
+                    pass
+            timer_ns = (time.perf_counter() - started) / calls * 1e9
+
+            self.stdout.write(
+                f"{'Увімкнені' if enabled else 'Вимкнені'}: "
+                f"Counter.inc {inc_ns:.0f} нс, Histogram.time {timer_ns:.0f} нс на виклик"
+            )
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.benchmarks.fake_bot_api import FakeBotAPI
+from dashboard.models import TelegramUser
+from dashboard.services.status_checker import StatusChecker
+from dashboard.services.telegram_transport import close_transport
+
+class Command(BaseCommand):
+    help = 'Швидкість перевірки статусів з кількома токенами проти фейкового Bot API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=600, help='Скільки користувачів перевірити')
+        parser.add_argument('--tokens', type=int, nargs='+', default=[1, 4],
+                            help='Кількість токенів для get_chat_member (можна кілька значень)')
+        parser.add_argument('--check-bot', action='store_true',
+                            help='Також перевіряти блокування бота (send_chat_action основним токеном)')
+        parser.add_argument('--latency', type=float, default=0.05, help='Затримка фейкового API, с')
+        parser.add_argument('--server-limit', type=int, default=30, help='Ліміт фейкового API на токен, запитів/с')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            TelegramUser.objects.bulk_create(
+                [TelegramUser(user_id=i) for i in range(1, options['users'] + 1)],
+                batch_size=1000
+            )
+            reports = [asyncio.run(self.run(tokens, options)) for tokens in options['tokens']]
+
+        for report in reports:
+            self.stdout.write(
+                f"Токенів: {report['tokens']}: перевірено {report['checked']} з {report['total']} "
+                f"за {report['elapsed']:.1f} с ({report['checked'] / report['elapsed']:.1f} користувачів/с), "
+                f"у чаті {report['in_chat']}, відповідей 429: {report['throttled']}\n"
+                f"  запити по токенах: {report['by_token']}"
+            )
+            if report['checked'] != report['total']:
+                raise CommandError(f"Перевірено не всіх користувачів ({report['tokens']} токенів)")
+        self.stdout.write(self.style.SUCCESS('Всі користувачі перевірені'))
+
+    async def run(self, tokens, options):
+        async with FakeBotAPI(rate_limit=options['server_limit'], latency=options['latency'],
+                              member_ratio=0.5) as api:
+            checker = StatusChecker(
+                bot_token='100000:MAIN',
+                api_url=api.base_url,
+                check_bot=options['check_bot'],
+                chat_tokens=[f'{100001 + i}:CHECKER' for i in range(tokens)],
+            )
+            started = time.perf_counter()
+            results = await checker.check_users_status(TelegramUser.objects.all())
+            elapsed = time.perf_counter() - started
+
+            await close_transport()
+
+        return {
+            **results,
+            'tokens': tokens,
+            'elapsed': elapsed,
+            'throttled': api.throttled,
+            'by_token': ', '.join(
+                f"{token.split(':')[0]}={count}" for token, count in sorted(api.requests_by_token.items())
+            ),
+        }
@@ -0,0 +1,95 @@
+import asyncio
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from telegram import Bot
+from dashboard.benchmarks.fake_bot_api import FakeBotAPI
+from dashboard.services.metrics import make_request
+from dashboard.services.telegram_transport import close_transport, get_bot
+
+class Command(BaseCommand):
+    help = "Спільний пул з'єднань проти Bot на кожен запуск: сокети і час на встановлення з'єднань"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000, help='Скільки запитів до API')
+        parser.add_argument('--runs', type=int, default=100,
+                            help='На скільки запусків (розсилок, перевірок) поділити запити')
+        parser.add_argument('--tokens', type=int, default=3, help='Скільки токенів (ботів-перевіряльників)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Запитів одночасно')
+        parser.add_argument('--latency', type=float, default=0.005, help='Затримка фейкового API, с')
+        parser.add_argument('--connect-latency', type=float, default=0.05,
+                            help="Імітація TCP + TLS рукостискання на нове з'єднання, с")
+
+    def handle(self, *args, **options):
+        reports = [asyncio.run(self.run(mode, options)) for mode in ('per_run', 'shared')]
+
+        for report in reports:
+            title = 'Bot на кожен запуск' if report['mode'] == 'per_run' else "Спільний пул з'єднань"
+            self.stdout.write(
+                f"{title}: {report['requests']} запитів за {report['elapsed']:.2f} с, "
+                f"p50 {report['p50']:.1f} мс, p99 {report['p99']:.1f} мс\n"
+                f"  з'єднань: {report['connections']} "
+                f"({report['connections'] * 10000 / report['requests']:.0f} на 10 тис. запитів), "
+                f"на встановлення: {report['connect_time']:.1f} с, "
+                f"не закрито після роботи: {report['left_open']}"
+            )
+        per_run, shared = reports
+        if shared['connections'] > per_run['connections'] or shared['left_open']:
+            raise CommandError("Спільний пул відкриває більше з'єднань або не закриває їх")
+        self.stdout.write(self.style.SUCCESS(
+            f"З'єднань у {per_run['connections'] / max(shared['connections'], 1):.0f} раз менше"
+        ))
+
+    async def run(self, mode, options):
+        per_run = options['requests'] // options['runs']
+        tokens = [f'{100000 + i}:TRANSPORT' for i in range(options['tokens'])]
+        latencies = []
+        leaked = []
+
+        async with FakeBotAPI(rate_limit=None, latency=options['latency'],
+                              connect_latency=options['connect_latency']) as api:
+
+            def bot_for(token):
+                if mode == 'shared':
+                    return get_bot(token, api.base_url)
+                # Як було: новий Bot з власним пулом, який ніхто не закриває
+                request = make_request(connection_pool_size=options['concurrency'])
+                leaked.append(request)
+                return Bot(token=token, base_url=api.base_url, request=request)
+
+            async def send(bot, chat_id):
+                started = time.perf_counter()
+                await bot.send_chat_action(chat_id=chat_id, action='typing')
+                latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for _ in range(options['runs']):
+                bots = [bot_for(token) for token in tokens]
+                pending = iter(range(per_run))
+
+                async def worker():
+                    for i in pending:
+                        await send(bots[i % len(bots)], i + 1)
+
+                await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+            elapsed = time.perf_counter() - started
+
+            if mode == 'shared':
+                await close_transport()
+            await asyncio.sleep(0.1)
+            left_open = api.open_connections
+            # Прибирання після вимірювання, щоб не залишати сокети до кінця процесу
+            for request in leaked:
+                await request.shutdown()
+
+        quantiles = statistics.quantiles(latencies, n=100)
+        return {
+            'mode': mode,
+            'requests': len(latencies),
+            'elapsed': elapsed,
+            'p50': quantiles[49] * 1000,
+            'p99': quantiles[98] * 1000,
+            'connections': api.connections,
+            'connect_time': api.connections * options['connect_latency'],
+            'left_open': left_open,
+        }
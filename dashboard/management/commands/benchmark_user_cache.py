@@ -0,0 +1,65 @@
+import random
+import statistics
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.models import TelegramUser
+from dashboard.services.user_cache import FIELDS, UserCache
+
+def ms(values, quantile):
+    return statistics.quantiles(values, n=100)[quantile - 1] * 1000 if len(values) > 1 else 0
+
+class Command(BaseCommand):
+    help = 'Кеш користувачів бота: влучання і затримка пошуку проти запиту до бази'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Скільки користувачів у базі')
+        parser.add_argument('--lookups', type=int, default=50000, help='Скільки пошуків')
+        parser.add_argument('--cache-size', type=int, default=10000, help='Розмір локального кешу')
+        parser.add_argument('--unknown', type=float, default=0.1,
+                            help='Частка пошуків користувачів, яких немає в базі')
+        parser.add_argument('--shared', action='store_true', help='Зі спільним рівнем (Django cache)')
+        parser.add_argument('--min-hit-rate', type=float, default=0.8, help='Мінімальна частка влучань')
+
+    def handle(self, *args, **options):
+        # Активні користувачі бота - невелика частина бази: розподіл Парето
+        rng = random.Random(1)
+        users = options['users']
+        lookups = [
+            users + rng.randrange(users) if rng.random() < options['unknown']
+            else min(int(rng.paretovariate(1.2)), users)
+            for _ in range(options['lookups'])
+        ]
+
+        with benchmark_database():
+            TelegramUser.objects.bulk_create(
+                [TelegramUser(user_id=i, referral_code=f'REF{i}') for i in range(1, users + 1)],
+                batch_size=5000,
+            )
+            cache.clear()
+            user_cache = UserCache(max_size=options['cache_size'], ttl=600, shared=options['shared'])
+            db_latency = self.measure(
+                lambda user_id: TelegramUser.objects.filter(user_id=user_id).values_list(*FIELDS).first(),
+                lookups[:5000],
+            )
+            cache_latency = self.measure(user_cache.get, lookups)
+            stats = user_cache.stats()
+
+        self.stdout.write(
+            f"База: p50 {ms(db_latency, 50):.3f} мс, p99 {ms(db_latency, 99):.3f} мс\n"
+            f"Кеш: p50 {ms(cache_latency, 50):.3f} мс, p99 {ms(cache_latency, 99):.3f} мс, "
+            f"влучань {stats['hit_rate']:.1%} (локально {stats['hits']}, спільно {stats['shared_hits']}, "
+            f"з бази {stats['misses']}), записів {stats['entries']}"
+        )
+        if stats['hit_rate'] < options['min_hit_rate']:
+            raise CommandError(f"Влучань {stats['hit_rate']:.1%} (мінімум {options['min_hit_rate']:.0%})")
+        self.stdout.write(self.style.SUCCESS('Кеш користувачів у межах очікувань'))
+
+    def measure(self, lookup, user_ids):
+        latencies = []
+        for user_id in user_ids:
+            started = time.perf_counter()
+            lookup(user_id)
+            latencies.append(time.perf_counter() - started)
+        return latencies
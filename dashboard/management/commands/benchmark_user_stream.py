@@ -0,0 +1,53 @@
+import asyncio
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.models import TelegramUser
+from dashboard.services.status_checker import StatusChecker
+from dashboard.services.user_stream import iter_user_batches
+
+class Command(BaseCommand):
+    help = 'Порівнює пікову пам\'ять list(queryset) та потокового читання користувачів'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='+', default=[10000, 50000, 100000],
+                            help='Розміри аудиторії для вимірювання')
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['users'])
+        with benchmark_database():
+            seeded = 0
+            self.stdout.write(f"{'users':>10} {'list() MB':>12} {'stream MB':>12} {'list() s':>10} {'stream s':>10}")
+            for size in sizes:
+                TelegramUser.objects.bulk_create(
+                    [TelegramUser(user_id=i, username=f'user{i}', referral_code=f'REF{i}')
+                     for i in range(seeded + 1, size + 1)],
+                    batch_size=2000
+                )
+                seeded = size
+
+                list_peak, list_time = self.measure(self.load_list)
+                stream_peak, stream_time = self.measure(lambda: asyncio.run(self.load_stream()))
+                self.stdout.write(
+                    f"{size:>10} {list_peak:>12.1f} {stream_peak:>12.1f} {list_time:>10.2f} {stream_time:>10.2f}"
+                )
+
+    def measure(self, func):
+        tracemalloc.start()
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak / 1024 / 1024, elapsed
+
+    def load_list(self):
+        users = list(TelegramUser.objects.all())
+        return sum(1 for user in users if user.is_active)
+
+    async def load_stream(self):
+        active = 0
+        async for page in iter_user_batches(TelegramUser.objects.all(), 1000, StatusChecker.USER_FIELDS):
+            active += sum(1 for user in page if user.is_active)
+        return active
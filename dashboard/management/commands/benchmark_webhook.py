@@ -0,0 +1,133 @@
+import asyncio
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from telegram import Update
+from telegram.ext import TypeHandler
+from dashboard.benchmarks.database import benchmark_database
+from dashboard.benchmarks.fake_bot_api import FakeBotAPI
+from dashboard.services.bot_app import stop_webhook_application, webhook_application
+from dashboard.services.db_executor import shutdown_db_executor
+
+SECRET = 'benchmark-secret'
+
+def start_update(update_id: int) -> dict:
+    user = {'id': 1000000 + update_id, 'is_bot': False, 'first_name': 'User'}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user['id'], 'type': 'private'},
+            'from': user,
+            'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }
+
+def p99(values):
+    return statistics.quantiles(values, n=100)[98] * 1000 if len(values) > 1 else 0
+
+class Command(BaseCommand):
+    help = 'Навантажувальний тест webhook: синтетичні /start на view, оновлень/с і p99 обробки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--updates', type=int, default=5000, help='Скільки оновлень надіслати')
+        parser.add_argument('--connections', type=int, default=40,
+                            help="Одночасних запитів до view (як max_connections у Telegram)")
+        parser.add_argument('--concurrency', type=int, default=32, help='Оновлень в обробці одночасно')
+        parser.add_argument('--queue-size', type=int, default=1000, help='Розмір черги оновлень')
+        parser.add_argument('--latency', type=float, default=0.05, help='Затримка фейкового API, с')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            # /start реєструє користувачів - пишемо в тимчасову базу
+            with benchmark_database():
+                report = asyncio.run(self.run(options))
+                shutdown_db_executor()
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"Оновлень: {report['handled']} з {options['updates']} за {report['elapsed']:.2f} с "
+            f"({report['handled'] / report['elapsed']:.0f} оновлень/с)\n"
+            f"Прийом view: {options['updates'] / report['accept_elapsed']:.0f} запитів/с, "
+            f"p50 {statistics.median(report['view']) * 1000:.1f} мс, p99 {p99(report['view']):.1f} мс\n"
+            f"Від запиту до кінця обробки: p50 {statistics.median(report['handler']) * 1000:.1f} мс, "
+            f"p99 {p99(report['handler']):.1f} мс\n"
+            f"Відповідей 503 (черга повна, повтор): {report['rejected']}, "
+            f"sendMessage у фейковому API: {report['sent']}"
+        )
+        if report['handled'] != options['updates']:
+            raise CommandError('Оброблено не всі оновлення')
+        self.stdout.write(self.style.SUCCESS('Всі оновлення оброблені'))
+
+    async def run(self, options):
+        total = options['updates']
+        posted = {}
+        view_latency = []
+        handler_latency = []
+        rejected = 0
+        all_handled = asyncio.Event()
+
+        async def handled(update: Update, context):
+            # Група 1 - після обробників бота (група 0)
+            handler_latency.append(time.perf_counter() - posted[update.update_id])
+            if len(handler_latency) == total:
+                all_handled.set()
+
+        async with FakeBotAPI(rate_limit=None, latency=options['latency']) as api:
+            with override_settings(
+                TELEGRAM_WEBHOOK_SECRET=SECRET,
+                TELEGRAM_API_URL=api.base_url,
+                TELEGRAM_WEBHOOK_QUEUE_SIZE=options['queue_size'],
+                TELEGRAM_BOT_CONCURRENCY=options['concurrency'],
+            ):
+                application = await webhook_application()
+                application.add_handler(TypeHandler(Update, handled), group=1)
+                client = AsyncClient()
+                url = reverse('dashboard:telegram_webhook')
+                pending = iter(range(1, total + 1))
+
+                async def connection():
+                    nonlocal rejected
+                    for update_id in pending:
+                        posted[update_id] = time.perf_counter()
+                        while True:
+                            started = time.perf_counter()
+                            response = await client.post(
+                                url, start_update(update_id), content_type='application/json',
+                                headers={'X-Telegram-Bot-Api-Secret-Token': SECRET},
+                            )
+                            view_latency.append(time.perf_counter() - started)
+                            if response.status_code != 503:
+                                break
+                            # Telegram повторює оновлення пізніше
+                            rejected += 1
+                            await asyncio.sleep(0.05)
+                        if response.status_code != 200:
+                            raise CommandError(f'view повернула {response.status_code}')
+
+                started = time.perf_counter()
+                await asyncio.gather(*(connection() for _ in range(options['connections'])))
+                accept_elapsed = time.perf_counter() - started
+                try:
+                    await asyncio.wait_for(all_handled.wait(), timeout=60)
+                except asyncio.TimeoutError:
+                    pass
+                elapsed = time.perf_counter() - started
+                await stop_webhook_application()
+
+        return {
+            'handled': len(handler_latency),
+            'elapsed': elapsed,
+            'accept_elapsed': accept_elapsed,
+            'view': view_latency,
+            'handler': handler_latency,
+            'rejected': rejected,
+            'sent': api.requests['sendMessage'],
+        }
@@ -0,0 +1,33 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from dashboard.services.rollups import build_rollups
+
+def parse_since(value: str) -> datetime:
+    moment = datetime.fromisoformat(value)
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+class Command(BaseCommand):
+    help = 'Погодинні й денні агрегати UserActivity для графіків дашборду'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=parse_since,
+                            help='Перебудувати з цього моменту (YYYY-MM-DD[THH:MM]), напр. після імпорту')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Повторювати кожні N секунд (0 - один запуск, напр. з cron)')
+
+    def handle(self, *args, **options):
+        since = options['since']
+        while True:
+            started = time.perf_counter()
+            results = build_rollups(since=since)
+            self.stdout.write(self.style.SUCCESS(
+                f"Агрегати оновлено за {time.perf_counter() - started:.2f} с: "
+                f"погодинних рядків {results['hourly']}, денних {results['daily']}"
+            ))
+            if not options['interval']:
+                return
+            # Далі - лише від останньої години
+            since = None
+            time.sleep(options['interval'])
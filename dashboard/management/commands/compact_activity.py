@@ -0,0 +1,32 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.services.activity_storage import compact_activity, is_partitioned
+
+class Command(BaseCommand):
+    help = 'Партиції, архів і зберігання UserActivity: старі події -> денні підсумки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archive-days', type=int, default=30,
+                            help='Події старші за N днів переносяться в архів (без партицій PostgreSQL)')
+        parser.add_argument('--keep-days', type=int, default=180,
+                            help='Сирі події старші за N днів видаляються (денні підсумки лишаються)')
+        parser.add_argument('--keep-hourly-days', type=int, default=90,
+                            help='Погодинні агрегати старші за N днів видаляються')
+
+    def handle(self, *args, **options):
+        if options['keep_days'] < options['archive_days']:
+            raise CommandError('--keep-days не може бути меншим за --archive-days')
+
+        started = time.perf_counter()
+        results = compact_activity(
+            archive_after=timedelta(days=options['archive_days']),
+            keep_raw=timedelta(days=options['keep_days']),
+            keep_hourly=timedelta(days=options['keep_hourly_days']),
+        )
+        storage = 'партиції PostgreSQL' if is_partitioned() else 'архівна таблиця'
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {time.perf_counter() - started:.1f} с ({storage}): "
+            f"нових партицій {results['partitions']}, в архів {results['archived']}, "
+            f"видалено подій {results['deleted']}, погодинних агрегатів {results['hourly_deleted']}"
+        ))
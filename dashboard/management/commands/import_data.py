@@ -1,73 +1,36 @@
-import json
 from django.core.management.base import BaseCommand
-from django.utils.dateparse import parse_datetime
-from dashboard.models import TelegramUser, Statistics
+from dashboard.models import Statistics
+from dashboard.services.json_stream import users_reader
+from dashboard.services.user_importer import UserImporter
 from datetime import date
 
 class Command(BaseCommand):
     help = 'Імпортує дані з JSON файлу'
 
     def add_arguments(self, parser):
-        parser.add_argument('json_file', type=str, help='Шлях до JSON файлу')
+        parser.add_argument('json_file', type=str, help='Шлях до JSON / JSON Lines файлу (можна .gz)')
+        parser.add_argument('--chunk-size', type=int, default=UserImporter.CHUNK_SIZE,
+                            help='Скільки користувачів записувати одним запитом')
 
     def handle(self, *args, **options):
-        self.stdout.write('Читаємо JSON файл...')
+        # Імпорт користувачів пачками (upsert за user_id) і реферальні зв'язки.
+        # Файл читається потоково, тому розмір не обмежений пам'яттю
+        self.stdout.write('Імпортуємо користувачів...')
+        importer = UserImporter(
+            chunk_size=options['chunk_size'],
+            referral_code=lambda user_id, user_data: f"REF{user_id}",
+            on_error=lambda user_id, e: self.stdout.write(
+                self.style.WARNING(f'Помилка при імпорті користувача {user_id}: {e}')
+            ),
+        )
         try:
-            with open(options['json_file'], 'r', encoding='utf-8') as file:
-                data = json.load(file)
-        except Exception as e:
+            with open(options['json_file'], 'rb') as file:
+                reader = users_reader(file, options['json_file'])
+                results = importer.run(reader.users())
+        except (OSError, ValueError) as e:
             self.stdout.write(self.style.ERROR(f'Помилка читання файлу: {e}'))
             return
-
-        # Імпорт користувачів
-        self.stdout.write('Імпортуємо користувачів...')
-        users_created = 0
-        users_updated = 0
-
-        for user_id, user_data in data['users'].items():
-            try:
-                # Спочатку створюємо користувача без referrals
-                defaults = {
-                    'username': user_data.get('username'),
-                    'language': user_data.get('language', 'en'),
-                    'tokens': user_data.get('tokens', 5000),
-                    'referral_code': f"REF{user_id}",
-                    'join_date': parse_datetime(user_data.get('join_date')),
-                    'is_active': True
-                }
-
-                user, created = TelegramUser.objects.update_or_create(
-                    user_id=int(user_id),
-                    defaults=defaults
-                )
-
-                if created:
-                    users_created += 1
-                else:
-                    users_updated += 1
-
-            except Exception as e:
-                self.stdout.write(
-                    self.style.WARNING(f'Помилка при імпорті користувача {user_id}: {e}')
-                )
-
-        # Встановлюємо зв'язки referrals
-        self.stdout.write("Встановлюємо реферальні зв'язки...")
-        for user_id, user_data in data['users'].items():
-            if user_data.get('referred_by'):
-                try:
-                    user = TelegramUser.objects.get(user_id=int(user_id))
-                    referrer = TelegramUser.objects.get(
-                        user_id=int(user_data['referred_by'])
-                    )
-                    user.referred_by = referrer
-                    user.save()
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'Помилка при встановленні реферала для {user_id}: {e}'
-                        )
-                    )
+        data = reader.extra
 
         # Імпорт статистики
         self.stdout.write('Імпортуємо статистику...')
@@ -94,8 +57,10 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(
                 f'Імпорт завершено:\n'
-                f'- Створено нових користувачів: {users_created}\n'
-                f'- Оновлено існуючих користувачів: {users_updated}\n'
+                f'- Створено нових користувачів: {results["created"]}\n'
+                f'- Оновлено існуючих користувачів: {results["updated"]}\n'
+                f'- Реферальних зв\'язків: {results["referrals"]} '
+                f'(реферера не знайдено: {results["missing_referrers"]})\n'
                 f'- Імпортовано статистику'
             )
         )
\ No newline at end of file
@@ -1,131 +1,96 @@
 from django.core.management.base import BaseCommand
 import json
+import time
+from contextlib import nullcontext
 from dashboard.models import TelegramUser, Statistics
-from django.utils import timezone
+from dashboard.services.json_stream import users_reader
+from dashboard.services.user_importer import UserImporter
 from django.db import transaction
-from datetime import datetime
-import os
+from django.utils import timezone
 
 class Command(BaseCommand):
-    help = 'Import users from JSON file'
+    help = (
+        'Import users from JSON file. Each chunk is committed separately: after a failure '
+        'the chunks already imported stay in the database (re-running the import is safe, '
+        'users are upserted by user_id). Use --atomic to import the whole file in one transaction'
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument('json_file', type=str, help='Path to the JSON file')
+        parser.add_argument('json_file', type=str, help='Path to the JSON / JSON Lines file (optionally .gz)')
+        parser.add_argument('--chunk-size', type=int, default=UserImporter.CHUNK_SIZE,
+                            help='Users per bulk upsert')
+        parser.add_argument('--atomic', action='store_true',
+                            help='Import the whole file in one transaction: all or nothing')
 
     def handle(self, *args, **options):
         file_path = options['json_file']
-        
+        # Скільки пачок уже закомічено - для звіту, якщо імпорт обірветься
+        progress = {'chunks': 0, 'users': 0}
+
+        def on_chunk(results):
+            progress['chunks'] += 1
+            progress['users'] = results['created'] + results['updated']
+
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                
-            users_data = data.get('users', {})
+            # Імпорт користувачів пачками (upsert за user_id) і реферальні зв'язки.
+            # Файл (JSON, JSON Lines, .gz) читається потоково, без json.load
+            importer = UserImporter(
+                chunk_size=options['chunk_size'],
+                on_error=lambda user_id, e: self.stdout.write(
+                    self.style.ERROR(f'Error processing user {user_id}: {str(e)}')
+                ),
+                on_chunk=on_chunk,
+            )
+            started = time.perf_counter()
+            with open(file_path, 'rb') as file, transaction.atomic() if options['atomic'] else nullcontext():
+                reader = users_reader(file, file_path)
+                results = importer.run(reader.users())
+            elapsed = time.perf_counter() - started
+
+            data = reader.extra
             statistics_data = data.get('statistics', {})
 
-            with transaction.atomic():
-                # Імпорт користувачів
-                imported_count = 0
-                updated_count = 0
-                
-                for user_id, user_data in users_data.items():
-                    try:
-                        # Конвертуємо дату
-                        join_date = datetime.fromisoformat(user_data.get('join_date')) if user_data.get('join_date') else timezone.now()
-                        
-                        # Створюємо або оновлюємо користувача
-                        user, created = TelegramUser.objects.update_or_create(
-                            user_id=int(user_id),
-                            defaults={
-                                'username': user_data.get('username'),
-                                'language': user_data.get('language', 'en'),
-                                'tokens': user_data.get('tokens', 5000),
-                                'referral_code': user_data.get('referral_code'),
-                                'join_date': join_date,
-                                'is_active': True,
-                            }
-                        )
-                        
-                        if created:
-                            self.stdout.write(
-                                self.style.SUCCESS(
-                                    f'Created new user: {user_id}'
-                                )
-                            )
-                            imported_count += 1
-                        else:
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f'Updated existing user: {user_id}'
-                                )
-                            )
-                            updated_count += 1
-                            
-                    except Exception as e:
+            # Оновлюємо статистику
+            if statistics_data:
+                try:
+                    stats, created = Statistics.objects.get_or_create(
+                        date=timezone.now().date(),
+                        defaults={
+                            'total_bot_users': statistics_data.get('total_bot_users', 0),
+                            'webapp_opens': statistics_data.get('webapp_opens', 0),
+                            'ru_users': statistics_data.get('languages', {}).get('ru', 0),
+                            'ua_users': statistics_data.get('languages', {}).get('ua', 0),
+                            'en_users': statistics_data.get('languages', {}).get('en', 0),
+                            'total_spots': data.get('total_spots', 10000),
+                            'used_spots': data.get('used_spots', 0),
+                        }
+                    )
+                    if created:
                         self.stdout.write(
-                            self.style.ERROR(
-                                f'Error processing user {user_id}: {str(e)}'
-                            )
+                            self.style.SUCCESS('Created new statistics entry')
                         )
-
-                # Оновлюємо зв'язки рефералів
-                for user_id, user_data in users_data.items():
-                    if user_data.get('referred_by'):
-                        try:
-                            user = TelegramUser.objects.get(user_id=int(user_id))
-                            referrer = TelegramUser.objects.get(
-                                user_id=int(user_data['referred_by'])
-                            )
-                            user.referred_by = referrer
-                            user.save()
-                            self.stdout.write(
-                                self.style.SUCCESS(
-                                    f'Updated referral for user: {user_id}'
-                                )
-                            )
-                        except TelegramUser.DoesNotExist:
-                            self.stdout.write(
-                                self.style.ERROR(
-                                    f'Could not find user or referrer for {user_id}'
-                                )
-                            )
-                            continue
-
-                # Оновлюємо статистику
-                if statistics_data:
-                    try:
-                        stats, created = Statistics.objects.get_or_create(
-                            date=timezone.now().date(),
-                            defaults={
-                                'total_bot_users': statistics_data.get('total_bot_users', 0),
-                                'webapp_opens': statistics_data.get('webapp_opens', 0),
-                                'ru_users': statistics_data.get('languages', {}).get('ru', 0),
-                                'ua_users': statistics_data.get('languages', {}).get('ua', 0),
-                                'en_users': statistics_data.get('languages', {}).get('en', 0),
-                                'total_spots': data.get('total_spots', 10000),
-                                'used_spots': data.get('used_spots', 0),
-                            }
-                        )
-                        if created:
-                            self.stdout.write(
-                                self.style.SUCCESS('Created new statistics entry')
-                            )
-                        else:
-                            self.stdout.write(
-                                self.style.SUCCESS('Updated statistics entry')
-                            )
-                    except Exception as e:
+                    else:
                         self.stdout.write(
-                            self.style.ERROR(f'Error updating statistics: {str(e)}')
+                            self.style.SUCCESS('Updated statistics entry')
                         )
-
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Import completed!\n'
-                        f'Successfully imported {imported_count} new users\n'
-                        f'Updated {updated_count} existing users\n'
-                        f'Total users in database: {TelegramUser.objects.count()}'
+                except Exception as e:
+                    self.stdout.write(
+                        self.style.ERROR(f'Error updating statistics: {str(e)}')
                     )
+
+            processed = results['created'] + results['updated']
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Import completed!\n'
+                    f'Successfully imported {results["created"]} new users\n'
+                    f'Updated {results["updated"]} existing users\n'
+                    f'Linked {results["referrals"]} referrals '
+                    f'({results["missing_referrers"]} referrers not found)\n'
+                    f'Errors: {results["errors"]}\n'
+                    f'Speed: {processed / elapsed if elapsed else 0:.0f} users/s\n'
+                    f'Total users in database: {TelegramUser.objects.count()}'
                 )
+            )
 
         except FileNotFoundError:
             self.stdout.write(
@@ -135,7 +100,19 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.ERROR(f'Invalid JSON format in file: {file_path}')
             )
+            self.report_partial(progress, options['atomic'])
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Error: {str(e)}')
-            )
\ No newline at end of file
+            )
+            self.report_partial(progress, options['atomic'])
+
+    def report_partial(self, progress, atomic):
+        """Що лишилося в базі після обірваного імпорту"""
+        if atomic:
+            self.stdout.write(self.style.WARNING('Import rolled back: no users were saved'))
+        elif progress['chunks']:
+            self.stdout.write(self.style.WARNING(
+                f'Committed before the error: {progress["chunks"]} chunks, {progress["users"]} users. '
+                f'Forward referrals and referral counts were not updated - re-run the import to finish'
+            ))
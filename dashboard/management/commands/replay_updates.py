@@ -0,0 +1,48 @@
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from telegram import Bot, Update
+from dashboard.services.membership_events import apply_membership_events, parse_membership_update
+
+class Command(BaseCommand):
+    help = 'Програє записані оновлення chat_member / my_chat_member з JSON файлу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('json_file', type=str,
+                            help='Файл з оновленнями: JSON масив, один об\'єкт або JSON Lines')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Лише показати події, без запису в базу')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['json_file'], 'r', encoding='utf-8') as file:
+                content = file.read().strip()
+        except OSError as e:
+            raise CommandError(f'Помилка читання файлу: {e}')
+
+        if content.startswith('['):
+            raw_updates = json.loads(content)
+        elif content.startswith('{') and '\n{' not in content:
+            raw_updates = [json.loads(content)]
+        else:
+            raw_updates = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+        # Бот потрібен лише для десеріалізації, запитів до API немає
+        bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
+        events = []
+        for raw in raw_updates:
+            event = parse_membership_update(Update.de_json(raw, bot))
+            if event:
+                events.append(event)
+                self.stdout.write(f'{event.date:%d.%m.%Y %H:%M:%S} {event.user_id}: {event.action_type}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Оновлень: {len(raw_updates)}, подій: {len(events)}'))
+            return
+
+        results = apply_membership_events(events)
+        self.stdout.write(self.style.SUCCESS(
+            f"Оновлень: {len(raw_updates)}, подій: {len(events)}\n"
+            f"Застосовано: {results['applied']}, без змін: {results['skipped']}, "
+            f"невідомих користувачів: {results['unknown_users']}"
+        ))
@@ -1,10 +1,12 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 import asyncio
 import logging
 import sys
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from dashboard.services.bot_app import build_application, stop_application
+from dashboard.services.metrics import start_publishing
+from dashboard.services.telegram_transport import closing_transport
 
 # Налаштування логування
 logging.basicConfig(
@@ -16,54 +18,75 @@ logger = logging.getLogger(__name__)
 # Глобальна змінна для зберігання додатку
 application = None
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обробник команди /start"""
-    user = update.effective_user
-    await update.message.reply_text(
-        f'Привіт, {user.first_name}! 👋\n'
-        f'Це тестовий бот для адмін-панелі.'
-    )
-
 async def stop_bot():
     """Зупинка бота"""
     global application
     if application:
-        await application.stop()
-        await application.shutdown()
+        await stop_application(application)
 
 async def run_bot(token: str):
-    """Запуск бота"""
+    """Запуск бота (polling)"""
     global application
-    
-    # Створюємо додаток
-    application = (
-        Application.builder()
-        .token(token)
-        .build()
-    )
 
-    # Додаємо обробники
-    application.add_handler(CommandHandler("start", start_command))
+    # Створюємо додаток
+    application = build_application(token)
 
-    # Запускаємо бота
+    # Запускаємо бота. run_polling() сам керує циклом подій, тому всередині
+    # вже запущеного циклу - initialize/start і Updater окремо
     await application.initialize()
     await application.start()
-    await application.run_polling(drop_pending_updates=True)
+    # chat_member приходять лише якщо явно їх запросити (бот має бути адміном чату)
+    await application.updater.start_polling(drop_pending_updates=True, allowed_updates=Update.ALL_TYPES)
+    start_publishing('bot')
+    await asyncio.Event().wait()
+
+async def set_webhook(token: str, max_connections: int, drop_pending_updates: bool):
+    """Реєстрація webhook: далі оновлення приймає Django (telegram/webhook)"""
+    bot_application = build_application(token, webhook=True)
+    async with bot_application:
+        await bot_application.bot.set_webhook(
+            url=settings.TELEGRAM_WEBHOOK_URL,
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=max_connections,
+            drop_pending_updates=drop_pending_updates,
+        )
+        info = await bot_application.bot.get_webhook_info()
+    return info
 
 class Command(BaseCommand):
     help = 'Запускає Telegram бота'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--set-webhook', action='store_true',
+                            help='Зареєструвати TELEGRAM_WEBHOOK_URL замість polling і вийти')
+        parser.add_argument('--max-connections', type=int, default=40,
+                            help="Скільки одночасних з'єднань Telegram відкриває до webhook (1-100)")
+        parser.add_argument('--drop-pending-updates', action='store_true',
+                            help='Відкинути оновлення, що накопичились до реєстрації webhook')
+
     def handle(self, *args, **options):
         """Запуск команди"""
         # Налаштування для Windows
         if sys.platform == 'win32':
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-        self.stdout.write(self.style.SUCCESS('Запуск бота...'))
-
         # Отримуємо токен з налаштувань
         token = settings.TELEGRAM_BOT_TOKEN
 
+        if options['set_webhook']:
+            if not settings.TELEGRAM_WEBHOOK_URL or not settings.TELEGRAM_WEBHOOK_SECRET:
+                raise CommandError('Потрібні TELEGRAM_WEBHOOK_URL і TELEGRAM_WEBHOOK_SECRET')
+            info = asyncio.run(closing_transport(
+                set_webhook(token, options['max_connections'], options['drop_pending_updates'])
+            ))
+            self.stdout.write(self.style.SUCCESS(
+                f'Webhook: {info.url}, в черзі Telegram {info.pending_update_count} оновлень'
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Запуск бота...'))
+
         # Створюємо новий event loop
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
@@ -78,4 +101,4 @@ class Command(BaseCommand):
         finally:
             # Закриваємо event loop
             loop.close()
-            self.stdout.write(self.style.SUCCESS('Бот зупинений'))
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS('Бот зупинений'))
@@ -0,0 +1,36 @@
+import asyncio
+import sys
+from django.core.management.base import BaseCommand
+from dashboard.services.broadcast_queue import BroadcastWorker
+from dashboard.services.metrics import start_publishing
+from dashboard.services.telegram_transport import closing_transport
+
+class Command(BaseCommand):
+    help = 'Запускає воркер черги розсилок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Кількість доставок між контрольними точками')
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help='Пауза між перевірками черги, с')
+        parser.add_argument('--once', action='store_true',
+                            help='Обробити наявні розсилки і завершити роботу')
+
+    def handle(self, *args, **options):
+        # Налаштування для Windows
+        if sys.platform == 'win32':
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+        worker = BroadcastWorker(chunk_size=options['chunk_size'])
+        worker.POLL_INTERVAL = options['poll_interval']
+
+        self.stdout.write(self.style.SUCCESS('Воркер розсилок запущено'))
+        try:
+            asyncio.run(self.run(worker, options['once']))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('\nОтримано сигнал завершення...'))
+        self.stdout.write(self.style.SUCCESS('Воркер розсилок зупинено'))
+
+    async def run(self, worker, once):
+        start_publishing('broadcast_worker')
+        await closing_transport(worker.run(once=once))
@@ -0,0 +1,60 @@
+import asyncio
+import sys
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from dashboard.services.metrics import start_publishing
+from dashboard.services.status_checker import StatusChecker
+from dashboard.services.status_scheduler import StatusScheduler
+from dashboard.services.telegram_transport import closing_transport
+
+class Command(BaseCommand):
+    help = 'Безперервна перевірка статусів користувачів, від найбільш застарілих'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=int, default=600,
+                            help='Запитів до Telegram API за хвилину')
+        parser.add_argument('--churn-days', type=float, default=7,
+                            help='Скільки днів вважати видалення бота/вихід з чату нещодавнім')
+        parser.add_argument('--churn-recheck-hours', type=float, default=6,
+                            help='Як часто перевіряти нещодавно відпалих користувачів, год')
+        parser.add_argument('--recheck-hours', type=float, default=24,
+                            help='Як часто перевіряти решту користувачів, год')
+        parser.add_argument('--reconcile-chat', action='store_true',
+                            help='Також перевіряти участь у чаті через get_chat_member '
+                                 '(за замовчуванням її оновлюють chat_member події бота)')
+        parser.add_argument('--once', action='store_true', help='Виконати один цикл і завершити')
+
+    def handle(self, *args, **options):
+        # Налаштування для Windows
+        if sys.platform == 'win32':
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+        scheduler = StatusScheduler(
+            checker=StatusChecker(check_chat=options['reconcile_chat']),
+            budget_per_minute=options['budget'],
+            churn_window=timedelta(days=options['churn_days']),
+            churn_recheck=timedelta(hours=options['churn_recheck_hours']),
+            recheck=timedelta(hours=options['recheck_hours']),
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Планувальник перевірок запущено: до {scheduler.users_per_cycle} користувачів за хвилину'
+        ))
+        try:
+            asyncio.run(self.run(scheduler, options['once']))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('\nОтримано сигнал завершення...'))
+
+    async def run(self, scheduler, once):
+        start_publishing('status_scheduler')
+        await closing_transport(scheduler.run(once=once, on_cycle=self.report))
+
+    def report(self, results, elapsed):
+        if not results['checked']:
+            self.stdout.write('Немає користувачів для перевірки')
+            return
+        self.stdout.write(
+            f"Перевірено {results['checked']} за {elapsed:.1f} с: "
+            f"активні боти {results['active_bot']}, неактивні {results['inactive_bot']}, "
+            f"у чаті {results['in_chat']}, не в чаті {results['not_in_chat']}"
+        )
@@ -0,0 +1,40 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.services.statistics_snapshot import build_snapshots, pending_range
+
+class Command(BaseCommand):
+    help = 'Щоденні рядки Statistics: попередній день + зміни за день (без повного перерахунку)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat,
+                            help='Перший день бекфілу (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat,
+                            help='Останній день бекфілу (за замовчуванням сьогодні)')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Повторювати кожні N секунд (0 - один запуск, напр. з cron)')
+
+    def handle(self, *args, **options):
+        while True:
+            self.snapshot(options['date_from'], options['date_to'])
+            if not options['interval']:
+                return
+            # Наступні запуски - лише дописування нових днів
+            options['date_from'] = options['date_to'] = None
+            time.sleep(options['interval'])
+
+    def snapshot(self, date_from, date_to):
+        first_day, last_day = pending_range()
+        first_day = date_from or first_day
+        last_day = date_to or last_day
+        if first_day > last_day:
+            raise CommandError(f'Порожній діапазон: {first_day} > {last_day}')
+
+        started = time.perf_counter()
+        rows = build_snapshots(first_day, last_day)
+        latest = rows[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано {len(rows)} днів ({first_day} - {last_day}) за {time.perf_counter() - started:.2f} с. '
+            f'{latest.date}: користувачів {latest.total_bot_users}, у чаті {latest.chat_members}, '
+            f'відкриттів WebApp {latest.webapp_opens}'
+        ))
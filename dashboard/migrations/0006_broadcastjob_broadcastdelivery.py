@@ -0,0 +1,55 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_alter_statistics_chat_members'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('photo_url', models.URLField(blank=True, null=True)),
+                ('buttons', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('queued', 'В черзі'), ('running', 'Виконується'), ('done', 'Завершено'), ('failed', 'Помилка')], default='queued', max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('sent', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('inactive', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Broadcast Job',
+                'verbose_name_plural': 'Broadcast Jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Очікує'), ('sending', 'Відправляється'), ('sent', 'Відправлено'), ('failed', 'Помилка'), ('skipped', 'Пропущено')], default='pending', max_length=20)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.telegramuser')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='dashboard.broadcastjob')),
+            ],
+            options={
+                'verbose_name': 'Broadcast Delivery',
+                'verbose_name_plural': 'Broadcast Deliveries',
+                'indexes': [models.Index(fields=['job', 'status'], name='delivery_job_status_idx')],
+                'unique_together': {('job', 'user')},
+            },
+        ),
+    ]
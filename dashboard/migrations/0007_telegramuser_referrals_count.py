@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_referrals_count(apps, schema_editor):
+    TelegramUser = apps.get_model('dashboard', 'TelegramUser')
+    counts = (
+        TelegramUser.objects.filter(referred_by=OuterRef('pk'))
+        .order_by()
+        .values('referred_by')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    TelegramUser.objects.update(referrals_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_broadcastjob_broadcastdelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramuser',
+            name='referrals_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_referrals_count, migrations.RunPython.noop),
+    ]
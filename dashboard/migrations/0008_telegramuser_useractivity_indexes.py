@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_telegramuser_referrals_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(fields=['is_active', 'in_chat', '-join_date'], name='tguser_status_join_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(fields=['-join_date'], name='tguser_join_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(fields=['language'], name='tguser_language_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(condition=models.Q(('deleted_bot_at__isnull', False)), fields=['deleted_bot_at'], name='tguser_deleted_bot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(condition=models.Q(('left_chat_at__isnull', False)), fields=['left_chat_at'], name='tguser_left_chat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(fields=['last_status_check'], name='tguser_last_check_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['-created_at'], name='activity_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['action_type', '-created_at'], name='activity_type_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_telegramuser_useractivity_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='photo_file_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
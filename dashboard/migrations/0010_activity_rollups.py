@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_broadcastjob_photo_file_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(max_length=50)),
+                ('language', models.CharField(max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+            ],
+            options={
+                'verbose_name': 'Daily Activity Rollup',
+                'verbose_name_plural': 'Daily Activity Rollups',
+                'unique_together': {('day', 'action_type', 'language')},
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(max_length=50)),
+                ('language', models.CharField(max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('hour', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Hourly Activity Rollup',
+                'verbose_name_plural': 'Hourly Activity Rollups',
+                'unique_together': {('hour', 'action_type', 'language')},
+            },
+        ),
+    ]
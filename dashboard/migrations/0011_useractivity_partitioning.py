@@ -0,0 +1,138 @@
+# Generated by Django 5.0.1 on 2026-10-18 20:00
+
+import django.db.models.deletion
+from datetime import date
+from django.db import migrations, models
+from django.utils import timezone
+
+# Скільки місяців наперед створювати партиції (далі - compact_activity)
+MONTHS_AHEAD = 2
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def index_sql(schema_editor, model):
+    """Індекси з Meta та індекс зовнішнього ключа user, як їх створює Django"""
+    statements = [index.create_sql(model, schema_editor) for index in model._meta.indexes]
+    statements.append(schema_editor._create_index_sql(model, fields=[model._meta.get_field('user')]))
+    return statements
+
+
+def partition_useractivity(apps, schema_editor):
+    """PostgreSQL: UserActivity -> таблиця, партиційована по місяцях за created_at"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    UserActivity = apps.get_model('dashboard', 'UserActivity')
+    TelegramUser = apps.get_model('dashboard', 'TelegramUser')
+    table = UserActivity._meta.db_table
+    plain = f'{table}_plain'
+
+    schema_editor.execute(f'ALTER TABLE {table} RENAME TO {plain}')
+    schema_editor.execute(f'CREATE SEQUENCE {table}_part_id_seq')
+    # Ключ партиціювання має входити в первинний ключ
+    schema_editor.execute(f'''
+        CREATE TABLE {table} (
+            id bigint NOT NULL DEFAULT nextval('{table}_part_id_seq'),
+            action_type varchar(50) NOT NULL,
+            created_at timestamp with time zone NOT NULL,
+            user_id bigint NOT NULL,
+            CONSTRAINT {table}_part_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT {table}_part_user_fk FOREIGN KEY (user_id)
+                REFERENCES {TelegramUser._meta.db_table} (id) DEFERRABLE INITIALLY DEFERRED
+        ) PARTITION BY RANGE (created_at)
+    ''')
+    schema_editor.execute(f'ALTER SEQUENCE {table}_part_id_seq OWNED BY {table}.id')
+    schema_editor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(created_at) FROM {plain}')
+        oldest = cursor.fetchone()[0]
+    month = (oldest or timezone.now()).date().replace(day=1)
+    last = timezone.now().date().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = next_month(last)
+    while month <= last:
+        schema_editor.execute(
+            f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        )
+        month = next_month(month)
+
+    schema_editor.execute(
+        f'INSERT INTO {table} (id, action_type, created_at, user_id) '
+        f'SELECT id, action_type, created_at, user_id FROM {plain}'
+    )
+    schema_editor.execute(
+        f"SELECT setval('{table}_part_id_seq', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+    )
+    schema_editor.execute(f'DROP TABLE {plain}')
+    for statement in index_sql(schema_editor, UserActivity):
+        schema_editor.execute(statement)
+
+
+def unpartition_useractivity(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    UserActivity = apps.get_model('dashboard', 'UserActivity')
+    table = UserActivity._meta.db_table
+    partitioned = f'{table}_partitioned'
+
+    schema_editor.execute(f'ALTER TABLE {table} RENAME TO {partitioned}')
+    # Імена індексів спільні для схеми - звільняємо їх для звичайної таблиці
+    for index in UserActivity._meta.indexes:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index.name}')
+    fk_index = schema_editor._create_index_name(table, ['user_id'], suffix='')
+    schema_editor.execute(f'DROP INDEX IF EXISTS {fk_index}')
+
+    schema_editor.create_model(UserActivity)
+    schema_editor.execute(
+        f'INSERT INTO {table} (id, action_type, created_at, user_id) '
+        f'SELECT id, action_type, created_at, user_id FROM {partitioned}'
+    )
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+    )
+    schema_editor.execute(f'DROP TABLE {partitioned} CASCADE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivityArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('action_type', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Archived User Activity',
+                'verbose_name_plural': 'Archived User Activities',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='useractivity',
+            name='activity_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['-created_at', '-id'], name='activity_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='useractivityarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.telegramuser'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivityarchive',
+            index=models.Index(fields=['-created_at', '-id'], name='activity_archive_created_idx'),
+        ),
+        migrations.RunPython(partition_useractivity, unpartition_useractivity),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.1 on 2026-10-18 21:00
+
+from django.db import migrations, models
+
+TABLE = 'dashboard_telegramuser'
+
+def create_username_index(apps, schema_editor):
+    # Індекс під username__istartswith (UPPER(...) LIKE 'X%' на PostgreSQL, LIKE на SQLite)
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS tguser_username_trgm_idx ON {TABLE} '
+            f'USING gin (UPPER(username::text) gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS tguser_username_nocase_idx ON {TABLE} (username COLLATE NOCASE)'
+        )
+
+def drop_username_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS tguser_username_trgm_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP INDEX IF EXISTS tguser_username_nocase_idx')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_useractivity_partitioning'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='telegramuser',
+            name='tguser_status_join_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='telegramuser',
+            name='tguser_join_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='telegramuser',
+            name='tguser_language_idx',
+        ),
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(fields=['is_active', 'in_chat', '-join_date', '-id'], name='tguser_status_join_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(fields=['-join_date', '-id'], name='tguser_join_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='telegramuser',
+            index=models.Index(fields=['language', '-join_date', '-id'], name='tguser_language_idx'),
+        ),
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
@@ -8,6 +8,8 @@ class TelegramUser(models.Model):
     tokens = models.IntegerField(default=5000)
     referral_code = models.CharField(max_length=50, unique=True, blank=True, null=True)
     referred_by = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='referrals')
+    # Денормалізована кількість рефералів (підтримується сигналами та імпортом)
+    referrals_count = models.IntegerField(default=0, db_index=True)
     join_date = models.DateTimeField(default=timezone.now)
     last_webapp_open = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
@@ -20,6 +22,21 @@ class TelegramUser(models.Model):
     class Meta:
         verbose_name = "Telegram User"
         verbose_name_plural = "Telegram Users"
+        indexes = [
+            # UserStatusFilter + сортування списку в адмінці
+            models.Index(fields=['is_active', 'in_chat', '-join_date', '-id'], name='tguser_status_join_idx'),
+            # Сортування за замовчуванням і діапазони дат на дашборді;
+            # -id - стабільний порядок адмінки (і курсор «далі») без сортування в пам'яті
+            models.Index(fields=['-join_date', '-id'], name='tguser_join_date_idx'),
+            models.Index(fields=['language', '-join_date', '-id'], name='tguser_language_idx'),
+            # Часткові індекси: лише рядки, де дата заповнена
+            models.Index(fields=['deleted_bot_at'], name='tguser_deleted_bot_idx',
+                         condition=models.Q(deleted_bot_at__isnull=False)),
+            models.Index(fields=['left_chat_at'], name='tguser_left_chat_idx',
+                         condition=models.Q(left_chat_at__isnull=False)),
+            # Планувальник перевірок: IS NULL (ніколи не перевірені) і найдавніше перевірені
+            models.Index(fields=['last_status_check'], name='tguser_last_check_idx'),
+        ]
 
     def __str__(self):
         return f"{self.username or self.user_id}"
@@ -45,12 +62,131 @@ class Statistics(models.Model):
 
 class UserActivity(models.Model):
     user = models.ForeignKey(TelegramUser, on_delete=models.CASCADE)
-    action_type = models.CharField(max_length=50)  # 'start', 'webapp_open', 'join_chat', 'leave_chat'
+    action_type = models.CharField(max_length=50)  # 'start', 'webapp_open', 'join_chat', 'leave_chat', 'bot_blocked', 'bot_unblocked', 'message_received'
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "User Activity"
         verbose_name_plural = "User Activities"
+        indexes = [
+            # id - для сталого порядку сторінок адмінки без додаткового сортування
+            models.Index(fields=['-created_at', '-id'], name='activity_created_idx'),
+            models.Index(fields=['action_type', '-created_at'], name='activity_type_created_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user}: {self.action_type} at {self.created_at}"
\ No newline at end of file
+        return f"{self.user}: {self.action_type} at {self.created_at}"
+
+class UserActivityArchive(models.Model):
+    """Старі події UserActivity там, де немає партиціювання (SQLite).
+
+    Рядки переносить compact_activity з тими ж id; на PostgreSQL архівом
+    служать місячні партиції самої UserActivity.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(TelegramUser, on_delete=models.CASCADE, related_name='+')
+    action_type = models.CharField(max_length=50)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Archived User Activity"
+        verbose_name_plural = "Archived User Activities"
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='activity_archive_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.action_type} at {self.created_at}"
+
+class BroadcastJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'В черзі'),
+        ('running', 'Виконується'),
+        ('done', 'Завершено'),
+        ('failed', 'Помилка'),
+    ]
+
+    text = models.TextField()
+    photo_url = models.URLField(blank=True, null=True)
+    # file_id фото після першого завантаження (повторні відправки без завантаження з URL)
+    photo_file_id = models.CharField(max_length=255, blank=True, null=True)
+    buttons = models.JSONField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total = models.IntegerField(default=0)
+    sent = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    inactive = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Broadcast Job"
+        verbose_name_plural = "Broadcast Jobs"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Розсилка #{self.pk} ({self.get_status_display()})"
+
+class BroadcastDelivery(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Очікує'),
+        ('sending', 'Відправляється'),
+        ('sent', 'Відправлено'),
+        ('failed', 'Помилка'),
+        ('skipped', 'Пропущено'),
+    ]
+
+    job = models.ForeignKey(BroadcastJob, on_delete=models.CASCADE, related_name='deliveries')
+    user = models.ForeignKey(TelegramUser, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.CharField(max_length=255, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Broadcast Delivery"
+        verbose_name_plural = "Broadcast Deliveries"
+        unique_together = [('job', 'user')]
+        indexes = [
+            models.Index(fields=['job', 'status'], name='delivery_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} -> {self.user_id}: {self.status}"
+
+class ActivityRollup(models.Model):
+    """Кількість подій за інтервал у розрізі дії та мови користувача.
+
+    Будується командою build_rollups з UserActivity; 'new_user' - нові
+    користувачі за join_date. Графіки дашборду читають лише ці таблиці.
+    """
+    action_type = models.CharField(max_length=50)
+    language = models.CharField(max_length=10)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+class HourlyActivityRollup(ActivityRollup):
+    hour = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Hourly Activity Rollup"
+        verbose_name_plural = "Hourly Activity Rollups"
+        unique_together = [('hour', 'action_type', 'language')]
+
+    def __str__(self):
+        return f"{self.hour}: {self.action_type}/{self.language} = {self.count}"
+
+class DailyActivityRollup(ActivityRollup):
+    day = models.DateField()
+
+    class Meta:
+        verbose_name = "Daily Activity Rollup"
+        verbose_name_plural = "Daily Activity Rollups"
+        unique_together = [('day', 'action_type', 'language')]
+
+    def __str__(self):
+        return f"{self.day}: {self.action_type}/{self.language} = {self.count}"
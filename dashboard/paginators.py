@@ -0,0 +1,150 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Field, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+def estimate_table_rows(queryset) -> Optional[int]:
+    """Оцінка кількості рядків таблиці без COUNT(*)"""
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        # Статистика планувальника; для партиційованої таблиці - сума партицій
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT SUM(GREATEST(c.reltuples, 0)) FROM pg_class c '
+                'WHERE c.oid = %s::regclass '
+                'OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)',
+                [model._meta.db_table, model._meta.db_table]
+            )
+            estimate = cursor.fetchone()[0]
+        return int(estimate) if estimate else None
+    # Інші бази: діапазон первинного ключа. Два окремі запити - MIN і MAX
+    # разом в одному SELECT SQLite рахує скануванням індексу
+    pks = model._default_manager.using(queryset.db).values_list('pk', flat=True)
+    low = pks.order_by('pk').first()
+    if low is None:
+        return 0
+    return pks.order_by('-pk').first() - low + 1
+
+class EstimatedCountPaginator(Paginator):
+    """Пагінатор адмінки для великих таблиць.
+
+    Без фільтрів - оцінка розміру таблиці замість COUNT(*). З фільтрами -
+    COUNT по підзапиту з LIMIT, тобто не більше EXACT_LIMIT + 1 рядків:
+    далі сторінки все одно ніхто не гортає.
+    """
+
+    EXACT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_table_rows(queryset)
+            if estimate is not None and estimate > self.EXACT_LIMIT:
+                return estimate
+        return queryset.order_by().values('pk')[:self.EXACT_LIMIT + 1].count()
+
+CURSOR_VAR = 'after'
+
+def keyset_fields(queryset) -> Optional[List[Tuple[Field, bool]]]:
+    """(поле, за спаданням) для keyset-пагінації або None.
+
+    Сортування має складатися з непорожніх полів моделі й закінчуватися
+    унікальним (pk, який ChangeList додає для сталого порядку, або user_id).
+    """
+    meta = queryset.model._meta
+    fields = []
+    seen = set()
+    for name in queryset.query.order_by:
+        if not isinstance(name, str):
+            return None
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        try:
+            field = meta.pk if name == 'pk' else meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.name in seen:
+            continue
+        if field.null or field.is_relation:
+            return None
+        seen.add(field.name)
+        fields.append((field, descending))
+        if field.unique:
+            return fields
+    return None
+
+def encode_cursor(obj, fields: List[Tuple[Field, bool]]) -> str:
+    return '|'.join(field.value_to_string(obj) for field, _ in fields)
+
+def cursor_filter(cursor: str, fields: List[Tuple[Field, bool]]) -> Q:
+    """Рядки після курсора в лексикографічному порядку полів.
+
+    Для (-join_date, -pk): join_date <= v AND (join_date < v OR pk < pk_v).
+    Перша умова - діапазон по індексу, решта відкидає вже показані рядки.
+    """
+    raw_values = cursor.rsplit('|', len(fields) - 1)
+    if len(raw_values) != len(fields):
+        raise ValueError(cursor)
+    values = []
+    for (field, _), raw in zip(fields, raw_values):
+        value = field.to_python(raw)
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        values.append(value)
+
+    after = Q()
+    for i in reversed(range(len(fields))):
+        field, descending = fields[i]
+        strict = Q(**{f"{field.name}__{'lt' if descending else 'gt'}": values[i]})
+        after = strict if i == len(fields) - 1 else strict | (Q(**{field.name: values[i]}) & after)
+    first, descending = fields[0]
+    return Q(**{f"{first.name}__{'lte' if descending else 'gte'}": values[0]}) & after
+
+class KeysetChangeList(ChangeList):
+    """ChangeList з посиланням «далі» за курсором замість OFFSET.
+
+    Номери сторінок лишаються для перших сторінок, а глибше список
+    гортається через ?after=<значення>|<pk>: кожна сторінка - діапазон
+    індексу, незалежно від того, наскільки далеко від початку.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.keyset_cursor = request.GET.get(CURSOR_VAR)
+        self.keyset_next_url = None
+        self.keyset_first_url = self.get_query_string(remove=[CURSOR_VAR, PAGE_VAR])
+
+        fields = keyset_fields(self.queryset)
+        if fields is None:
+            if self.keyset_cursor:
+                raise IncorrectLookupParameters
+            return
+        if self.keyset_cursor:
+            try:
+                after = cursor_filter(self.keyset_cursor, fields)
+            except (ValueError, ValidationError):
+                raise IncorrectLookupParameters
+            self.result_list = self.queryset.filter(after)[:self.list_per_page]
+            self.multi_page = True
+            self.can_show_all = False
+        elif not self.multi_page or self.show_all:
+            return
+
+        rows = list(self.result_list)
+        if len(rows) == self.list_per_page:
+            self.keyset_next_url = self.get_query_string(
+                {CURSOR_VAR: encode_cursor(rows[-1], fields)}, [PAGE_VAR]
+            )
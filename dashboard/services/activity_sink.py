@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Union
+from django.db import IntegrityError
+from ..models import TelegramUser, UserActivity
+from .metrics import DB_FLUSH, DB_FLUSH_ROWS
+
+logger = logging.getLogger(__name__)
+
+class ActivitySink:
+    """Буфер записів UserActivity з пакетним записом через bulk_create.
+
+    Буфер скидається, коли набирається FLUSH_SIZE записів або минає
+    FLUSH_INTERVAL секунд. close() (або вихід з async with) гарантує
+    запис залишку. created_at проставляється в момент запису пачки.
+
+    Якщо база недоступна, пачка повертається в буфер і пишеться наступним
+    скиданням; буфер обмежений MAX_BUFFER записами (зайві найстаріші
+    відкидаються з попередженням у лог).
+    """
+
+    def __init__(self, flush_size: int = 500, flush_interval: float = 1.0, max_buffer: int = 50000):
+        self.FLUSH_SIZE = flush_size
+        self.FLUSH_INTERVAL = flush_interval
+        self.MAX_BUFFER = max_buffer
+        self.written = 0
+        self._buffer: List[UserActivity] = []
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def start(self):
+        """Запуск періодичного скидання буфера"""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            await self.flush()
+
+    async def add(self, user: Union[TelegramUser, int], action_type: str):
+        """Додавання події (user - користувач або його pk)"""
+        user_pk = user.pk if isinstance(user, TelegramUser) else user
+        self._buffer.append(UserActivity(user_id=user_pk, action_type=action_type))
+        if len(self._buffer) >= self.FLUSH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        """Запис накопичених подій одним bulk_create"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            try:
+                started = time.perf_counter()
+                await asyncio.to_thread(self.write, rows)
+                DB_FLUSH.observe(time.perf_counter() - started, sink='activity')
+                DB_FLUSH_ROWS.inc(len(rows), sink='activity')
+                self.written += len(rows)
+            except Exception:
+                logger.exception(f"Error writing {len(rows)} activity rows, keeping them for the next flush")
+                self._requeue(rows)
+
+    def write(self, rows: List[UserActivity]):
+        try:
+            UserActivity.objects.bulk_create(rows, batch_size=self.FLUSH_SIZE)
+        except IntegrityError:
+            # Напр. користувача вже видалили - пишемо по одному, відкидаючи лише такі рядки
+            for row in rows:
+                try:
+                    UserActivity.objects.bulk_create([row])
+                except IntegrityError:
+                    logger.warning(f"Dropping activity {row.action_type} of missing user {row.user_id}")
+
+    def _requeue(self, rows: List[UserActivity]):
+        self._buffer = rows + self._buffer
+        overflow = len(self._buffer) - self.MAX_BUFFER
+        if overflow > 0:
+            logger.warning(f"Activity buffer is full, dropping {overflow} oldest rows")
+            del self._buffer[:overflow]
+
+    async def close(self):
+        """Зупинка таймера та запис залишку буфера"""
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        await self.flush()
+        if self._buffer:
+            logger.error(f"{len(self._buffer)} activity rows were not written")
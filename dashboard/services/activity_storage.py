@@ -0,0 +1,144 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from django.db import connection, transaction
+from django.utils import timezone
+from ..models import HourlyActivityRollup, UserActivity, UserActivityArchive
+from .rollups import build_rollups
+from .statistics_snapshot import day_start
+
+TABLE = UserActivity._meta.db_table
+PARTITION_PREFIX = f'{TABLE}_p'
+ARCHIVE_BATCH = 5000
+
+def is_partitioned() -> bool:
+    """UserActivity - партиційована таблиця PostgreSQL (міграція 0011)"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABLE])
+        return cursor.fetchone() is not None
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def partitions() -> Dict[str, date]:
+    """Місячні партиції: ім'я -> перший день місяця"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    result = {}
+    for name in names:
+        if name.startswith(PARTITION_PREFIX):
+            year, month = name[len(PARTITION_PREFIX):].split('_')
+            result[name] = date(int(year), int(month), 1)
+    return result
+
+def ensure_partitions(months_ahead: int = 2) -> List[str]:
+    """Партиції на поточний і наступні місяці, щоб нові події не падали в DEFAULT"""
+    if not is_partitioned():
+        return []
+    existing = set(partitions().values())
+    created = []
+    month = month_start(timezone.localdate())
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            name = f'{PARTITION_PREFIX}{month:%Y_%m}'
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE {name} PARTITION OF {TABLE} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+                )
+            created.append(name)
+        month = next_month(month)
+    return created
+
+def archive_activity(before: datetime, batch_size: int = ARCHIVE_BATCH) -> int:
+    """SQLite та інші бази без партицій: старі події -> UserActivityArchive пачками.
+
+    Гаряча таблиця лишається малою, тому адмінка й вставки не сповільнюються.
+    На PostgreSQL нічого не робить - старі місяці вже в окремих партиціях.
+    """
+    if is_partitioned():
+        return 0
+    archive_table = UserActivityArchive._meta.db_table
+    columns = 'id, user_id, action_type, created_at'
+    moved = 0
+    while True:
+        ids = list(
+            UserActivity.objects.filter(created_at__lt=before)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return moved
+        # Пачка - діапазон id, тому INSERT ... SELECT і DELETE без списку id у запиті
+        params = [ids[0], ids[-1], connection.ops.adapt_datetimefield_value(before)]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {archive_table} ({columns}) SELECT {columns} FROM {TABLE} '
+                f'WHERE id BETWEEN %s AND %s AND created_at < %s',
+                params
+            )
+            cursor.execute(f'DELETE FROM {TABLE} WHERE id BETWEEN %s AND %s AND created_at < %s', params)
+        moved += len(ids)
+
+def drop_old_events(before: datetime) -> int:
+    """Видалення сирих подій старших за before (їхні денні підсумки вже в DailyActivityRollup)"""
+    if not is_partitioned():
+        deleted = 0
+        while True:
+            ids = list(
+                UserActivityArchive.objects.filter(created_at__lt=before)
+                .values_list('id', flat=True)[:ARCHIVE_BATCH]
+            )
+            if not ids:
+                break
+            deleted += UserActivityArchive.objects.filter(id__in=ids).delete()[0]
+        # Події, які ще не встигли потрапити в архів
+        return deleted + UserActivity.objects.filter(created_at__lt=before).delete()[0]
+
+    # Цілі місяці - DROP партиції без сканування рядків
+    deleted = 0
+    cutoff_month = month_start(timezone.localtime(before).date())
+    for name, month in partitions().items():
+        if next_month(month) <= cutoff_month:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {name}')
+                deleted += cursor.fetchone()[0]
+                cursor.execute(f'DROP TABLE {name}')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE}_default WHERE created_at < %s',
+            [connection.ops.adapt_datetimefield_value(before)]
+        )
+        deleted += cursor.rowcount
+    return deleted
+
+def compact_activity(archive_after: timedelta, keep_raw: timedelta, keep_hourly: timedelta,
+                     now: Optional[datetime] = None) -> Dict[str, int]:
+    """Обслуговування історії активності.
+
+    1. Агрегати добудовуються до зараз - денні підсумки старих подій
+       зберігаються в DailyActivityRollup назавжди.
+    2. Події старші за archive_after переносяться в архів (без партицій).
+    3. Сирі події старші за keep_raw і погодинні агрегати старші за
+       keep_hourly видаляються (межі - початок дня).
+    """
+    now = now or timezone.now()
+    results = {'partitions': len(ensure_partitions())}
+    build_rollups(until=now)
+    results['archived'] = archive_activity(now - archive_after)
+
+    raw_cutoff = day_start(timezone.localtime(now - keep_raw).date())
+    results['deleted'] = drop_old_events(raw_cutoff)
+
+    hourly_cutoff = day_start(timezone.localtime(now - keep_hourly).date())
+    results['hourly_deleted'] = HourlyActivityRollup.objects.filter(hour__lt=hourly_cutoff).delete()[0]
+    return results
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+from django.conf import settings
+from telegram import Update
+from telegram.ext import Application, BaseUpdateProcessor, ChatMemberHandler, CommandHandler, ContextTypes
+from .db_executor import run_db
+from .membership_events import apply_membership_events, parse_membership_update
+from .metrics import QUEUE_DEPTH, REGISTRY, make_request, start_publishing
+from .registrations import RegistrationBuffer, make_registration
+from .telegram_transport import close_transport, shared_request
+from .user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_UPDATES = REGISTRY.counter(
+    'webhook_updates_total', 'Оновлення, що прийшли на webhook, за результатом', ['outcome'])
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обробник команди /start: відповідь одразу, реєстрація - пакетним записом у фоні"""
+    user = update.effective_user
+    await update.message.reply_text(
+        f'Привіт, {user.first_name}! 👋\n'
+        f'Це тестовий бот для адмін-панелі.'
+    )
+    context.bot_data['registrations'].add(make_registration(user, context.args or []))
+
+async def membership_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обробник chat_member / my_chat_member: статуси оновлюються без опитування API"""
+    event = parse_membership_update(update)
+    if not event:
+        return
+    registrations = context.bot_data['registrations']
+    if registrations.is_pending(event.user_id):
+        # Вступ у чат одразу після /start: спершу записуємо реєстрацію, інакше користувача ще немає
+        await registrations.flush()
+    # Більшість учасників великого чату бота не запускали - їх відсіює кеш. Локальне
+    # "немає в базі" перевіряється заново (спільний рівень або база): користувача
+    # міг щойно створити інший процес, а пропущена подія вже не повториться
+    if await user_cache().aget(event.user_id, recheck_unknown=True) is None:
+        return
+    results = await run_db(apply_membership_events, [event])
+    logger.info(f"{event.action_type} для {event.user_id}: {results}")
+
+def update_key(update: object) -> Optional[int]:
+    """Чий це апдейт: id користувача (або чату), в межах якого важливий порядок"""
+    if not isinstance(update, Update):
+        return None
+    if update.chat_member:
+        # Вхід/вихід учасника - за ним самим, а не за адміном, який це зробив
+        return update.chat_member.new_chat_member.user.id
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """Паралельна обробка оновлень із порядком у межах одного користувача.
+
+    Оновлення різних користувачів обробляються одночасно (не більше
+    concurrency), а від одного - строго по черзі. Спершу черга
+    користувача, потім слот: оновлення, що чекає попереднє від того ж
+    користувача, не займає слот і не гальмує інших. Семафор базового
+    process_update() бере слот до черги користувача, тому слоти тут власні,
+    а базовому класу передається практично необмежений ліміт.
+    """
+
+    UNLIMITED = 2 ** 31 - 1
+
+    def __init__(self, concurrency: int):
+        if concurrency < 1:
+            raise ValueError('concurrency must be a positive integer')
+        super().__init__(self.UNLIMITED)
+        self.concurrency = concurrency
+        self._slots = asyncio.BoundedSemaphore(concurrency)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._waiting: Dict[int, int] = {}
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            # asyncio.Lock віддається в порядку очікування - тобто надходження оновлень
+            async with lock, self._slots:
+                await coroutine
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+class WebhookUpdateProcessor(OrderedUpdateProcessor):
+    """Обмеження на оновлення, прийняті webhook і ще не оброблені.
+
+    Application забирає оновлення з update_queue одразу і створює задачу
+    на кожне, тому розмір черги сам нічого не обмежує. Лічильник тут:
+    +1 при прийомі (try_accept), -1 після обробки.
+    """
+
+    def __init__(self, concurrency: int, max_pending: int):
+        super().__init__(concurrency)
+        self.max_pending = max_pending
+        self.pending = 0
+
+    def try_accept(self) -> bool:
+        if self.pending >= self.max_pending:
+            return False
+        self.pending += 1
+        return True
+
+    async def do_process_update(self, update, coroutine):
+        try:
+            await super().do_process_update(update, coroutine)
+        finally:
+            self.pending -= 1
+            QUEUE_DEPTH.set(self.pending, queue='webhook')
+
+def build_application(token: Optional[str] = None, api_url: Optional[str] = None,
+                      webhook: bool = False, queue_size: Optional[int] = None,
+                      concurrency: Optional[int] = None) -> Application:
+    """Application бота з обробниками - для polling (run_bot) або webhook.
+
+    Оновлення обробляються паралельно (не більше concurrency одночасно),
+    але по черзі для кожного користувача. У режимі webhook оновлення кладе
+    view, тому Updater (getUpdates) не потрібен, а прийнятих і ще не
+    оброблених оновлень не більше queue_size.
+
+    Запити до Bot API (крім довгого getUpdates) йдуть спільним пулом
+    з'єднань циклу подій, тому викликається лише з запущеного циклу.
+    """
+    builder = (
+        Application.builder()
+        .token(token or settings.TELEGRAM_BOT_TOKEN)
+        .base_url(api_url or settings.TELEGRAM_API_URL)
+        .request(shared_request())
+    )
+    concurrency = concurrency or settings.TELEGRAM_BOT_CONCURRENCY
+    if webhook:
+        builder = builder.updater(None).concurrent_updates(WebhookUpdateProcessor(
+            concurrency, queue_size or settings.TELEGRAM_WEBHOOK_QUEUE_SIZE,
+        ))
+    else:
+        builder = (
+            builder.get_updates_request(make_request())
+            .concurrent_updates(OrderedUpdateProcessor(concurrency))
+        )
+    application = builder.build()
+    application.bot_data['registrations'] = RegistrationBuffer()
+
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(ChatMemberHandler(membership_update, ChatMemberHandler.ANY_CHAT_MEMBER))
+    return application
+
+async def stop_application(application: Application):
+    """Зупинка Application: дообробка оновлень, запис буфера реєстрацій, shutdown"""
+    if application.updater and application.updater.running:
+        await application.updater.stop()
+    if application.running:
+        await application.stop()
+    await application.bot_data['registrations'].close()
+    await application.shutdown()
+    await close_transport()
+
+# Application для webhook - окремий на кожен цикл подій (у ASGI-сервері він один)
+_webhook_apps: Dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+
+async def _start_webhook_application() -> Application:
+    application = build_application(webhook=True)
+    await application.initialize()
+    await application.start()
+    start_publishing('webhook')
+    logger.info("Webhook-обробник оновлень запущений")
+    return application
+
+async def webhook_application() -> Application:
+    """Запущений Application у поточному циклі подій; стартує з першим оновленням"""
+    loop = asyncio.get_running_loop()
+    startup = _webhook_apps.get(loop)
+    if startup is None or (startup.done() and (startup.cancelled() or startup.exception())):
+        startup = _webhook_apps[loop] = loop.create_task(_start_webhook_application())
+    # shield: скасований запит не скасовує запуск для інших
+    return await asyncio.shield(startup)
+
+async def stop_webhook_application():
+    """Дообробка черги та зупинка Application поточного циклу подій"""
+    startup = _webhook_apps.pop(asyncio.get_running_loop(), None)
+    if startup is None:
+        return
+    await stop_application(await startup)
+
+def enqueue_update(application: Application, data: Dict) -> bool:
+    """Оновлення в чергу Application; False - вже забагато необроблених"""
+    update = Update.de_json(data, application.bot)
+    processor = application.update_processor
+    if not processor.try_accept():
+        WEBHOOK_UPDATES.inc(outcome='rejected')
+        return False
+    application.update_queue.put_nowait(update)
+    WEBHOOK_UPDATES.inc(outcome='accepted')
+    QUEUE_DEPTH.set(processor.pending, queue='webhook')
+    return True
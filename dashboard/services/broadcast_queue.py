@@ -0,0 +1,243 @@
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Dict, Optional
+from django.db import connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from ..models import BroadcastJob, BroadcastDelivery, UserActivity
+from .message_sender import MessageSender
+from .metrics import DB_FLUSH, DB_FLUSH_ROWS, QUEUE_DEPTH, REGISTRY
+from .progress import ProgressTracker
+
+logger = logging.getLogger(__name__)
+
+def enqueue_broadcast(users: QuerySet, text: str, photo_url: Optional[str] = None,
+                      buttons: Optional[dict] = None) -> BroadcastJob:
+    """Постановка розсилки в чергу: створюємо задачу та список доставок без відправки"""
+    with transaction.atomic():
+        job = BroadcastJob.objects.create(text=text, photo_url=photo_url or None, buttons=buttons)
+
+        deliveries = []
+        for user_pk, is_active in users.order_by('pk').values_list('pk', 'is_active').iterator(chunk_size=2000):
+            job.total += 1
+            if not is_active:
+                job.inactive += 1
+            deliveries.append(BroadcastDelivery(
+                job=job,
+                user_id=user_pk,
+                status='pending' if is_active else 'skipped'
+            ))
+            if len(deliveries) >= 1000:
+                BroadcastDelivery.objects.bulk_create(deliveries)
+                deliveries = []
+        BroadcastDelivery.objects.bulk_create(deliveries)
+
+        job.save(update_fields=['total', 'inactive'])
+    return job
+
+def progress_task_id(job_pk: int) -> str:
+    return f'broadcast-{job_pk}'
+
+def job_progress(job: BroadcastJob) -> Dict:
+    """Стан розсилки з лічильників у базі - коли воркер не публікує прогрес у спільний кеш"""
+    statuses = {'queued': 'running', 'running': 'running', 'done': 'done', 'failed': 'failed'}
+    return {
+        'id': progress_task_id(job.pk),
+        'kind': 'broadcast',
+        'title': f'Розсилка #{job.pk}',
+        'status': statuses.get(job.status, job.status),
+        'total': job.total,
+        'done': job.sent + job.failed + job.inactive,
+        'counts': {'sent': job.sent, 'failed': job.failed, 'inactive': job.inactive},
+        'rate': 0.0,
+        'eta': None,
+        'started_at': job.started_at.timestamp() if job.started_at else None,
+        'updated_at': (job.heartbeat_at or job.created_at).timestamp(),
+        'message': job.error,
+    }
+
+class BroadcastWorker:
+    """Воркер, що розсилає задачі з черги частинами з контрольною точкою після кожної"""
+
+    def __init__(self, sender: Optional[MessageSender] = None, chunk_size: int = 500):
+        self.sender = sender or MessageSender()
+        self.CHUNK_SIZE = chunk_size
+        self.POLL_INTERVAL = 5  # секунд між перевірками черги
+        self.STALE_AFTER = timedelta(minutes=5)  # задача без heartbeat вважається покинутою
+        # heartbeat іде окремо від контрольних точок: частина з паузами RetryAfter
+        # може тривати довше за STALE_AFTER, і задачу захопив би інший воркер
+        self.HEARTBEAT_INTERVAL = self.STALE_AFTER.total_seconds() / 5
+
+    def claim_next_job(self) -> Optional[BroadcastJob]:
+        """Захоплення нової розсилки або покинутої іншим воркером"""
+        now = timezone.now()
+        candidates = BroadcastJob.objects.filter(
+            Q(status='queued') | Q(status='running', heartbeat_at__lt=now - self.STALE_AFTER)
+        ).order_by('created_at')
+
+        for job in candidates[:10]:
+            # Умовний UPDATE - лише один воркер отримає задачу
+            claimed = BroadcastJob.objects.filter(
+                pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at
+            ).update(
+                status='running',
+                heartbeat_at=now,
+                started_at=Coalesce(F('started_at'), Value(now))
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+        return None
+
+    def recover_interrupted(self, job: BroadcastJob) -> int:
+        """Доставки, перервані посеред відправки, не повторюємо, щоб уникнути дублікатів"""
+        with transaction.atomic():
+            interrupted = job.deliveries.filter(status='sending').update(
+                status='failed',
+                error='Interrupted: delivery state unknown'
+            )
+            if interrupted:
+                BroadcastJob.objects.filter(pk=job.pk).update(failed=F('failed') + interrupted)
+        return interrupted
+
+    def fetch_chunk(self, job: BroadcastJob) -> Dict[int, tuple]:
+        """Наступна частина доставок: {chat_id: (delivery_pk, user_pk)}.
+
+        Повертаються лише доставки, які цей воркер перевів з 'pending' у
+        'sending', тож два воркери однієї розсилки не надішлють те саме двічі.
+        """
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        while True:
+            with transaction.atomic():
+                pending = job.deliveries.filter(status='pending').order_by('pk')
+                if skip_locked:
+                    # Рядки, які зараз захоплює інший воркер, пропускаються
+                    pending = pending.select_for_update(skip_locked=True, of=('self',))
+                rows = list(pending.values_list('pk', 'user_id', 'user__user_id')[:self.CHUNK_SIZE])
+                if not rows:
+                    return {}
+                if skip_locked:
+                    claimed = {row[0] for row in rows}
+                    BroadcastDelivery.objects.filter(pk__in=claimed, status='pending').update(status='sending')
+                else:
+                    # Без блокування рядків (SQLite) - умовний UPDATE кожного рядка
+                    claimed = {
+                        delivery_pk for delivery_pk, _, _ in rows
+                        if BroadcastDelivery.objects.filter(pk=delivery_pk, status='pending')
+                        .update(status='sending')
+                    }
+            if claimed:
+                return {chat_id: (delivery_pk, user_pk)
+                        for delivery_pk, user_pk, chat_id in rows if delivery_pk in claimed}
+
+    def checkpoint(self, job: BroadcastJob, outcomes: Dict[tuple, bool]):
+        """Збереження результатів частини однією транзакцією"""
+        now = timezone.now()
+        sent = [key for key, success in outcomes.items() if success]
+        failed = [key for key, success in outcomes.items() if not success]
+
+        with DB_FLUSH.time(sink='broadcast_checkpoint'), transaction.atomic():
+            BroadcastDelivery.objects.filter(pk__in=[pk for pk, _ in sent]).update(status='sent', sent_at=now)
+            BroadcastDelivery.objects.filter(pk__in=[pk for pk, _ in failed]).update(status='failed')
+            UserActivity.objects.bulk_create([
+                UserActivity(user_id=user_pk, action_type='message_received')
+                for _, user_pk in sent
+            ])
+            BroadcastJob.objects.filter(pk=job.pk).update(
+                sent=F('sent') + len(sent),
+                failed=F('failed') + len(failed),
+                heartbeat_at=now
+            )
+        DB_FLUSH_ROWS.inc(len(outcomes), sink='broadcast_checkpoint')
+
+    def touch(self, job: BroadcastJob):
+        BroadcastJob.objects.filter(pk=job.pk, status='running').update(heartbeat_at=timezone.now())
+
+    async def keep_alive(self, job: BroadcastJob):
+        """heartbeat розсилки, поки воркер нею зайнятий"""
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            try:
+                await asyncio.to_thread(self.touch, job)
+            except Exception:
+                logger.exception(f"Broadcast #{job.pk}: heartbeat failed")
+
+    def finish_job(self, job: BroadcastJob, status: str, error: str = ''):
+        BroadcastJob.objects.filter(pk=job.pk).update(
+            status=status,
+            error=error,
+            finished_at=timezone.now()
+        )
+
+    async def process_job(self, job: BroadcastJob):
+        """Відправка розсилки до кінця, починаючи з останньої контрольної точки"""
+        await asyncio.to_thread(self.recover_interrupted, job)
+
+        pending = 0
+        if REGISTRY.enabled:
+            # Глибина черги: один COUNT на розсилку, далі віднімаємо відправлені
+            pending = await asyncio.to_thread(job.deliveries.filter(status='pending').count)
+            QUEUE_DEPTH.set(pending, queue='broadcast_pending')
+
+        # Лічильники з бази - прогрес продовжується з контрольної точки
+        await asyncio.to_thread(job.refresh_from_db, fields=['sent', 'failed', 'inactive'])
+        counts = {'sent': job.sent, 'failed': job.failed, 'inactive': job.inactive}
+        progress = await asyncio.to_thread(
+            ProgressTracker, progress_task_id(job.pk), 'broadcast',
+            f'Розсилка #{job.pk}', job.total, sum(counts.values())
+        )
+
+        heartbeat = asyncio.create_task(self.keep_alive(job))
+        try:
+            # Розмітка і фото готуються один раз на всю розсилку
+            message = await self.sender.prepare(job.text, job.photo_url, job.buttons, job.photo_file_id)
+            if message.photo_file_id and message.photo_file_id != job.photo_file_id:
+                # Після перезапуску воркера фото не завантажується знову
+                job.photo_file_id = message.photo_file_id
+                await asyncio.to_thread(
+                    BroadcastJob.objects.filter(pk=job.pk).update, photo_file_id=message.photo_file_id
+                )
+
+            while True:
+                chunk = await asyncio.to_thread(self.fetch_chunk, job)
+                if not chunk:
+                    break
+
+                outcomes = {}
+
+                async def collect(chat_id: int, success: bool):
+                    outcomes[chunk[chat_id]] = success
+                    counts['sent' if success else 'failed'] += 1
+                    progress.update(sum(counts.values()), counts)
+
+                await self.sender.deliver(chunk.keys(), on_result=collect, message=message)
+                await asyncio.to_thread(self.checkpoint, job, outcomes)
+                pending -= len(chunk)
+                QUEUE_DEPTH.set(max(pending, 0), queue='broadcast_pending')
+
+        except Exception as e:
+            logger.exception(f"Broadcast #{job.pk} failed")
+            await asyncio.to_thread(self.finish_job, job, 'failed', str(e))
+            await asyncio.to_thread(progress.fail, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+
+        await asyncio.to_thread(self.finish_job, job, 'done')
+        await asyncio.to_thread(
+            progress.finish, f"Надіслано {counts['sent']}, помилок {counts['failed']}, неактивних {counts['inactive']}"
+        )
+
+    async def run(self, once: bool = False):
+        """Обробка черги: по одній розсилці за раз"""
+        while True:
+            job = await asyncio.to_thread(self.claim_next_job)
+            if job:
+                await self.process_job(job)
+                continue
+            if once:
+                return
+            await asyncio.sleep(self.POLL_INTERVAL)
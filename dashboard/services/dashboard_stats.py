@@ -0,0 +1,95 @@
+from datetime import datetime, time, timedelta
+from typing import Dict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, Q, Value
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import TelegramUser
+
+DASHBOARD_CACHE_KEY = 'dashboard:stats'
+
+def _day_start(day) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def invalidate_dashboard_stats():
+    """Скидання кешу дашборду після зміни користувачів"""
+    cache.delete(DASHBOARD_CACHE_KEY)
+
+def compute_dashboard_stats(days: int = 7) -> Dict:
+    """Статистика дашборду кількома агрегатними запитами замість COUNT на кожну цифру"""
+    today = timezone.localdate()
+    period_start = _day_start(today - timedelta(days=days - 1))
+
+    # Всі загальні лічильники - один запит з умовною агрегацією
+    totals = TelegramUser.objects.aggregate(
+        total_users=Count('id'),
+        active_users=Count('id', filter=Q(is_active=True)),
+        in_chat_users=Count('id', filter=Q(in_chat=True)),
+        not_in_chat_users=Count('id', filter=Q(in_chat=False)),
+    )
+
+    # Нові та видалені по днях - один запит (UNION ALL двох групувань)
+    new_by_day = (
+        TelegramUser.objects.filter(join_date__gte=period_start)
+        .annotate(day=TruncDate('join_date'))
+        .values('day')
+        .annotate(new_users=Count('id'), deleted_users=Value(0, output_field=IntegerField()))
+        .values_list('day', 'new_users', 'deleted_users')
+    )
+    deleted_by_day = (
+        TelegramUser.objects.filter(deleted_bot_at__gte=period_start)
+        .annotate(day=TruncDate('deleted_bot_at'))
+        .values('day')
+        .annotate(new_users=Value(0, output_field=IntegerField()), deleted_users=Count('id'))
+        .values_list('day', 'new_users', 'deleted_users')
+    )
+    series = {}
+    for day, new_users, deleted_users in new_by_day.union(deleted_by_day, all=True):
+        counts = series.setdefault(day, [0, 0])
+        counts[0] += new_users
+        counts[1] += deleted_users
+
+    daily_activity = []
+    for i in range(days):
+        day = today - timedelta(days=i)
+        new_users, deleted_users = series.get(day, (0, 0))
+        daily_activity.append({
+            'date': day,
+            'new_users': new_users,
+            'deleted_users': deleted_users,
+        })
+
+    # Статистика по мовах
+    language_stats = list(
+        TelegramUser.objects.values('language').annotate(count=Count('id')).order_by('-count')
+    )
+
+    # Статистика рефералів
+    referral_stats = list(
+        TelegramUser.objects.filter(referrals_count__gt=0)
+        .order_by('-referrals_count')
+        .values('user_id', 'username', refs_count=F('referrals_count'))[:5]
+    )
+
+    return {
+        'active_users': totals['active_users'],
+        'new_users_today': daily_activity[0]['new_users'],
+        'deleted_users_today': daily_activity[0]['deleted_users'],
+        'daily_activity': daily_activity,
+        'language_stats': language_stats,
+        'chat_stats': {
+            'in_chat': totals['in_chat_users'],
+            'not_in_chat': totals['not_in_chat_users'],
+        },
+        'referral_stats': referral_stats,
+        'total_users': totals['total_users'],
+    }
+
+def get_dashboard_stats() -> Dict:
+    """Статистика дашборду з короткочасного кешу"""
+    stats = cache.get(DASHBOARD_CACHE_KEY)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_CACHE_KEY, stats, settings.DASHBOARD_CACHE_TTL)
+    return stats
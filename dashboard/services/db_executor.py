@@ -0,0 +1,43 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+from django.conf import settings
+from django.db import connection
+
+T = TypeVar('T')
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _call(func: Callable[..., T], *args, **kwargs) -> T:
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # З'єднання потоку живе між викликами; після помилки - перевідкриття
+        if connection.errors_occurred:
+            connection.close_if_unusable_or_obsolete()
+
+def db_executor() -> ThreadPoolExecutor:
+    """Пул потоків для ORM у боті: кожен потік тримає своє з'єднання з базою,
+    тож BOT_DB_THREADS - це і розмір пулу з'єднань"""
+    global _executor
+    if _executor is None:
+        # SQLite допускає одного записувача: паралельні транзакції падають з "database is locked"
+        workers = 1 if connection.vendor == 'sqlite' else settings.BOT_DB_THREADS
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bot-db')
+    return _executor
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """Синхронний виклик ORM з async-коду через пул db_executor.
+
+    На відміну від asyncio.to_thread (спільний пул на десятки потоків),
+    одночасних запитів до бази не більше, ніж з'єднань.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor(), functools.partial(_call, func, *args, **kwargs))
+
+def shutdown_db_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,147 @@
+import gzip
+import io
+import json
+import re
+from typing import Any, BinaryIO, Dict, Iterator, TextIO, Tuple
+
+GZIP_MAGIC = b'\x1f\x8b'
+WHITESPACE = re.compile(r'\s*')
+
+# (user_id з файлу, словник з даними користувача)
+UserRecord = Tuple[str, Dict]
+
+def open_import_file(file: BinaryIO) -> TextIO:
+    """Текстовий потік для файлу імпорту; gzip розпізнається за сигнатурою"""
+    magic = file.read(2)
+    file.seek(0)
+    if magic == GZIP_MAGIC:
+        file = gzip.GzipFile(fileobj=file)
+    return io.TextIOWrapper(file, encoding='utf-8')
+
+def is_json_lines(name: str) -> bool:
+    name = name.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return name.endswith(('.jsonl', '.ndjson'))
+
+class JsonUsersReader:
+    """Потоковий розбір {"users": {"<id>": {...}, ...}, "statistics": {...}}.
+
+    Файл читається блоками, кожен користувач декодується через raw_decode
+    окремо, тому в пам'яті лише поточний блок і один запис, а не весь файл.
+    Інші ключі верхнього рівня (statistics, total_spots...) зберігаються в
+    self.extra і доступні після проходу по users().
+    """
+
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, file: TextIO, block_size: int = BLOCK_SIZE):
+        self.file = file
+        self.block_size = block_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.extra: Dict[str, Any] = {}
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        block = self.file.read(self.block_size)
+        if not block:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f'Expecting one of {chars!r}', self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def _decode(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Значення обрізане кінцем блоку - дочитуємо
+                if self._fill():
+                    continue
+                raise
+            # Число в самому кінці блоку теж може бути обрізаним
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _iter_object(self) -> Iterator[Tuple[str, Any]]:
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            yield key, self._decode()
+            if self._expect(',}') == '}':
+                return
+
+    def users(self) -> Iterator[UserRecord]:
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            if key == 'users':
+                yield from self._iter_object()
+            else:
+                self.extra[key] = self._decode()
+            if self._expect(',}') == '}':
+                return
+
+class JsonLinesUsersReader:
+    """JSON Lines: один користувач на рядок.
+
+    Рядок - або {"user_id": 123, "username": ...}, або {"123": {...}}.
+    Рядки без користувачів (напр. {"statistics": {...}}) потрапляють у self.extra.
+    """
+
+    def __init__(self, file: TextIO):
+        self.file = file
+        self.extra: Dict[str, Any] = {}
+
+    def users(self) -> Iterator[UserRecord]:
+        for line in self.file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'user_id' in record:
+                user_id = record.pop('user_id')
+                yield str(user_id), record
+                continue
+            for key, value in record.items():
+                if key.lstrip('-').isdigit():
+                    yield key, value
+                else:
+                    self.extra[key] = value
+
+def users_reader(file: BinaryIO, name: str = ''):
+    """Читач за форматом файлу: JSON Lines за розширенням, інакше JSON"""
+    text = open_import_file(file)
+    if is_json_lines(name):
+        return JsonLinesUsersReader(text)
+    return JsonUsersReader(text)
@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from telegram import ChatMember, Update
+from django.conf import settings
+from django.db import transaction
+from ..models import TelegramUser, UserActivity
+from .metrics import DB_FLUSH, DB_FLUSH_ROWS
+
+IN_CHAT_STATUSES = (ChatMember.MEMBER, ChatMember.ADMINISTRATOR, ChatMember.OWNER)
+
+class MembershipEvent(NamedTuple):
+    user_id: int  # Telegram id користувача
+    action_type: str  # 'join_chat', 'leave_chat', 'bot_blocked', 'bot_unblocked'
+    date: datetime
+
+def _is_in_chat(member: ChatMember) -> bool:
+    if member.status == ChatMember.RESTRICTED:
+        return member.is_member
+    return member.status in IN_CHAT_STATUSES
+
+def _is_target_chat(chat) -> bool:
+    chat_id = str(settings.TELEGRAM_CHAT_ID)
+    if chat_id.startswith('@'):
+        return bool(chat.username) and chat.username.lower() == chat_id[1:].lower()
+    return str(chat.id) == chat_id
+
+def parse_membership_update(update: Update) -> Optional[MembershipEvent]:
+    """Перетворення chat_member / my_chat_member оновлення на подію"""
+    if update.chat_member and _is_target_chat(update.chat_member.chat):
+        # Користувач увійшов у чат або вийшов з нього
+        change = update.chat_member
+        was_in_chat = _is_in_chat(change.old_chat_member)
+        is_in_chat = _is_in_chat(change.new_chat_member)
+        if was_in_chat == is_in_chat:
+            return None
+        action_type = 'join_chat' if is_in_chat else 'leave_chat'
+        return MembershipEvent(change.new_chat_member.user.id, action_type, change.date)
+
+    if update.my_chat_member and update.my_chat_member.chat.type == 'private':
+        # Користувач заблокував або розблокував бота
+        change = update.my_chat_member
+        was_blocked = change.old_chat_member.status == ChatMember.BANNED
+        is_blocked = change.new_chat_member.status == ChatMember.BANNED
+        if was_blocked == is_blocked:
+            return None
+        action_type = 'bot_blocked' if is_blocked else 'bot_unblocked'
+        return MembershipEvent(change.chat.id, action_type, change.date)
+
+    return None
+
+def _apply(user: TelegramUser, event: MembershipEvent) -> List[str]:
+    """Застосування переходу до користувача; повертає змінені поля"""
+    if event.action_type == 'join_chat' and not user.in_chat:
+        user.in_chat = True
+        user.chat_join_date = event.date
+        user.left_chat_at = None
+        return ['in_chat', 'chat_join_date', 'left_chat_at']
+    if event.action_type == 'leave_chat' and user.in_chat:
+        user.in_chat = False
+        user.left_chat_at = event.date
+        return ['in_chat', 'left_chat_at']
+    if event.action_type == 'bot_blocked' and user.is_active:
+        user.is_active = False
+        user.deleted_bot_at = event.date
+        return ['is_active', 'deleted_bot_at']
+    if event.action_type == 'bot_unblocked' and not user.is_active:
+        user.is_active = True
+        user.deleted_bot_at = None
+        return ['is_active', 'deleted_bot_at']
+    return []
+
+def apply_membership_events(events: Iterable[MembershipEvent]) -> Dict[str, int]:
+    """Інкрементальне оновлення статусів за подіями.
+
+    Повторне застосування тієї ж події нічого не змінює, тому записані
+    оновлення можна безпечно "програвати" знову. Користувачі, яких немає
+    в базі (не запускали бота), пропускаються.
+    """
+    events = list(events)
+    results = {'applied': 0, 'skipped': 0, 'unknown_users': 0}
+    if not events:
+        return results
+
+    with DB_FLUSH.time(sink='membership'), transaction.atomic():
+        users = TelegramUser.objects.select_for_update().in_bulk(
+            {event.user_id for event in events}, field_name='user_id'
+        )
+
+        changed_users = {}
+        activities = []
+        for event in events:
+            user = users.get(event.user_id)
+            if user is None:
+                results['unknown_users'] += 1
+                continue
+
+            changed_fields = _apply(user, event)
+            if not changed_fields:
+                results['skipped'] += 1
+                continue
+
+            changed_users.setdefault(user.pk, (user, set()))[1].update(changed_fields)
+            activities.append(UserActivity(user=user, action_type=event.action_type))
+            results['applied'] += 1
+
+        for user, fields in changed_users.values():
+            user.save(update_fields=sorted(fields))
+        UserActivity.objects.bulk_create(activities)
+
+    DB_FLUSH_ROWS.inc(len(activities), sink='membership')
+    return results
@@ -1,109 +1,256 @@
 import asyncio
-from typing import List, Dict, Optional
+import logging
+from typing import AsyncIterable, Awaitable, Callable, Iterable, List, Dict, NamedTuple, Optional, Union
 from telegram import Bot, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.error import TelegramError, RetryAfter
 from django.conf import settings
+from django.db.models.query import QuerySet
 from django.utils import timezone
-from ..models import TelegramUser, UserActivity
+from ..models import TelegramUser
+from .activity_sink import ActivitySink
+from .metrics import MESSAGES, QUEUE_DEPTH
+from .rate_limiter import RateLimiter
+from .telegram_transport import get_bot
+from .user_stream import iter_list_batches, iter_user_batches
+
+logger = logging.getLogger(__name__)
+
+class PreparedMessage(NamedTuple):
+    """Вміст розсилки, підготовлений один раз для всіх отримувачів"""
+    text: str
+    photo_url: Optional[str]
+    photo_file_id: Optional[str]  # фото вже на серверах Telegram
+    reply_markup: Optional[InlineKeyboardMarkup]
 
 class MessageSender:
-    def __init__(self, bot_token: str = None):
+    def __init__(self, bot_token: str = None, api_url: str = None,
+                 rate_limiter: Optional[RateLimiter] = None):
         self.bot_token = bot_token or settings.TELEGRAM_BOT_TOKEN
-        self.bot = None
-        self.DELAY_BETWEEN_MESSAGES = 0.05  # 50ms між повідомленнями
-        self.MESSAGES_PER_SECOND = 30  # максимум повідомлень в секунду
+        self.api_url = api_url or settings.TELEGRAM_API_URL
+        self.MESSAGES_PER_SECOND = 30  # глобальний ліміт Telegram
+        self.MAX_CONCURRENT_SENDS = 20  # скільки запитів одночасно "в польоті"
+        self.MAX_RETRIES = 3  # скільки разів повторюємо після RetryAfter
+        self.PAGE_SIZE = 1000  # користувачів на один запит до бази
+        self.rate_limiter = rate_limiter or RateLimiter(self.MESSAGES_PER_SECOND)
+        # Службовий чат, куди фото розсилки завантажується один раз
+        self.media_cache_chat_id = settings.TELEGRAM_MEDIA_CACHE_CHAT_ID
+        self.media_cache: Dict[str, str] = {}  # URL фото -> file_id
+        self._media_chat_warned = False
+
+    @property
+    def bot(self) -> Bot:
+        """Bot на спільному пулі з'єднань поточного циклу подій"""
+        return get_bot(self.bot_token, self.api_url)
 
     async def initialize(self):
-        """Ініціалізація бота"""
-        self.bot = Bot(token=self.bot_token)
+        """Бот зі спільного пулу; з'єднання відкриваються з першим запитом"""
+        get_bot(self.bot_token, self.api_url)
+
+    @staticmethod
+    def build_markup(buttons: Optional[dict]) -> Optional[InlineKeyboardMarkup]:
+        """Розмітка клавіатури з словника buttons"""
+        if not buttons:
+            return None
+        keyboard = []
+        for row in buttons.get('inline_keyboard', []):
+            keyboard_row = []
+            for button in row:
+                keyboard_row.append(
+                    InlineKeyboardButton(
+                        text=button['text'],
+                        url=button.get('url'),
+                        callback_data=button.get('callback_data')
+                    )
+                )
+            keyboard.append(keyboard_row)
+        return InlineKeyboardMarkup(keyboard)
+
+    async def upload_photo(self, photo_url: str) -> Optional[str]:
+        """Одноразове завантаження фото в службовий чат; повертає file_id"""
+        if photo_url in self.media_cache:
+            return self.media_cache[photo_url]
+        if not self.media_cache_chat_id:
+            if not self._media_chat_warned:
+                self._media_chat_warned = True
+                logger.warning(
+                    f"TELEGRAM_MEDIA_CACHE_CHAT_ID is not set: photo {photo_url} is not uploaded in advance, "
+                    f"recipients get it by URL until the first send returns a file_id"
+                )
+            return None
+
+        await self.initialize()
+        await self.rate_limiter.acquire(self.media_cache_chat_id)
+        try:
+            message = await self.bot.send_photo(
+                chat_id=self.media_cache_chat_id,
+                photo=photo_url,
+                disable_notification=True
+            )
+        except TelegramError:
+            logger.exception(f"Error uploading photo {photo_url}, sending it by URL instead")
+            return None
+
+        file_id = message.photo[-1].file_id
+        self.media_cache[photo_url] = file_id
+        return file_id
+
+    async def prepare(self, text: str, photo_url: Optional[str] = None, buttons: Optional[dict] = None,
+                      photo_file_id: Optional[str] = None) -> PreparedMessage:
+        """Підготовка повідомлення один раз на розсилку: розмітка і file_id фото"""
+        if photo_url and not photo_file_id:
+            photo_file_id = await self.upload_photo(photo_url)
+        return PreparedMessage(
+            text=text,
+            photo_url=photo_url,
+            photo_file_id=photo_file_id,
+            reply_markup=self.build_markup(buttons),
+        )
 
-    async def send_message(self, user_id: int, text: str, photo_url: Optional[str] = None, 
+    async def send_message(self, user_id: int, text: str, photo_url: Optional[str] = None,
                          buttons: Optional[dict] = None) -> bool:
         """Відправка повідомлення користувачу"""
+        message = PreparedMessage(text, photo_url, None, self.build_markup(buttons))
+        return await self.send_prepared(user_id, message)
+
+    async def send_prepared(self, user_id: int, message: PreparedMessage) -> bool:
+        """Відправка підготовленого повідомлення (без повторної побудови розмітки)"""
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self.rate_limiter.acquire(user_id)
+            # file_id, якщо фото вже є на серверах Telegram, інакше URL
+            photo = message.photo_file_id or self.media_cache.get(message.photo_url, message.photo_url)
+            try:
+                if photo:
+                    sent = await self.bot.send_photo(
+                        chat_id=user_id,
+                        photo=photo,
+                        caption=message.text,
+                        reply_markup=message.reply_markup
+                    )
+                    if message.photo_url and sent.photo and message.photo_url not in self.media_cache:
+                        # Наступні відправки використають file_id замість URL
+                        self.media_cache[message.photo_url] = sent.photo[-1].file_id
+                else:
+                    await self.bot.send_message(
+                        chat_id=user_id,
+                        text=message.text,
+                        reply_markup=message.reply_markup
+                    )
+                return True
+
+            except RetryAfter as e:
+                # Ліміт досягнуто - зупиняємо всіх відправників, а не лише цей запит
+                self.rate_limiter.pause(e.retry_after)
+
+            except TelegramError as e:
+                logger.warning(f"Error sending message to {user_id}: {e}")
+                return False
+
+        logger.warning(f"Error sending message to {user_id}: retries exhausted")
+        return False
+
+    async def deliver(self, chat_ids: Union[Iterable[int], AsyncIterable[int]], text: Optional[str] = None,
+                      photo_url: Optional[str] = None,
+                      buttons: Optional[dict] = None,
+                      on_result: Optional[Callable[[int, bool], Awaitable]] = None,
+                      message: Optional[PreparedMessage] = None) -> Dict:
+        """Конкурентна доставка повідомлення пулом воркерів"""
+        results = {'sent': 0, 'failed': 0}
+
+        await self.initialize()
+        if message is None:
+            message = await self.prepare(text, photo_url, buttons)
+
+        queue = asyncio.Queue(maxsize=self.MAX_CONCURRENT_SENDS * 2)
+
+        async def worker():
+            while True:
+                chat_id = await queue.get()
+                if chat_id is None:
+                    return
+
+                QUEUE_DEPTH.set(queue.qsize(), queue='send')
+                # Помилка одного отримувача не зупиняє воркер: інакше, коли
+                # впадуть усі, queue.put() нижче чекатиме вічно
+                try:
+                    success = await self.send_prepared(chat_id, message)
+                except Exception:
+                    logger.exception(f"Error sending message to {chat_id}")
+                    success = False
+                results['sent' if success else 'failed'] += 1
+                MESSAGES.inc(outcome='sent' if success else 'failed')
+                if on_result:
+                    try:
+                        await on_result(chat_id, success)
+                    except Exception:
+                        logger.exception(f"Error recording result for {chat_id}")
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.MAX_CONCURRENT_SENDS)]
         try:
-            if buttons:
-                # Створюємо розмітку клавіатури
-                keyboard = []
-                for row in buttons.get('inline_keyboard', []):
-                    keyboard_row = []
-                    for button in row:
-                        keyboard_row.append(
-                            InlineKeyboardButton(
-                                text=button['text'],
-                                url=button.get('url'),
-                                callback_data=button.get('callback_data')
-                            )
-                        )
-                    keyboard.append(keyboard_row)
-                reply_markup = InlineKeyboardMarkup(keyboard)
+            if hasattr(chat_ids, '__aiter__'):
+                async for chat_id in chat_ids:
+                    await queue.put(chat_id)
             else:
-                reply_markup = None
-
-            if photo_url:
-                await self.bot.send_photo(
-                    chat_id=user_id,
-                    photo=photo_url,
-                    caption=text,
-                    reply_markup=reply_markup
-                )
-            else:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=text,
-                    reply_markup=reply_markup
-                )
-            return True
-            
-        except RetryAfter as e:
-            # Якщо досягнуто ліміт, чекаємо вказаний час
-            await asyncio.sleep(e.retry_after)
-            return await self.send_message(user_id, text, photo_url, buttons)
-            
-        except TelegramError as e:
-            print(f"Error sending message to {user_id}: {e}")
-            return False
-
-    async def send_bulk_message(self, users: List[TelegramUser], text: str, 
-                              photo_url: Optional[str] = None, 
-                              buttons: Optional[dict] = None) -> Dict:
-        """Масова розсилка повідомлень"""
+                for chat_id in chat_ids:
+                    await queue.put(chat_id)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            QUEUE_DEPTH.set(0, queue='send')
+        finally:
+            for task in workers:
+                task.cancel()
+
+        return results
+
+    async def send_bulk_message(self, users: Union[QuerySet, List[TelegramUser]], text: str,
+                              photo_url: Optional[str] = None,
+                              buttons: Optional[dict] = None,
+                              progress_callback: Optional[Callable[[int, Dict], None]] = None) -> Dict:
+        """Масова розсилка повідомлень (QuerySet читається потоком).
+
+        progress_callback(оброблено, лічильники sent/failed/inactive) викликається
+        після кожного повідомлення, тому має бути швидким (ProgressTracker.update).
+        """
+        if isinstance(users, QuerySet):
+            total = await asyncio.to_thread(users.count)
+            pages = iter_user_batches(users, self.PAGE_SIZE, ['user_id', 'is_active'])
+        else:
+            total = len(users)
+            pages = iter_list_batches(users, self.PAGE_SIZE)
+
         results = {
-            'total': len(users),
+            'total': total,
             'sent': 0,
             'failed': 0,
             'inactive': 0
         }
 
-        await self.initialize()
+        # user_id -> pk лише для повідомлень "в польоті", а не для всієї аудиторії
+        in_flight = {}
 
-        # Розбиваємо користувачів на групи
-        batch_size = self.MESSAGES_PER_SECOND
-        for i in range(0, len(users), batch_size):
-            batch = users[i:i + batch_size]
-            
-            for user in batch:
-                if not user.is_active:
-                    results['inactive'] += 1
-                    continue
-
-                success = await self.send_message(user.user_id, text, photo_url, buttons)
-                
+        def report_progress():
+            if progress_callback:
+                progress_callback(results['sent'] + results['failed'] + results['inactive'], results)
+
+        async def recipients():
+            async for page in pages:
+                for user in page:
+                    if not user.is_active:
+                        results['inactive'] += 1
+                        report_progress()
+                        continue
+                    in_flight[user.user_id] = user.pk
+                    yield user.user_id
+
+        async with ActivitySink() as activity_sink:
+            async def log_activity(chat_id: int, success: bool):
+                user_pk = in_flight.pop(chat_id)
+                results['sent' if success else 'failed'] += 1
+                report_progress()
                 if success:
-                    results['sent'] += 1
                     # Записуємо активність
-                    await asyncio.to_thread(
-                        UserActivity.objects.create,
-                        user=user,
-                        action_type='message_received'
-                    )
-                else:
-                    results['failed'] += 1
-
-                # Пауза між повідомленнями
-                await asyncio.sleep(self.DELAY_BETWEEN_MESSAGES)
+                    await activity_sink.add(user_pk, 'message_received')
 
-            # Пауза між групами
-            if i + batch_size < len(users):
-                await asyncio.sleep(1)  # 1 секунда між групами
+            await self.deliver(recipients(), text, photo_url, buttons, log_activity)
 
-        return results
\ No newline at end of file
+        return results
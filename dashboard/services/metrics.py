@@ -0,0 +1,286 @@
+import asyncio
+import bisect
+import os
+import socket
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from telegram.request import HTTPXRequest
+
+SNAPSHOT_KEY = 'metrics:snapshot:{}'
+PROCESSES_KEY = 'metrics:processes'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Metric:
+    TYPE = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            values = {key: self._copy(value) for key, value in self._values.items()}
+        return {'type': self.TYPE, 'help': self.documentation,
+                'labelnames': self.labelnames, 'values': values}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+class Counter(Metric):
+    TYPE = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    TYPE = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels) -> 'Timer':
+        return Timer(self, labels)
+
+    def snapshot(self) -> Dict:
+        data = super().snapshot()
+        data['buckets'] = self.buckets
+        return data
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+class Timer:
+    def __init__(self, histogram: Histogram, labels: Dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+class NoopMetric:
+    """Заглушка, коли метрики вимкнені: кожен виклик - порожня функція"""
+
+    def inc(self, amount: float = 1, **labels):
+        pass
+
+    def set(self, value: float, **labels):
+        pass
+
+    def observe(self, value: float, **labels):
+        pass
+
+    def time(self, **labels):
+        return NOOP_TIMER
+
+class NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NOOP_TIMER = NoopTimer()
+NOOP = NoopMetric()
+
+class Registry:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.metrics: List[Metric] = []
+
+    def _register(self, metric: Metric):
+        if not self.enabled:
+            return NOOP
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+REGISTRY = Registry(settings.METRICS_ENABLED)
+
+# Telegram Bot API
+API_REQUESTS = REGISTRY.counter(
+    'telegram_api_requests_total', 'Запити до Bot API за методом і результатом', ['method', 'outcome'])
+API_LATENCY = REGISTRY.histogram(
+    'telegram_api_request_seconds', 'Тривалість запиту до Bot API', ['method'])
+RETRY_AFTER = REGISTRY.counter(
+    'telegram_retry_after_total', 'Скільки разів Telegram повернув RetryAfter')
+RETRY_AFTER_SECONDS = REGISTRY.counter(
+    'telegram_retry_after_seconds_total', 'Сумарна пауза після RetryAfter, с')
+
+# База даних
+DB_FLUSH = REGISTRY.histogram(
+    'db_flush_seconds', 'Тривалість пакетного запису в базу', ['sink'])
+DB_FLUSH_ROWS = REGISTRY.counter(
+    'db_flush_rows_total', 'Рядків записано пакетним записом', ['sink'])
+
+# Черги
+QUEUE_DEPTH = REGISTRY.gauge(
+    'queue_depth', 'Кількість елементів у черзі', ['queue'])
+
+# Розсилки і перевірки
+MESSAGES = REGISTRY.counter(
+    'broadcast_messages_total', 'Повідомлення розсилки за результатом', ['outcome'])
+USERS_CHECKED = REGISTRY.counter(
+    'status_users_checked_total', 'Перевірено користувачів')
+CHECK_RATE = REGISTRY.gauge(
+    'status_users_checked_per_second', 'Швидкість останньої перевірки статусів, користувачів/с')
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest, що рахує запити до Bot API за методом, результатом і часом"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs) -> Tuple[int, bytes]:
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            status_code, payload = await super().do_request(url, method, *args, **kwargs)
+        except Exception:
+            API_REQUESTS.inc(method=api_method, outcome='network_error')
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, method=api_method)
+
+        if status_code == 200:
+            outcome = 'ok'
+        elif status_code == 429:
+            outcome = 'retry_after'
+        else:
+            outcome = str(status_code)
+        API_REQUESTS.inc(method=api_method, outcome=outcome)
+        return status_code, payload
+
+def make_request(**kwargs) -> HTTPXRequest:
+    """HTTPXRequest для Bot; з інструментацією лише коли метрики увімкнені"""
+    if REGISTRY.enabled:
+        return InstrumentedHTTPXRequest(**kwargs)
+    return HTTPXRequest(**kwargs)
+
+def process_name(role: str) -> str:
+    return f'{role}@{socket.gethostname()}:{os.getpid()}'
+
+def publish_snapshot(process: str, ttl: int):
+    """Знімок метрик процесу в кеш, звідки його читає /metrics"""
+    cache.set(SNAPSHOT_KEY.format(process), REGISTRY.snapshot(), ttl)
+    processes = cache.get(PROCESSES_KEY) or set()
+    if process not in processes:
+        cache.set(PROCESSES_KEY, processes | {process}, None)
+
+async def publish_periodically(role: str, interval: Optional[float] = None):
+    """Фонова публікація метрик довготривалого процесу (бот, воркер, планувальник)"""
+    if not REGISTRY.enabled:
+        return
+    interval = interval or settings.METRICS_PUBLISH_INTERVAL
+    process = process_name(role)
+    while True:
+        try:
+            await asyncio.to_thread(publish_snapshot, process, int(interval * 4))
+        except Exception as e:
+            print(f"Error publishing metrics: {e}")
+        await asyncio.sleep(interval)
+
+_publishers = set()
+
+def start_publishing(role: str) -> Optional[asyncio.Task]:
+    if not REGISTRY.enabled:
+        return None
+    task = asyncio.create_task(publish_periodically(role))
+    # Посилання на задачу, щоб її не прибрав збирач сміття
+    _publishers.add(task)
+    task.add_done_callback(_publishers.discard)
+    return task
+
+def collect_snapshots() -> Iterable[Tuple[str, Dict]]:
+    """Знімки поточного процесу та всіх процесів, що публікують метрики"""
+    yield process_name('web'), REGISTRY.snapshot()
+    processes = cache.get(PROCESSES_KEY) or set()
+    snapshots = cache.get_many([SNAPSHOT_KEY.format(process) for process in processes])
+    alive = set()
+    for process in processes:
+        snapshot = snapshots.get(SNAPSHOT_KEY.format(process))
+        if snapshot is not None:
+            alive.add(process)
+            yield process, snapshot
+    if alive != processes:
+        # Процеси, що зупинилися, прибираємо зі списку
+        cache.set(PROCESSES_KEY, alive, None)
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Dict[str, str]) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def render_prometheus(snapshots: Iterable[Tuple[str, Dict]]) -> str:
+    """Текстовий формат Prometheus; кожен процес - окрема мітка process"""
+    by_metric: Dict[str, List[Tuple[str, Dict]]] = {}
+    for process, snapshot in snapshots:
+        for name, data in snapshot.items():
+            by_metric.setdefault(name, []).append((process, data))
+
+    lines = []
+    for name, entries in sorted(by_metric.items()):
+        lines.append(f'# HELP {name} {entries[0][1]["help"]}')
+        lines.append(f'# TYPE {name} {entries[0][1]["type"]}')
+        for process, data in entries:
+            extra = {'process': process}
+            for values, value in data['values'].items():
+                if data['type'] != 'histogram':
+                    lines.append(f'{name}{_labels(data["labelnames"], values, extra)} {value}')
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(data['buckets']) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    labels = _labels(data['labelnames'], values, {**extra, 'le': str(bound)})
+                    lines.append(f'{name}_bucket{labels} {cumulative}')
+                lines.append(f'{name}_sum{_labels(data["labelnames"], values, extra)} {total}')
+                lines.append(f'{name}_count{_labels(data["labelnames"], values, extra)} {count}')
+    return '\n'.join(lines) + '\n'
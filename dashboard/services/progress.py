@@ -0,0 +1,160 @@
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, Optional
+from django.core.cache import cache
+from django.db import connections
+
+PROGRESS_KEY = 'progress:{}'
+PROGRESS_TTL = 60 * 60 * 24  # стан завершеної операції зберігається добу
+# Як часто фонова операція підтверджує, що її потік живий, с
+HEARTBEAT_INTERVAL = 5.0
+# Без підтвердження стільки інтервалів операція вважається зупиненою
+STALE_AFTER_HEARTBEATS = 6
+
+def new_task_id(kind: str) -> str:
+    return f'{kind}-{uuid.uuid4().hex[:12]}'
+
+def get_progress(task_id: str) -> Optional[Dict]:
+    return mark_stale(cache.get(PROGRESS_KEY.format(task_id)))
+
+async def aget_progress(task_id: str) -> Optional[Dict]:
+    """get_progress() для асинхронного коду (SSE-потік прогресу)"""
+    return mark_stale(await cache.aget(PROGRESS_KEY.format(task_id)))
+
+def mark_stale(state: Optional[Dict]) -> Optional[Dict]:
+    if state and state['status'] == 'running' and state.get('heartbeat'):
+        # Процес, у якому йшла операція, перезапустили - потік зник без finish()
+        silent = time.time() - state['heartbeat_at']
+        if silent > state['heartbeat'] * STALE_AFTER_HEARTBEATS:
+            state.update(
+                status='stale',
+                eta=None,
+                message=f'Операція не звітує {silent:.0f} с: процес, мабуть, зупинено. Запустіть її знову',
+            )
+    return state
+
+class ProgressTracker:
+    """Прогрес довгої операції (перевірка статусів, розсилка) в кеші.
+
+    Адмінка читає стан через JSON або server-sent events. Запис у кеш не
+    частіше ніж раз на MIN_INTERVAL, тому update() можна викликати після
+    кожного повідомлення. Швидкість рахується за останні SAMPLES записів,
+    а не від початку, - паузи після RetryAfter швидко видно в ETA.
+    """
+
+    MIN_INTERVAL = 1.0
+    SAMPLES = 10
+
+    def __init__(self, task_id: str, kind: str, title: str = '', total: int = 0,
+                 done: int = 0, min_interval: Optional[float] = None):
+        self.task_id = task_id
+        self.min_interval = self.MIN_INTERVAL if min_interval is None else min_interval
+        self.state = {
+            'id': task_id,
+            'kind': kind,
+            'title': title,
+            'status': 'running',
+            'total': total,
+            'done': done,
+            'counts': {},
+            'rate': 0.0,  # одиниць за секунду
+            'eta': None,  # секунд до завершення
+            'started_at': time.time(),
+            'updated_at': time.time(),
+            'message': '',
+            # Інтервал підтверджень від run_in_background (0 - без них)
+            'heartbeat': 0,
+            'heartbeat_at': time.time(),
+        }
+        self.samples = deque([(time.monotonic(), done)], maxlen=self.SAMPLES)
+        self.published_at = 0.0
+        self.lock = threading.Lock()
+        self.publish()
+
+    def update(self, done: int, counts: Optional[Dict] = None, total: Optional[int] = None):
+        """Підходить як progress_callback для StatusChecker і MessageSender"""
+        with self.lock:
+            self.state['done'] = done
+            if counts is not None:
+                self.state['counts'] = {key: value for key, value in counts.items() if key != 'total'}
+            if total is not None:
+                self.state['total'] = total
+            if time.monotonic() - self.published_at < self.min_interval:
+                return
+            self.sample()
+        self.publish()
+
+    def sample(self):
+        now = time.monotonic()
+        self.samples.append((now, self.state['done']))
+        first_at, first_done = self.samples[0]
+        if now > first_at:
+            self.state['rate'] = (self.state['done'] - first_done) / (now - first_at)
+        remaining = self.state['total'] - self.state['done']
+        self.state['eta'] = remaining / self.state['rate'] if self.state['rate'] > 0 and remaining > 0 else None
+        self.state['updated_at'] = time.time()
+
+    def finish(self, message: str = '', status: str = 'done'):
+        with self.lock:
+            elapsed = time.time() - self.state['started_at']
+            self.state.update(
+                status=status,
+                message=message,
+                eta=0,
+                # Для завершеної операції - середня швидкість за весь час
+                rate=self.state['done'] / elapsed if elapsed > 0 else 0.0,
+                updated_at=time.time(),
+            )
+        self.publish()
+
+    def fail(self, error: str):
+        self.finish(error, status='failed')
+
+    def heartbeat(self, interval: float):
+        """Потік операції живий; викликає run_in_background, поки func працює"""
+        with self.lock:
+            if self.state['status'] != 'running':
+                return
+            self.state['heartbeat'] = interval
+        self.publish()
+
+    def publish(self):
+        self.published_at = time.monotonic()
+        self.state['heartbeat_at'] = time.time()
+        try:
+            cache.set(PROGRESS_KEY.format(self.task_id), dict(self.state), PROGRESS_TTL)
+        except Exception as e:
+            print(f"Error publishing progress {self.task_id}: {e}")
+
+def run_in_background(tracker: ProgressTracker, func: Callable[[], str],
+                      heartbeat: float = HEARTBEAT_INTERVAL) -> threading.Thread:
+    """Запуск операції в окремому потоці; func повертає підсумкове повідомлення.
+
+    Потік живе в процесі веб-сервера і зникає разом з ним (перезапуск,
+    деплой). Поки func працює, стан підтверджується кожні heartbeat секунд;
+    без підтверджень get_progress() показує операцію як 'stale', а не
+    вічно 'running'.
+    """
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(heartbeat):
+            tracker.heartbeat(heartbeat)
+
+    def target():
+        tracker.heartbeat(heartbeat)
+        threading.Thread(target=beat, name=f'heartbeat-{tracker.task_id}', daemon=True).start()
+        try:
+            tracker.finish(func() or '')
+        except Exception as e:
+            tracker.fail(str(e))
+        finally:
+            stopped.set()
+            # Потік має власні з'єднання з базою - закриваємо їх
+            connections.close_all()
+
+    thread = threading.Thread(target=target, name=f'progress-{tracker.task_id}', daemon=True)
+    thread.start()
+    return thread
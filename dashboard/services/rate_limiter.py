@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Dict, Optional
+from .metrics import RETRY_AFTER, RETRY_AFTER_SECONDS
+
+
+class RateLimiter:
+    """Token bucket для глобального ліміту Telegram API з паузою по RetryAfter
+    та обмеженням частоти повідомлень в один чат"""
+
+    def __init__(self, rate: float = 30, burst: float = 1, per_chat_interval: float = 1.0):
+        self.rate = rate  # токенів (запитів) в секунду
+        self.burst = burst  # скільки запитів можна відправити одразу
+        self.per_chat_interval = per_chat_interval  # мінімальний інтервал для одного чату
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._chat_next: Dict[int, float] = {}
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Глобальна пауза для всіх відправників (після RetryAfter)"""
+        RETRY_AFTER.inc()
+        RETRY_AFTER_SECONDS.inc(seconds)
+        resume_at = time.monotonic() + seconds
+        if resume_at > self._paused_until:
+            self._paused_until = resume_at
+        self._tokens = 0
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def _wait_chat(self, chat_id: int):
+        """Пауза, якщо в цей чат щойно відправляли"""
+        now = time.monotonic()
+        next_allowed = self._chat_next.get(chat_id, 0.0)
+        if next_allowed > now:
+            await asyncio.sleep(next_allowed - now)
+            now = time.monotonic()
+        self._chat_next[chat_id] = now + self.per_chat_interval
+
+        # Прибираємо застарілі записи, щоб словник не ріс разом з аудиторією
+        if len(self._chat_next) > 10000:
+            self._chat_next = {
+                chat: moment for chat, moment in self._chat_next.items() if moment > now
+            }
+
+    async def acquire(self, chat_id: Optional[int] = None):
+        """Очікування дозволу на один запит до API"""
+        if chat_id is not None and self.per_chat_interval:
+            await self._wait_chat(chat_id)
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,18 @@
+from typing import Iterable, Optional
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from ..models import TelegramUser
+
+def recalculate_referral_counts(user_pks: Optional[Iterable[int]] = None) -> int:
+    """Перерахунок referrals_count одним UPDATE (для всіх або вказаних користувачів)"""
+    counts = (
+        TelegramUser.objects.filter(referred_by=OuterRef('pk'))
+        .order_by()
+        .values('referred_by')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    users = TelegramUser.objects.all()
+    if user_pks is not None:
+        users = users.filter(pk__in=list(user_pks))
+    return users.update(referrals_count=Coalesce(Subquery(counts), 0))
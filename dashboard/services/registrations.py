@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from ..models import TelegramUser, UserActivity
+from .dashboard_stats import invalidate_dashboard_stats
+from .db_executor import run_db
+from .metrics import DB_FLUSH, DB_FLUSH_ROWS
+from .referrals import recalculate_referral_counts
+from .user_cache import invalidate_users
+
+logger = logging.getLogger(__name__)
+
+REFERRAL_CODE_KEY = 'refcode:{}'
+REFERRAL_CODE_TTL = 24 * 60 * 60
+MISSING_CODE_TTL = 5 * 60
+MAX_CODE_LENGTH = TelegramUser._meta.get_field('referral_code').max_length
+
+# language_code Telegram -> мова в TelegramUser
+LANGUAGES = {'uk': 'ua', 'ru': 'ru'}
+
+class Registration(NamedTuple):
+    user_id: int
+    username: Optional[str]
+    language: str
+    referral_code: Optional[str]  # аргумент /start
+    date: datetime
+
+def make_registration(user, args: List[str]) -> Registration:
+    """Реєстрація з користувача Telegram і аргументів /start (deep link t.me/bot?start=CODE)"""
+    code = args[0].strip()[:MAX_CODE_LENGTH] if args else ''
+    return Registration(
+        user_id=user.id,
+        username=user.username,
+        language=LANGUAGES.get((user.language_code or '')[:2], 'en'),
+        referral_code=code or None,
+        date=timezone.now(),
+    )
+
+def resolve_referral_codes(codes: Iterable[str]) -> Dict[str, int]:
+    """referral_code -> pk реферера: з кешу, промахи одним запитом.
+
+    Невідомі коди теж кешуються (як 0, на коротший час), щоб вигаданий
+    код у посиланні не означав запит до бази на кожен /start.
+    """
+    codes = set(codes)
+    if not codes:
+        return {}
+    keys = {REFERRAL_CODE_KEY.format(code): code for code in codes}
+    cached = cache.get_many(list(keys))
+    resolved = {keys[key]: pk for key, pk in cached.items()}
+
+    missing = codes - resolved.keys()
+    if missing:
+        found = dict(
+            TelegramUser.objects.filter(referral_code__in=missing).values_list('referral_code', 'pk')
+        )
+        cache.set_many({REFERRAL_CODE_KEY.format(code): pk for code, pk in found.items()}, REFERRAL_CODE_TTL)
+        cache.set_many({REFERRAL_CODE_KEY.format(code): 0 for code in missing - found.keys()}, MISSING_CODE_TTL)
+        resolved.update(found)
+    return {code: pk for code, pk in resolved.items() if pk}
+
+def forget_referral_codes(codes: Iterable[str]):
+    """Скидання кешу кодів (напр. після імпорту, що змінив referral_code)"""
+    cache.delete_many([REFERRAL_CODE_KEY.format(code) for code in codes])
+
+def save_registrations(registrations: List[Registration]) -> Dict[str, int]:
+    """Пачка /start: upsert користувачів, реферали нових, подія 'start' для кожного.
+
+    Нові користувачі отримують код REF{user_id} і реферера за кодом з /start;
+    в уже відомих оновлюються лише username і is_active (написав боту -
+    отже, не заблокував), реферер не перезаписується.
+    """
+    by_user: Dict[int, Registration] = {}
+    for registration in registrations:
+        by_user.setdefault(registration.user_id, registration)
+
+    existing = set(
+        TelegramUser.objects.filter(user_id__in=list(by_user)).values_list('user_id', flat=True)
+    )
+    referrers = resolve_referral_codes(
+        registration.referral_code for user_id, registration in by_user.items()
+        if registration.referral_code and user_id not in existing
+    )
+
+    # Код REF{user_id} міг бути вже імпортований іншому користувачу - тоді без коду
+    taken_codes = set(
+        TelegramUser.objects.filter(
+            referral_code__in=[f'REF{user_id}' for user_id in by_user if user_id not in existing]
+        ).values_list('referral_code', flat=True)
+    )
+
+    users = []
+    affected_referrers: Set[int] = set()
+    for user_id, registration in by_user.items():
+        referrer_pk = None
+        if user_id not in existing:
+            referrer_pk = referrers.get(registration.referral_code)
+            if referrer_pk:
+                affected_referrers.add(referrer_pk)
+        code = f'REF{user_id}'
+        users.append(TelegramUser(
+            user_id=user_id,
+            username=registration.username,
+            language=registration.language,
+            referral_code=None if code in taken_codes else code,
+            referred_by_id=referrer_pk,
+            join_date=registration.date,
+            is_active=True,
+        ))
+
+    with transaction.atomic():
+        TelegramUser.objects.bulk_create(
+            users,
+            update_conflicts=True,
+            unique_fields=['user_id'],
+            update_fields=['username', 'is_active'],
+        )
+        user_pks = dict(
+            TelegramUser.objects.filter(user_id__in=list(by_user)).values_list('user_id', 'pk')
+        )
+        UserActivity.objects.bulk_create(
+            [UserActivity(user_id=user_pks[registration.user_id], action_type='start')
+             for registration in registrations]
+        )
+        if affected_referrers:
+            # bulk_create не надсилає сигналів - лічильник рахуємо тут
+            recalculate_referral_counts(affected_referrers)
+
+    invalidate_users(by_user)
+    if len(by_user) > len(existing):
+        invalidate_dashboard_stats()
+    return {
+        'created': len(by_user) - len(existing),
+        'updated': len(existing),
+        'referrals': sum(1 for user in users if user.referred_by_id),
+        'activities': len(registrations),
+    }
+
+class RegistrationBuffer:
+    """Буфер /start з пакетним записом (як ActivitySink).
+
+    add() не чекає бази: пачка пишеться фоновою задачею, коли набирається
+    FLUSH_SIZE реєстрацій або минає FLUSH_INTERVAL секунд. close() дописує
+    залишок.
+
+    Якщо база недоступна, пачка повертається в буфер і пишеться наступним
+    скиданням; буфер обмежений MAX_BUFFER реєстраціями (зайві найстаріші
+    відкидаються з попередженням у лог).
+    """
+
+    def __init__(self, flush_size: int = 200, flush_interval: float = 1.0, max_buffer: int = 50000):
+        self.FLUSH_SIZE = flush_size
+        self.FLUSH_INTERVAL = flush_interval
+        self.MAX_BUFFER = max_buffer
+        self.written = 0
+        self._buffer: List[Registration] = []
+        self._writing: List[Registration] = []  # пачка, що пишеться зараз
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._flushes = set()
+
+    def start(self):
+        """Запуск періодичного скидання буфера (у циклі подій бота)"""
+        if self._timer is None:
+            self._flush_lock = asyncio.Lock()
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            await self.flush()
+
+    def add(self, registration: Registration):
+        self.start()
+        self._buffer.append(registration)
+        if len(self._buffer) >= self.FLUSH_SIZE:
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        """Запис накопичених реєстрацій однією транзакцією"""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+            self._writing = batch
+            try:
+                started = time.perf_counter()
+                await run_db(self.write, batch)
+                DB_FLUSH.observe(time.perf_counter() - started, sink='registrations')
+                DB_FLUSH_ROWS.inc(len(batch), sink='registrations')
+                self.written += len(batch)
+            except Exception:
+                logger.exception(f"Error saving {len(batch)} registrations, keeping them for the next flush")
+                self._requeue(batch)
+            finally:
+                self._writing = []
+
+    def is_pending(self, user_id: int) -> bool:
+        """Реєстрація користувача ще не в базі: чекає в буфері або пишеться"""
+        return any(registration.user_id == user_id for registration in chain(self._writing, self._buffer))
+
+    def write(self, batch: List[Registration]):
+        try:
+            save_registrations(batch)
+        except IntegrityError:
+            # Пачка - одна транзакція: шукаємо винного, записуючи кожного користувача окремо
+            by_user: Dict[int, List[Registration]] = {}
+            for registration in batch:
+                by_user.setdefault(registration.user_id, []).append(registration)
+            for user_id, registrations in by_user.items():
+                try:
+                    save_registrations(registrations)
+                except IntegrityError:
+                    logger.exception(f"Dropping {len(registrations)} registrations of user {user_id}")
+
+    def _requeue(self, batch: List[Registration]):
+        self._buffer = batch + self._buffer
+        overflow = len(self._buffer) - self.MAX_BUFFER
+        if overflow > 0:
+            logger.warning(f"Registration buffer is full, dropping {overflow} oldest registrations")
+            del self._buffer[:overflow]
+
+    async def close(self):
+        """Зупинка таймера та запис залишку буфера"""
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+        if self._buffer:
+            logger.error(f"{len(self._buffer)} registrations were not saved")
@@ -0,0 +1,193 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+from ..models import DailyActivityRollup, HourlyActivityRollup, TelegramUser, UserActivity
+from .statistics_snapshot import day_start
+
+NEW_USER = 'new_user'  # нові користувачі за join_date, не з UserActivity
+MAX_DAYS = 3 * 366
+MAX_HOURLY_DAYS = 31
+
+def hour_floor(moment: datetime) -> datetime:
+    # В UTC: арифметика з локальним часом ламається на переході на літній час
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+def rollup_hours(start: datetime, end: datetime, raw_horizon: Optional[datetime] = None) -> int:
+    """Перебудова погодинних рядків за [start, end): два GROUP BY, далі delete + insert.
+
+    До години raw_horizon включно сирих подій уже немає або не всі (архів,
+    видалення compact_activity) - там перебудовуються лише нові користувачі.
+    """
+    counts: Dict[Tuple[datetime, str, str], int] = defaultdict(int)
+
+    activities = (
+        UserActivity.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=TruncHour('created_at'))
+        .values_list('bucket', 'action_type', 'user__language')
+        .annotate(count=Count('id'))
+    )
+    for bucket, action_type, language, count in activities:
+        counts[bucket, action_type, language] += count
+
+    new_users = (
+        TelegramUser.objects.filter(join_date__gte=start, join_date__lt=end)
+        .annotate(bucket=TruncHour('join_date'))
+        .values_list('bucket', 'language')
+        .annotate(count=Count('id'))
+    )
+    for bucket, language, count in new_users:
+        counts[bucket, NEW_USER, language] += count
+
+    stale = HourlyActivityRollup.objects.filter(hour__gte=start, hour__lt=end)
+    if raw_horizon is not None and start <= raw_horizon:
+        protected = hour_floor(raw_horizon)
+        stale = stale.filter(Q(hour__gt=protected) | Q(action_type=NEW_USER))
+        counts = {key: count for key, count in counts.items() if key[1] == NEW_USER or key[0] > protected}
+    with transaction.atomic():
+        stale.delete()
+        HourlyActivityRollup.objects.bulk_create(
+            [
+                HourlyActivityRollup(hour=hour, action_type=action_type, language=language, count=count)
+                for (hour, action_type, language), count in counts.items()
+            ],
+            batch_size=1000,
+        )
+    return len(counts)
+
+def rollup_days(first_day: date, last_day: date) -> int:
+    """Денні рядки з погодинних (а не з сирих подій)"""
+    start, end = day_start(first_day), day_start(last_day + timedelta(days=1))
+    rows = (
+        HourlyActivityRollup.objects.filter(hour__gte=start, hour__lt=end)
+        .annotate(bucket=TruncDate('hour'))
+        .values_list('bucket', 'action_type', 'language')
+        .annotate(total=Sum('count'))
+    )
+    with transaction.atomic():
+        DailyActivityRollup.objects.filter(day__range=(first_day, last_day)).delete()
+        created = DailyActivityRollup.objects.bulk_create(
+            [
+                DailyActivityRollup(day=day, action_type=action_type, language=language, count=total)
+                for day, action_type, language, total in rows
+            ],
+            batch_size=1000,
+        )
+    return len(created)
+
+def rollup_new_users_daily(first_day: date, last_day: date) -> int:
+    """Денні рядки нових користувачів напряму з TelegramUser - для днів без погодинних агрегатів"""
+    rows = (
+        TelegramUser.objects.filter(
+            join_date__gte=day_start(first_day), join_date__lt=day_start(last_day + timedelta(days=1))
+        )
+        .annotate(bucket=TruncDate('join_date'))
+        .values_list('bucket', 'language')
+        .annotate(count=Count('id'))
+    )
+    with transaction.atomic():
+        DailyActivityRollup.objects.filter(day__range=(first_day, last_day), action_type=NEW_USER).delete()
+        created = DailyActivityRollup.objects.bulk_create(
+            [
+                DailyActivityRollup(day=day, action_type=NEW_USER, language=language, count=count)
+                for day, language, count in rows
+            ],
+            batch_size=1000,
+        )
+    return len(created)
+
+def build_rollups(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  step: timedelta = timedelta(days=7)) -> Dict[str, int]:
+    """Інкрементальна перебудова: від останньої (можливо неповної) години до зараз.
+
+    since - примусова перебудова з цього моменту (напр. після імпорту
+    користувачів з давніми join_date). Діапазон обробляється кроками step,
+    щоб одна транзакція не тримала тижні даних.
+    """
+    until = until or timezone.now()
+    if since is None:
+        since = HourlyActivityRollup.objects.order_by('-hour').values_list('hour', flat=True).first()
+    if since is None:
+        # Перший запуск - з найранішої події
+        firsts = [
+            UserActivity.objects.order_by('created_at').values_list('created_at', flat=True).first(),
+            TelegramUser.objects.order_by('join_date').values_list('join_date', flat=True).first(),
+        ]
+        firsts = [moment for moment in firsts if moment]
+        if not firsts:
+            return {'hourly': 0, 'daily': 0}
+        since = min(firsts)
+
+    start = hour_floor(since)
+    end = hour_floor(until) + timedelta(hours=1)
+    results = {'hourly': 0, 'daily': 0}
+
+    # До першої погодинної години агрегати стиснуті в денні (compact_activity)
+    hourly_horizon = HourlyActivityRollup.objects.order_by('hour').values_list('hour', flat=True).first()
+    if hourly_horizon is not None:
+        horizon_day = timezone.localtime(hourly_horizon).date()
+        if start < day_start(horizon_day):
+            results['daily'] += rollup_new_users_daily(
+                timezone.localtime(start).date(), horizon_day - timedelta(days=1)
+            )
+            start = hour_floor(day_start(horizon_day))
+
+    # Перша сира подія; якщо ця година вже агрегована, частина її подій могла піти в архів
+    raw_horizon = UserActivity.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if raw_horizon is not None and not HourlyActivityRollup.objects.filter(
+        hour__lte=raw_horizon
+    ).exclude(action_type=NEW_USER).exists():
+        raw_horizon = None
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + step, end)
+        results['hourly'] += rollup_hours(chunk_start, chunk_end, raw_horizon)
+        chunk_start = chunk_end
+    results['daily'] += rollup_days(timezone.localtime(start).date(), timezone.localtime(end).date())
+    return results
+
+def chart_series(days: int = 90, granularity: str = 'day', until: Optional[date] = None) -> Dict:
+    """Колонковий JSON для графіків: спільна вісь x і масив значень на серію.
+
+    Розмір відповіді залежить лише від діапазону, а не від кількості
+    користувачів: читається не більше (інтервали x дії x мови) рядків rollup.
+    """
+    days = max(1, min(days, MAX_HOURLY_DAYS if granularity == 'hour' else MAX_DAYS))
+    last_day = until or timezone.localdate()
+    first_day = last_day - timedelta(days=days - 1)
+
+    if granularity == 'hour':
+        start = hour_floor(day_start(first_day))
+        end = day_start(last_day + timedelta(days=1))
+        buckets: List = []
+        while start + timedelta(hours=len(buckets)) < end:
+            buckets.append(start + timedelta(hours=len(buckets)))
+        rows = HourlyActivityRollup.objects.filter(hour__gte=start, hour__lt=end) \
+            .values_list('hour', 'action_type', 'language', 'count')
+        labels = [timezone.localtime(bucket).isoformat() for bucket in buckets]
+    else:
+        buckets = [first_day + timedelta(days=i) for i in range(days)]
+        rows = DailyActivityRollup.objects.filter(day__range=(first_day, last_day)) \
+            .values_list('day', 'action_type', 'language', 'count')
+        labels = [bucket.isoformat() for bucket in buckets]
+
+    position = {bucket: i for i, bucket in enumerate(buckets)}
+    actions: Dict[str, List[int]] = {}
+    languages: Dict[str, List[int]] = {}
+    for bucket, action_type, language, count in rows:
+        i = position.get(bucket)
+        if i is None:
+            continue
+        actions.setdefault(action_type, [0] * len(buckets))[i] += count
+        if action_type == NEW_USER:
+            languages.setdefault(language, [0] * len(buckets))[i] += count
+
+    return {
+        'granularity': granularity,
+        'x': labels,
+        'actions': actions,
+        'new_users_by_language': languages,
+    }
@@ -0,0 +1,163 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import DailyActivityRollup, Statistics, TelegramUser, UserActivity, UserActivityArchive
+
+# Мова користувача -> поле Statistics
+LANGUAGE_FIELDS = {'ru': 'ru_users', 'ua': 'ua_users', 'en': 'en_users'}
+COUNTER_FIELDS = ['total_bot_users', 'webapp_opens', 'chat_members'] + list(LANGUAGE_FIELDS.values())
+# Поля, яких немає в базі (їх пишуть імпорти) - переносяться з попереднього рядка
+CARRIED_FIELDS = ['total_spots', 'used_spots']
+SNAPSHOT_ACTIONS = ['webapp_open', 'join_chat', 'leave_chat']
+
+# Сирі події: гаряча таблиця і архів compact_activity (на SQLite)
+RAW_ACTIVITY_MODELS = (UserActivity, UserActivityArchive)
+
+def day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def raw_activity_horizon() -> Optional[date]:
+    """Перший день, за який сирі події ще є.
+
+    compact_activity видаляє старі події цілими днями, лишаючи їхні денні
+    підсумки в DailyActivityRollup - дні до цієї межі читаються звідти.
+    None - сирих подій немає зовсім.
+    """
+    firsts = [
+        model.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        for model in RAW_ACTIVITY_MODELS
+    ]
+    firsts = [moment for moment in firsts if moment]
+    return timezone.localtime(min(firsts)).date() if firsts else None
+
+def activity_counts(first_day: date, last_day: date,
+                    horizon: Optional[date] = None) -> Dict[Tuple[date, str], int]:
+    """(день, дія) -> кількість подій SNAPSHOT_ACTIONS за [first_day, last_day].
+
+    Дні до horizon - з DailyActivityRollup, решта - з сирих подій (разом з
+    архівом). Так бекфіл після compact_activity дає ті самі числа, що й до нього.
+    """
+    counts: Dict[Tuple[date, str], int] = defaultdict(int)
+    horizon = horizon or date.max
+    if first_day < horizon:
+        rolled_up = (
+            DailyActivityRollup.objects.filter(
+                action_type__in=SNAPSHOT_ACTIONS, day__gte=first_day,
+                day__lte=min(last_day, horizon - timedelta(days=1)),
+            )
+            .values_list('day', 'action_type')
+            .annotate(total=Sum('count'))
+        )
+        for day, action_type, total in rolled_up:
+            counts[day, action_type] += total
+    if last_day >= horizon:
+        start, end = day_start(max(first_day, horizon)), day_start(last_day + timedelta(days=1))
+        for model in RAW_ACTIVITY_MODELS:
+            raw = (
+                model.objects.filter(action_type__in=SNAPSHOT_ACTIONS, created_at__gte=start, created_at__lt=end)
+                .annotate(day=TruncDate('created_at'))
+                .values_list('day', 'action_type')
+                .annotate(count=Count('id'))
+            )
+            for day, action_type, count in raw:
+                counts[day, action_type] += count
+    return counts
+
+def baseline(day: date) -> Tuple[Dict[str, int], Optional[Statistics]]:
+    """Лічильники на початок дня: з попереднього рядка, якщо він є.
+
+    Без жодного рядка раніше - одноразовий повний підрахунок станом на
+    початок дня (перший запуск або бекфіл з початку історії).
+    """
+    previous = Statistics.objects.filter(date__lt=day).order_by('-date').first()
+    if previous is not None and previous.date == day - timedelta(days=1):
+        return {field: getattr(previous, field) for field in COUNTER_FIELDS}, previous
+
+    start = day_start(day)
+    counts = dict.fromkeys(COUNTER_FIELDS, 0)
+    by_language = TelegramUser.objects.filter(join_date__lt=start).values('language').annotate(count=Count('id'))
+    for row in by_language:
+        counts['total_bot_users'] += row['count']
+        if row['language'] in LANGUAGE_FIELDS:
+            counts[LANGUAGE_FIELDS[row['language']]] += row['count']
+    if day > date.min:
+        counts['webapp_opens'] = sum(
+            count for (_, action_type), count in activity_counts(
+                date.min, day - timedelta(days=1), raw_activity_horizon()
+            ).items()
+            if action_type == 'webapp_open'
+        )
+    # Хто був у чаті на початок дня: у чаті й зайшов раніше або вийшов пізніше
+    counts['chat_members'] = TelegramUser.objects.filter(
+        Q(in_chat=True) & (Q(chat_join_date__isnull=True) | Q(chat_join_date__lt=start))
+        | Q(in_chat=False, left_chat_at__gte=start) & Q(chat_join_date__lt=start)
+    ).count()
+    return counts, previous
+
+def daily_deltas(first_day: date, last_day: date) -> Dict[date, Dict[str, int]]:
+    """Зміни лічильників по днях: два GROUP BY на весь діапазон, а не запити на кожен день"""
+    start, end = day_start(first_day), day_start(last_day + timedelta(days=1))
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+
+    new_users = (
+        TelegramUser.objects.filter(join_date__gte=start, join_date__lt=end)
+        .annotate(day=TruncDate('join_date'))
+        .values('day', 'language')
+        .annotate(count=Count('id'))
+    )
+    for row in new_users:
+        delta = deltas[row['day']]
+        delta['total_bot_users'] += row['count']
+        if row['language'] in LANGUAGE_FIELDS:
+            delta[LANGUAGE_FIELDS[row['language']]] += row['count']
+
+    for (day, action_type), count in activity_counts(first_day, last_day, raw_activity_horizon()).items():
+        delta = deltas[day]
+        if action_type == 'webapp_open':
+            delta['webapp_opens'] += count
+        elif action_type == 'join_chat':
+            delta['chat_members'] += count
+        else:
+            delta['chat_members'] -= count
+    return deltas
+
+def build_snapshots(first_day: date, last_day: date) -> List[Statistics]:
+    """Рядки Statistics за [first_day, last_day]: попередній день + зміни за день.
+
+    Весь діапазон рахується одним проходом по даних і записується одним upsert.
+    """
+    counts, previous = baseline(first_day)
+    carried = {field: getattr(previous, field) for field in CARRIED_FIELDS} if previous else {}
+    existing = {row.date: row for row in Statistics.objects.filter(date__range=(first_day, last_day))}
+    deltas = daily_deltas(first_day, last_day)
+
+    rows = []
+    day = first_day
+    while day <= last_day:
+        for field, value in deltas.get(day, {}).items():
+            counts[field] += value
+        if day in existing:
+            # Місця в роздачі задає імпорт за цей день
+            carried = {field: getattr(existing[day], field) for field in CARRIED_FIELDS}
+        rows.append(Statistics(date=day, **counts, **carried))
+        day += timedelta(days=1)
+
+    Statistics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=COUNTER_FIELDS + CARRIED_FIELDS,
+    )
+    return rows
+
+def pending_range(today: Optional[date] = None) -> Tuple[date, date]:
+    """Дні, які треба дописати: від останнього завершеного рядка до сьогодні.
+
+    Сьогоднішній рядок неповний, тому перераховується при кожному запуску.
+    """
+    today = today or timezone.localdate()
+    last = Statistics.objects.filter(date__lt=today).order_by('-date').values_list('date', flat=True).first()
+    return (last + timedelta(days=1) if last else today), today
@@ -1,23 +1,100 @@
 import asyncio
-from typing import List, Dict, Set
+import logging
+from collections import defaultdict
+from typing import Callable, List, Dict, Optional, Set, Tuple, Union
 from datetime import datetime
 import math
+import time
 from telegram import Bot
 from telegram.error import TelegramError, RetryAfter
 from django.conf import settings
+from django.db import transaction
+from django.db.models.query import QuerySet
 from django.utils import timezone
 from ..models import TelegramUser
+from .activity_sink import ActivitySink
+from .dashboard_stats import invalidate_dashboard_stats
+from .metrics import CHECK_RATE, DB_FLUSH, DB_FLUSH_ROWS, USERS_CHECKED
+from .rate_limiter import RateLimiter
+from .telegram_transport import get_bot
+from .user_cache import invalidate_users
+from .user_stream import iter_list_batches, iter_user_batches
+
+logger = logging.getLogger(__name__)
 
 class StatusChecker:
-    def __init__(self, bot_token: str = None):
+    # Поля статусу, які може змінити перевірка (last_status_check оновлюється завжди)
+    STATUS_FIELDS = ['is_active', 'in_chat', 'deleted_bot_at', 'left_chat_at', 'chat_join_date']
+    # Колонки, які потрібні для перевірки (решта не завантажується)
+    USER_FIELDS = ['user_id', 'last_status_check'] + STATUS_FIELDS
+
+    def __init__(self, bot_token: str = None, activity_sink: ActivitySink = None, api_url: str = None,
+                 check_chat: bool = True, check_bot: bool = True, chat_tokens: Optional[List[str]] = None):
         self.bot_token = bot_token or settings.TELEGRAM_BOT_TOKEN
-        self.bot = Bot(token=self.bot_token)  # Ініціалізуємо бота відразу
-        self.chat_id = "@daodrophelper"
-        self.BATCH_SIZE = 30
-        self.DELAY_BETWEEN_REQUESTS = 0.034
-        self.DELAY_BETWEEN_BATCHES = 0.1
+        self.api_url = api_url or settings.TELEGRAM_API_URL
+        self.activity_sink = activity_sink  # куди записувати зміни статусів
+        # Участь у чаті оновлюють chat_member події бота, опитування - лише звірка
+        self.check_chat = check_chat
+        # Блокування бота теж приходить подіями my_chat_member; False - лише звірка чату
+        self.check_bot = check_bot
+        self.chat_id = settings.TELEGRAM_CHAT_ID
+        self.REQUESTS_PER_SECOND = 30  # ліміт запитів на один токен
+        self.MAX_RETRIES = 3  # скільки разів повторюємо після RetryAfter
+        self.PAGE_SIZE = 1000  # користувачів на один запит до бази
+
+        # Токени ботів-адмінів чату для get_chat_member (за замовчуванням - основний бот)
+        self.chat_tokens = list(settings.TELEGRAM_CHECKER_TOKENS if chat_tokens is None else chat_tokens)
+        # Стільки користувачів перевіряється одночасно (одна пачка)
+        self.BATCH_SIZE = self.REQUESTS_PER_SECOND * (
+            1 if self.check_bot or not self.chat_tokens else len(self.chat_tokens)
+        )
+
+        self.rate_limiter = RateLimiter(self.REQUESTS_PER_SECOND, per_chat_interval=0)
+        if self.chat_tokens:
+            # Кожен токен - окремий бот зі своїм лімітом і власною паузою після RetryAfter
+            self.chat_workers = [
+                (token, RateLimiter(self.REQUESTS_PER_SECOND, per_chat_interval=0))
+                for token in self.chat_tokens
+            ]
+        else:
+            self.chat_workers = [(self.bot_token, self.rate_limiter)]
+
+    def make_bot(self, token: str) -> Bot:
+        """Bot токена на спільному пулі з'єднань поточного циклу подій"""
+        return get_bot(token, self.api_url)
+
+    @property
+    def bot(self) -> Bot:
+        return self.make_bot(self.bot_token)
+
+    @property
+    def calls_per_user(self) -> float:
+        """Скільки запитів на користувача припадає на найзавантаженіший токен"""
+        main_calls = int(self.check_bot) + int(self.check_chat and not self.chat_tokens)
+        pool_calls = 1 / len(self.chat_tokens) if self.check_chat and self.chat_tokens else 0
+        return max(main_calls, pool_calls) or 1
+
+    @property
+    def users_per_second(self) -> float:
+        return self.REQUESTS_PER_SECOND / self.calls_per_user
 
-    async def process_batch(self, users_batch: List[TelegramUser], progress_callback=None) -> Dict:
+    def chat_worker(self, user_id: int) -> Tuple[Bot, RateLimiter]:
+        """Користувачі розподіляються між токенами за user_id"""
+        token, rate_limiter = self.chat_workers[user_id % len(self.chat_workers)]
+        return self.make_bot(token), rate_limiter
+
+    async def call_api(self, rate_limiter: RateLimiter, method, **kwargs):
+        """Запит у межах ліміту токена; RetryAfter зупиняє лише цей токен"""
+        for attempt in range(self.MAX_RETRIES + 1):
+            await rate_limiter.acquire()
+            try:
+                return await method(**kwargs)
+            except RetryAfter as e:
+                rate_limiter.pause(e.retry_after)
+                if attempt == self.MAX_RETRIES:
+                    raise
+
+    async def process_batch(self, users_batch: List[TelegramUser]) -> Dict:
         """Обробка однієї пачки користувачів"""
         results = {
             'checked': 0,
@@ -27,24 +104,67 @@ class StatusChecker:
             'not_in_chat': 0
         }
 
+        # Один час перевірки на всю пачку
+        checked_at = timezone.now()
+
         # Створюємо таски для всіх користувачів в пачці
         tasks = []
         for user in users_batch:
-            tasks.append(self.check_single_user(user))
+            tasks.append(self.check_single_user(user, checked_at))
         
         # Виконуємо всі таски паралельно
         batch_results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Обробляємо результати
-        for result in batch_results:
+        updates = []
+        for user, result in zip(users_batch, batch_results):
             if isinstance(result, dict):  # якщо немає помилки
                 for key in results:
                     results[key] += result[key]
+                if result['checked']:
+                    updates.append((user, result['changed_fields'], result['transitions']))
+
+        if updates:
+            try:
+                await asyncio.to_thread(self.save_statuses, updates, checked_at)
+            except Exception:
+                # Нічого не записано - пачка не рахується перевіреною, користувачі
+                # лишаються застарілими і потраплять у наступну перевірку
+                logger.exception(f"Error saving statuses for {len(updates)} users")
+                return dict.fromkeys(results, 0)
+
+            if self.activity_sink:
+                for user, _, transitions in updates:
+                    for action_type in transitions:
+                        await self.activity_sink.add(user, action_type)
             
         return results
 
-    async def check_single_user(self, user: TelegramUser) -> Dict:
-        """Перевірка одного користувача"""
+    def save_statuses(self, updates: List[Tuple[TelegramUser, List[str], List[str]]], checked_at):
+        """Запис результатів пачки: bulk_update лише тих полів, що змінилися"""
+        changed = defaultdict(list)
+        touched = []
+        for user, changed_fields, _ in updates:
+            if changed_fields:
+                changed[tuple(changed_fields)].append(user)
+            else:
+                touched.append(user.pk)
+
+        with DB_FLUSH.time(sink='status'), transaction.atomic():
+            for fields, users in changed.items():
+                TelegramUser.objects.bulk_update(users, list(fields) + ['last_status_check'])
+            if touched:
+                # Статус не змінився - оновлюємо лише час перевірки
+                TelegramUser.objects.filter(pk__in=touched).update(last_status_check=checked_at)
+
+        DB_FLUSH_ROWS.inc(len(updates), sink='status')
+        if changed:
+            invalidate_dashboard_stats()
+            invalidate_users(user.user_id for users in changed.values() for user in users)
+
+    async def check_single_user(self, user: TelegramUser, checked_at=None) -> Dict:
+        """Перевірка одного користувача (без запису в базу)"""
+        checked_at = checked_at or timezone.now()
         result = {
             'checked': 0,
             'active_bot': 0,
@@ -55,49 +175,66 @@ class StatusChecker:
 
         try:
             # Перевірка статусу бота
-            is_bot_active = False
-            try:
-                await self.bot.send_chat_action(chat_id=user.user_id, action="typing")
-                is_bot_active = True
-            except RetryAfter as e:
-                await asyncio.sleep(e.retry_after)
-                return result
-            except TelegramError:
-                pass
-
-            await asyncio.sleep(self.DELAY_BETWEEN_REQUESTS)
+            is_bot_active = user.is_active
+            if self.check_bot:
+                is_bot_active = False
+                try:
+                    await self.call_api(
+                        self.rate_limiter, self.bot.send_chat_action,
+                        chat_id=user.user_id, action="typing"
+                    )
+                    is_bot_active = True
+                except RetryAfter:
+                    return result
+                except TelegramError:
+                    pass
 
             # Перевірка участі в чаті
-            is_in_chat = False
-            try:
-                member = await self.bot.get_chat_member(chat_id=self.chat_id, user_id=user.user_id)
-                is_in_chat = member.status in ['member', 'administrator', 'creator']
-            except RetryAfter as e:
-                await asyncio.sleep(e.retry_after)
-                return result
-            except TelegramError:
-                pass
+            is_in_chat = user.in_chat
+            if self.check_chat:
+                bot, rate_limiter = self.chat_worker(user.user_id)
+                is_in_chat = False
+                try:
+                    member = await self.call_api(
+                        rate_limiter, bot.get_chat_member,
+                        chat_id=self.chat_id, user_id=user.user_id
+                    )
+                    is_in_chat = member.status in ['member', 'administrator', 'creator']
+                except RetryAfter:
+                    return result
+                except TelegramError:
+                    pass
 
             # Оновлення статусів
             was_active = user.is_active
             was_in_chat = user.in_chat
+            previous = {field: getattr(user, field) for field in self.STATUS_FIELDS}
             
             user.is_active = is_bot_active
             user.in_chat = is_in_chat
-            user.last_status_check = timezone.now()
+            user.last_status_check = checked_at
             
+            transitions = []
             if was_active and not is_bot_active:
-                user.deleted_bot_at = timezone.now()
+                user.deleted_bot_at = checked_at
+                transitions.append('bot_blocked')
             elif not was_active and is_bot_active:
                 user.deleted_bot_at = None
+                transitions.append('bot_unblocked')
                 
             if was_in_chat and not is_in_chat:
-                user.left_chat_at = timezone.now()
+                user.left_chat_at = checked_at
+                transitions.append('leave_chat')
             elif not was_in_chat and is_in_chat:
                 user.left_chat_at = None
-                user.chat_join_date = timezone.now()
-            
-            await asyncio.to_thread(user.save)
+                user.chat_join_date = checked_at
+                transitions.append('join_chat')
+
+            # Запис виконує process_batch однією пачкою
+            result['changed_fields'] = [
+                field for field in self.STATUS_FIELDS if getattr(user, field) != previous[field]
+            ]
+            result['transitions'] = transitions
             
             # Оновлення результатів
             result['checked'] = 1
@@ -115,10 +252,24 @@ class StatusChecker:
 
         return result
 
-    async def check_users_status(self, users: List[TelegramUser], progress_callback=None) -> Dict:
-        """Перевірка статусу всіх користувачів з урахуванням лімітів"""
+    async def check_users_status(self, users: Union[QuerySet, List[TelegramUser]],
+                                 progress_callback: Optional[Callable[[int, Dict], None]] = None) -> Dict:
+        """Перевірка статусу всіх користувачів з урахуванням лімітів.
+
+        QuerySet читається потоком (keyset-пагінація), а не завантажується повністю.
+        progress_callback(оброблено, проміжні результати) викликається після
+        кожної пачки (напр. ProgressTracker.update).
+        """
+        if isinstance(users, QuerySet):
+            total = await asyncio.to_thread(users.count)
+            pages = iter_user_batches(users, self.PAGE_SIZE, self.USER_FIELDS)
+        else:
+            total = len(users)
+            pages = iter_list_batches(users, self.PAGE_SIZE)
+
         total_results = {
-            'total': len(users),
+            'total': total,
+            'processed': 0,  # разом з тими, кого не вдалося перевірити
             'checked': 0,
             'active_bot': 0,
             'inactive_bot': 0,
@@ -126,20 +277,32 @@ class StatusChecker:
             'not_in_chat': 0
         }
 
-        # Розбиваємо користувачів на пачки
-        batches = [users[i:i + self.BATCH_SIZE] for i in range(0, len(users), self.BATCH_SIZE)]
-        total_batches = len(batches)
-
-        for i, batch in enumerate(batches, 1):
-            # Обробка пачки
-            batch_results = await self.process_batch(batch, progress_callback)
-            
-            # Оновлення загальної статистики
-            for key in ['checked', 'active_bot', 'inactive_bot', 'in_chat', 'not_in_chat']:
-                total_results[key] += batch_results[key]
+        # Власний буфер активностей, якщо його не передали ззовні
+        owns_sink = self.activity_sink is None
+        if owns_sink:
+            self.activity_sink = ActivitySink()
+            self.activity_sink.start()
 
-            # Пауза між пачками
-            if i < total_batches:  # Не чекаємо після останньої пачки
-                await asyncio.sleep(self.DELAY_BETWEEN_BATCHES)
+        started = time.monotonic()
+        try:
+            async for page in pages:
+                # Розбиваємо сторінку на пачки; темп задають ліміти токенів
+                for i in range(0, len(page), self.BATCH_SIZE):
+                    # Обробка пачки
+                    batch = page[i:i + self.BATCH_SIZE]
+                    batch_results = await self.process_batch(batch)
+                    
+                    # Оновлення загальної статистики
+                    total_results['processed'] += len(batch)
+                    for key in ['checked', 'active_bot', 'inactive_bot', 'in_chat', 'not_in_chat']:
+                        total_results[key] += batch_results[key]
+                    if progress_callback:
+                        progress_callback(total_results['processed'], total_results)
+                    USERS_CHECKED.inc(batch_results['checked'])
+                    CHECK_RATE.set(total_results['checked'] / max(time.monotonic() - started, 1e-6))
+        finally:
+            if owns_sink:
+                await self.activity_sink.close()
+                self.activity_sink = None
 
         return total_results
\ No newline at end of file
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+from django.db.models import Q
+from django.utils import timezone
+from ..models import TelegramUser
+from .status_checker import StatusChecker
+
+class StatusScheduler:
+    """Інкрементальна перевірка статусів у межах бюджету запитів до API.
+
+    Кожну хвилину обирає найбільш застарілих користувачів у такому порядку:
+    ніколи не перевірені, нещодавно "відпалі" (видалили бота або вийшли з чату),
+    решта за давністю last_status_check.
+    """
+
+    def __init__(self, checker: Optional[StatusChecker] = None, budget_per_minute: int = 600,
+                 churn_window: timedelta = timedelta(days=7),
+                 churn_recheck: timedelta = timedelta(hours=6),
+                 recheck: timedelta = timedelta(hours=24)):
+        self.checker = checker or StatusChecker()
+        self.budget_per_minute = budget_per_minute  # запитів до API за хвилину на токен
+        self.churn_window = churn_window  # скільки вважати відпалих "нещодавніми"
+        self.churn_recheck = churn_recheck  # як часто перевіряти нещодавно відпалих
+        self.recheck = recheck  # як часто перевіряти всіх інших
+        # Запитів на користувача для найзавантаженішого токена: send_chat_action +
+        # get_chat_member, якщо чат перевіряє той самий бот
+        self.CALLS_PER_USER = self.checker.calls_per_user
+        self.CYCLE_SECONDS = 60
+
+    @property
+    def users_per_cycle(self) -> int:
+        return max(1, int(self.budget_per_minute / self.CALLS_PER_USER))
+
+    def pick_users(self, limit: int) -> List[int]:
+        """pk користувачів для наступного циклу за пріоритетом"""
+        now = timezone.now()
+        churn_since = now - self.churn_window
+
+        queues = [
+            # 1. Ніколи не перевірені
+            TelegramUser.objects.filter(last_status_check__isnull=True).order_by('pk'),
+            # 2. Нещодавно видалили бота або вийшли з чату
+            TelegramUser.objects.filter(
+                Q(deleted_bot_at__gte=churn_since) | Q(left_chat_at__gte=churn_since),
+                last_status_check__lt=now - self.churn_recheck
+            ).order_by('last_status_check'),
+            # 3. Всі інші, від найдавніше перевірених
+            TelegramUser.objects.filter(
+                last_status_check__lt=now - self.recheck
+            ).order_by('last_status_check'),
+        ]
+
+        picked = []
+        for queryset in queues:
+            remaining = limit - len(picked)
+            if remaining <= 0:
+                break
+            picked.extend(
+                queryset.exclude(pk__in=picked).values_list('pk', flat=True)[:remaining]
+            )
+        return picked
+
+    async def run_cycle(self) -> Dict:
+        """Один цикл: вибір користувачів і перевірка"""
+        pks = await asyncio.to_thread(self.pick_users, self.users_per_cycle)
+        if not pks:
+            return {'total': 0, 'checked': 0}
+        return await self.checker.check_users_status(TelegramUser.objects.filter(pk__in=pks))
+
+    async def run(self, once: bool = False, on_cycle: Optional[Callable[[Dict, float], None]] = None):
+        """Безперервна робота: не більше одного циклу на хвилину"""
+        while True:
+            started = time.monotonic()
+            results = await self.run_cycle()
+            elapsed = time.monotonic() - started
+            if on_cycle:
+                on_cycle(results, elapsed)
+            if once:
+                return
+            await asyncio.sleep(max(0, self.CYCLE_SECONDS - elapsed))
@@ -0,0 +1,98 @@
+import asyncio
+import importlib.util
+from typing import Dict, Optional, Tuple
+import httpx
+from django.conf import settings
+from telegram import Bot
+from telegram.request import BaseRequest, HTTPXRequest
+from .metrics import make_request
+
+# HTTP/2 в httpx потребує пакета h2 (httpx[http2] у requirements.txt); без нього - HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+# Скільки запит чекає вільного з'єднання в спільному пулі, с
+POOL_TIMEOUT = 10.0
+
+class SharedRequest(BaseRequest):
+    """Спільний пул з'єднань для кількох Bot.
+
+    Bot.shutdown() (і Application.shutdown()) закриває свої запити - тут це
+    нічого не робить, бо тим самим пулом користуються інші. Пул закриває
+    close_transport().
+    """
+
+    def __init__(self, request: HTTPXRequest):
+        self.request = request
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.request.read_timeout
+
+    async def initialize(self):
+        await self.request.initialize()
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, *args, **kwargs):
+        return await self.request.do_request(*args, **kwargs)
+
+def build_request(pool_size: Optional[int] = None) -> HTTPXRequest:
+    """HTTPXRequest з пулом keep-alive з'єднань (HTTP/2, якщо доступний)"""
+    pool_size = pool_size or settings.TELEGRAM_HTTP_POOL_SIZE
+    return make_request(
+        connection_pool_size=pool_size,
+        pool_timeout=POOL_TIMEOUT,
+        http_version='2' if settings.TELEGRAM_HTTP2 and HTTP2_AVAILABLE else '1.1',
+        httpx_kwargs={'limits': httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=settings.TELEGRAM_HTTP_KEEPALIVE,
+        )},
+    )
+
+# httpx-клієнт прив'язаний до циклу подій, тому пул і боти - окремі на кожен цикл
+_requests: Dict[asyncio.AbstractEventLoop, SharedRequest] = {}
+_bots: Dict[Tuple[asyncio.AbstractEventLoop, str, str], Bot] = {}
+
+def _forget_closed_loops():
+    """Записи циклів, завершених без close_transport() (напр. asyncio.run у потоці)"""
+    for loop in [loop for loop in _requests if loop.is_closed()]:
+        del _requests[loop]
+    for key in [key for key in _bots if key[0].is_closed()]:
+        del _bots[key]
+
+def shared_request() -> SharedRequest:
+    """Спільний пул з'єднань поточного циклу подій"""
+    loop = asyncio.get_running_loop()
+    request = _requests.get(loop)
+    if request is None:
+        _forget_closed_loops()
+        request = _requests[loop] = SharedRequest(build_request())
+    return request
+
+def get_bot(token: Optional[str] = None, api_url: Optional[str] = None) -> Bot:
+    """Bot для токена на спільному пулі; один на (токен, цикл подій)"""
+    token = token or settings.TELEGRAM_BOT_TOKEN
+    api_url = api_url or settings.TELEGRAM_API_URL
+    key = (asyncio.get_running_loop(), token, api_url)
+    bot = _bots.get(key)
+    if bot is None:
+        request = shared_request()
+        bot = _bots[key] = Bot(token=token, base_url=api_url, request=request, get_updates_request=request)
+    return bot
+
+async def close_transport():
+    """Закриття з'єднань поточного циклу подій - наприкінці роботи, до закриття циклу"""
+    loop = asyncio.get_running_loop()
+    for key in [key for key in _bots if key[0] is loop]:
+        del _bots[key]
+    request = _requests.pop(loop, None)
+    if request is not None:
+        await request.request.shutdown()
+
+async def closing_transport(awaitable):
+    """Для asyncio.run(...): після роботи закриває з'єднання, поки цикл ще живий"""
+    try:
+        return await awaitable
+    finally:
+        await close_transport()
@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from ..models import TelegramUser
+from .db_executor import run_db
+from .metrics import REGISTRY
+
+USER_CACHE_LOOKUPS = REGISTRY.counter(
+    'user_cache_lookups_total', 'Пошуки в кеші користувачів за джерелом відповіді', ['result'])
+USER_CACHE_LATENCY = REGISTRY.histogram(
+    'user_cache_lookup_seconds', 'Тривалість пошуку користувачів за джерелом', ['source'],
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5))
+USER_CACHE_ENTRIES = REGISTRY.gauge(
+    'user_cache_entries', 'Записів у локальному кеші користувачів')
+
+SHARED_KEY = 'tguser:{}'
+
+class CachedUser(NamedTuple):
+    """Поля TelegramUser, потрібні боту (без лічильників, що часто змінюються)"""
+    pk: int
+    user_id: int
+    username: Optional[str]
+    language: str
+    is_active: bool
+    in_chat: bool
+    referral_code: Optional[str]
+    referred_by_id: Optional[int]
+
+FIELDS = CachedUser._fields
+
+# Користувача немає в базі - теж відповідь, яку варто кешувати
+UNKNOWN = ()
+
+class UserCache:
+    """Обмежений кеш TelegramUser за Telegram id: LRU + TTL, опційно спільний рівень.
+
+    Локальний рівень - у пам'яті процесу, спільний - Django cache (Redis),
+    щоб кілька воркерів бота не ходили в базу за тим самим. Усі, хто змінює
+    користувачів, викликають invalidate_users(): запис зникає з локального
+    і спільного рівня. Локальні кеші інших процесів застаріють не довше, ніж
+    на ttl секунд.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60,
+                 shared: bool = False, shared_ttl: int = 600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[int, Tuple[float, Tuple]]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Росте з кожним invalidate: прочитане з бази до скидання не кешується
+        self._version = 0
+
+    def peek(self, user_id: int):
+        """Лише локальний рівень: запис, UNKNOWN або None (немає / застарів)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return value
+
+    def _store(self, values: Dict[int, Tuple], version: Optional[int] = None):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+            for user_id, value in values.items():
+                self._entries[user_id] = (expires, value)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            USER_CACHE_ENTRIES.set(len(self._entries))
+
+    def get_many(self, user_ids: Iterable[int], recheck_unknown: bool = False) -> Dict[int, Optional[CachedUser]]:
+        """user_id -> CachedUser (None - немає в базі). Синхронно: може йти в базу.
+
+        recheck_unknown: локальному "немає в базі" не вірити. Користувача міг
+        щойно створити інший процес - він скидає спільний рівень, але не
+        локальні кеші інших процесів.
+        """
+        started = time.perf_counter()
+        found: Dict[int, Tuple] = {}
+        missing = []
+        for user_id in set(user_ids):
+            value = self.peek(user_id)
+            if value is None or (recheck_unknown and value == UNKNOWN):
+                missing.append(user_id)
+            else:
+                found[user_id] = value
+        self.hits += len(found)
+        USER_CACHE_LOOKUPS.inc(len(found), result='hit')
+        USER_CACHE_LATENCY.observe(time.perf_counter() - started, source='local')
+
+        if missing and self.shared:
+            started = time.perf_counter()
+            keys = {SHARED_KEY.format(user_id): user_id for user_id in missing}
+            shared = {keys[key]: tuple(value) for key, value in cache.get_many(list(keys)).items()}
+            USER_CACHE_LATENCY.observe(time.perf_counter() - started, source='shared')
+            self.shared_hits += len(shared)
+            USER_CACHE_LOOKUPS.inc(len(shared), result='shared_hit')
+            self._store(shared)
+            found.update(shared)
+            missing = [user_id for user_id in missing if user_id not in shared]
+
+        if missing:
+            started = time.perf_counter()
+            version = self._version
+            loaded = {
+                row[1]: row
+                for row in TelegramUser.objects.filter(user_id__in=missing).values_list(*FIELDS)
+            }
+            loaded.update((user_id, UNKNOWN) for user_id in missing if user_id not in loaded)
+            USER_CACHE_LATENCY.observe(time.perf_counter() - started, source='db')
+            self.misses += len(missing)
+            USER_CACHE_LOOKUPS.inc(len(missing), result='miss')
+            self._store(loaded, version)
+            if self.shared and version == self._version:
+                cache.set_many({SHARED_KEY.format(user_id): value for user_id, value in loaded.items()},
+                               self.shared_ttl)
+            found.update(loaded)
+
+        return {user_id: CachedUser(*value) if value else None for user_id, value in found.items()}
+
+    def get(self, user_id: int, recheck_unknown: bool = False) -> Optional[CachedUser]:
+        return self.get_many([user_id], recheck_unknown)[user_id]
+
+    async def aget(self, user_id: int, recheck_unknown: bool = False) -> Optional[CachedUser]:
+        """get() для бота: локальне попадання без переходу в потік бази"""
+        started = time.perf_counter()
+        value = self.peek(user_id)
+        if value is not None and not (recheck_unknown and value == UNKNOWN):
+            self.hits += 1
+            USER_CACHE_LOOKUPS.inc(result='hit')
+            USER_CACHE_LATENCY.observe(time.perf_counter() - started, source='local')
+            return CachedUser(*value) if value else None
+        return await run_db(self.get, user_id, recheck_unknown)
+
+    def invalidate(self, user_ids: Iterable[int]):
+        user_ids = list(user_ids)
+        with self._lock:
+            self._version += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+            USER_CACHE_ENTRIES.set(len(self._entries))
+        if self.shared and user_ids:
+            cache.delete_many([SHARED_KEY.format(user_id) for user_id in user_ids])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        USER_CACHE_ENTRIES.set(0)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+_user_cache: Optional[UserCache] = None
+
+def user_cache() -> UserCache:
+    """Кеш користувачів процесу з налаштувань USER_CACHE_*"""
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserCache(
+            max_size=settings.USER_CACHE_SIZE,
+            ttl=settings.USER_CACHE_TTL,
+            shared=settings.USER_CACHE_SHARED,
+            shared_ttl=settings.USER_CACHE_SHARED_TTL,
+        )
+    return _user_cache
+
+def invalidate_users(user_ids: Iterable[int]):
+    """Скидання записів після зміни користувачів (write-through для всіх, хто пише)"""
+    user_cache().invalidate(user_ids)
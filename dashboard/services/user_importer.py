@@ -0,0 +1,220 @@
+import tempfile
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from ..models import TelegramUser
+from .dashboard_stats import invalidate_dashboard_stats
+from .json_stream import UserRecord
+from .referrals import recalculate_referral_counts
+from .registrations import forget_referral_codes
+from .user_cache import invalidate_users
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def parse_join_date(value) -> datetime:
+    if not value:
+        return timezone.now()
+    join_date = parse_datetime(value)
+    if join_date is None:
+        raise ValueError(f'Invalid join_date: {value}')
+    if timezone.is_naive(join_date):
+        join_date = timezone.make_aware(join_date)
+    return join_date
+
+class UserImporter:
+    """Імпорт користувачів пачками через upsert.
+
+    Кожна пачка - один INSERT ... ON CONFLICT (user_id) DO UPDATE і два SELECT
+    (хто вже існував і які pk отримали рядки). Реферальні зв'язки пачки
+    записуються одразу через bulk_update, якщо реферер уже в базі. Посилання
+    вперед (реферер далі у файлі) скидаються в тимчасовий файл і дописуються
+    після останньої пачки, тому пам'ять не залежить від розміру файлу.
+    """
+
+    CHUNK_SIZE = 2000
+    UPDATE_FIELDS = ['username', 'language', 'tokens', 'referral_code', 'join_date', 'is_active']
+    # Вище цього порогу referrals_count перераховується одним UPDATE для всіх
+    FULL_RECOUNT_THRESHOLD = 10000
+
+    def __init__(self, chunk_size: Optional[int] = None,
+                 referral_code: Optional[Callable[[int, Dict], Optional[str]]] = None,
+                 on_error: Optional[Callable[[str, Exception], None]] = None,
+                 on_chunk: Optional[Callable[[Dict[str, int]], None]] = None):
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        # За замовчуванням код береться з файлу (import_users), import_data генерує REF{user_id}
+        self.referral_code = referral_code or (lambda user_id, data: data.get('referral_code'))
+        self.on_error = on_error
+        self.on_chunk = on_chunk
+
+        self.affected_referrers = set()  # pk реферерів, яким треба перерахувати referrals_count
+        self.full_recount = False
+        self.spill = None  # нерозв'язані посилання: "user_id реферера pk користувача"
+
+    def error(self, user_id, exc: Exception):
+        if self.on_error:
+            self.on_error(str(user_id), exc)
+
+    def build_user(self, user_id: int, data: Dict) -> TelegramUser:
+        return TelegramUser(
+            user_id=user_id,
+            username=data.get('username'),
+            language=data.get('language', 'en'),
+            tokens=data.get('tokens', 5000),
+            referral_code=self.referral_code(user_id, data),
+            join_date=parse_join_date(data.get('join_date')),
+            is_active=True,
+        )
+
+    def run(self, records: Iterable[UserRecord]) -> Dict[str, int]:
+        results = {'created': 0, 'updated': 0, 'errors': 0, 'referrals': 0, 'missing_referrers': 0}
+        self.spill = tempfile.TemporaryFile(mode='w+', encoding='ascii')
+        try:
+            for chunk in chunked(records, self.chunk_size):
+                self.import_chunk(chunk, results)
+                if self.on_chunk:
+                    self.on_chunk(results)
+            self.link_forward_referrals(results)
+            self.recount_referrals()
+        finally:
+            self.spill.close()
+            self.spill = None
+        invalidate_dashboard_stats()
+        return results
+
+    def import_chunk(self, chunk: List[UserRecord], results: Dict[str, int]):
+        users = {}
+        referrals = {}
+        for raw_user_id, data in chunk:
+            try:
+                user_id = int(raw_user_id)
+                users[user_id] = self.build_user(user_id, data)
+                if data.get('referred_by'):
+                    referrals[user_id] = int(data['referred_by'])
+            except (TypeError, ValueError) as e:
+                self.error(raw_user_id, e)
+                results['errors'] += 1
+
+        if not users:
+            return
+
+        existing = set(
+            TelegramUser.objects.filter(user_id__in=list(users)).values_list('user_id', flat=True)
+        )
+        try:
+            with transaction.atomic():
+                TelegramUser.objects.bulk_create(
+                    list(users.values()),
+                    update_conflicts=True,
+                    unique_fields=['user_id'],
+                    update_fields=self.UPDATE_FIELDS,
+                )
+        except IntegrityError:
+            # Напр. дубльований referral_code - шукаємо винні рядки по одному
+            for user_id in self.upsert_one_by_one(list(users.values())):
+                users.pop(user_id)
+                referrals.pop(user_id, None)
+                results['errors'] += 1
+
+        results['created'] += len(users.keys() - existing)
+        results['updated'] += len(users.keys() & existing)
+        if referrals:
+            self.link_chunk_referrals(referrals, results)
+        invalidate_users(users)
+        forget_referral_codes(user.referral_code for user in users.values() if user.referral_code)
+
+    def upsert_one_by_one(self, users: List[TelegramUser]) -> List[int]:
+        """Повертає user_id рядків, які не вдалося записати"""
+        failed = []
+        for user in users:
+            try:
+                with transaction.atomic():
+                    TelegramUser.objects.bulk_create(
+                        [user],
+                        update_conflicts=True,
+                        unique_fields=['user_id'],
+                        update_fields=self.UPDATE_FIELDS,
+                    )
+            except IntegrityError as e:
+                self.error(user.user_id, e)
+                failed.append(user.user_id)
+        return failed
+
+    def link_chunk_referrals(self, referrals: Dict[int, int], results: Dict[str, int]):
+        """Зв'язки пачки: user_id -> pk одним запитом для користувачів і реферерів"""
+        rows = TelegramUser.objects.filter(
+            user_id__in=list(referrals.keys() | set(referrals.values()))
+        ).values_list('user_id', 'pk', 'referred_by_id')
+        user_pks = {}
+        for user_id, pk, referred_by_id in rows:
+            user_pks[user_id] = pk
+            if user_id in referrals and referred_by_id:
+                self.mark_affected(referred_by_id)
+
+        links = []
+        for user_id, referrer_id in referrals.items():
+            if referrer_id == user_id:
+                self.error(user_id, LookupError(f'User {user_id} refers to itself'))
+                results['missing_referrers'] += 1
+            elif referrer_id in user_pks:
+                links.append((user_pks[user_id], user_pks[referrer_id]))
+            else:
+                # Реферер, можливо, далі у файлі
+                self.spill.write(f'{referrer_id} {user_pks[user_id]} {user_id}\n')
+        self.write_links(links, results)
+
+    def link_forward_referrals(self, results: Dict[str, int]):
+        """Другий прохід по відкладених посиланнях, пачками з тимчасового файлу"""
+        self.spill.seek(0)
+        lines = (line.split() for line in self.spill)
+        for chunk in chunked(lines, self.chunk_size):
+            referrer_pks = dict(
+                TelegramUser.objects.filter(
+                    user_id__in={int(referrer_id) for referrer_id, _, _ in chunk}
+                ).values_list('user_id', 'pk')
+            )
+            links = []
+            for referrer_id, user_pk, user_id in chunk:
+                referrer_pk = referrer_pks.get(int(referrer_id))
+                if referrer_pk is None:
+                    self.error(user_id, LookupError(f'Referrer {referrer_id} not found'))
+                    results['missing_referrers'] += 1
+                    continue
+                links.append((int(user_pk), referrer_pk))
+            self.write_links(links, results)
+            invalidate_users(int(user_id) for _, _, user_id in chunk)
+
+    def write_links(self, links: List[Tuple[int, int]], results: Dict[str, int]):
+        TelegramUser.objects.bulk_update(
+            [TelegramUser(pk=user_pk, referred_by_id=referrer_pk) for user_pk, referrer_pk in links],
+            ['referred_by'],
+            batch_size=self.chunk_size,
+        )
+        for _, referrer_pk in links:
+            self.mark_affected(referrer_pk)
+        results['referrals'] += len(links)
+
+    def mark_affected(self, referrer_pk: int):
+        if self.full_recount:
+            return
+        self.affected_referrers.add(referrer_pk)
+        if len(self.affected_referrers) > self.FULL_RECOUNT_THRESHOLD:
+            self.full_recount = True
+            self.affected_referrers = set()
+
+    def recount_referrals(self):
+        if self.full_recount:
+            recalculate_referral_counts()
+        else:
+            for batch in chunked(self.affected_referrers, self.chunk_size):
+                recalculate_referral_counts(batch)
+        self.affected_referrers = set()
+        self.full_recount = False
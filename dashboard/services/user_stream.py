@@ -0,0 +1,33 @@
+import asyncio
+from typing import AsyncIterator, List, Optional, Sequence
+from django.db.models.query import QuerySet
+from ..models import TelegramUser
+
+async def iter_user_batches(queryset: QuerySet, batch_size: int = 1000,
+                            fields: Optional[Sequence[str]] = None) -> AsyncIterator[List[TelegramUser]]:
+    """Потокове читання користувачів пачками з keyset-пагінацією за pk.
+
+    Кожна пачка - окремий запит "pk > останній pk LIMIT batch_size", тому в
+    пам'яті одночасно лише одна пачка, незалежно від розміру аудиторії.
+    """
+    queryset = queryset.order_by('pk')
+    if fields:
+        queryset = queryset.only(*fields)
+
+    def fetch(after_pk: int) -> List[TelegramUser]:
+        return list(queryset.filter(pk__gt=after_pk)[:batch_size])
+
+    last_pk = 0
+    while True:
+        batch = await asyncio.to_thread(fetch, last_pk)
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_pk = batch[-1].pk
+
+async def iter_list_batches(users: Sequence[TelegramUser], batch_size: int) -> AsyncIterator[List[TelegramUser]]:
+    """Той самий інтерфейс для вже завантаженого списку"""
+    for i in range(0, len(users), batch_size):
+        yield list(users[i:i + batch_size])
@@ -0,0 +1,49 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .models import TelegramUser
+from .services.dashboard_stats import invalidate_dashboard_stats
+from .services.user_cache import invalidate_users
+
+@receiver(post_save, sender=TelegramUser)
+@receiver(post_delete, sender=TelegramUser)
+def telegram_user_changed(sender, **kwargs):
+    """Скидання кешу дашборду при зміні користувача.
+
+    bulk_create/bulk_update/update() сигналів не надсилають, тому сервіси,
+    що їх використовують, викликають invalidate_dashboard_stats() самі.
+    """
+    invalidate_dashboard_stats()
+
+@receiver(post_save, sender=TelegramUser)
+@receiver(post_delete, sender=TelegramUser)
+def forget_cached_user(sender, instance, **kwargs):
+    """Скидання запису в кеші користувачів бота (bulk-операції - див. invalidate_users)"""
+    invalidate_users([instance.user_id])
+
+def _change_referrals_count(user_pk, delta):
+    if user_pk is not None:
+        TelegramUser.objects.filter(pk=user_pk).update(referrals_count=F('referrals_count') + delta)
+
+@receiver(post_init, sender=TelegramUser)
+def remember_referrer(sender, instance, **kwargs):
+    """Запам'ятовуємо завантаженого реферера, щоб після save знати, чи він змінився"""
+    # Через __dict__, щоб не завантажувати відкладене (.only()) поле окремим запитом
+    instance._loaded_referred_by_id = instance.__dict__.get('referred_by_id')
+
+@receiver(post_save, sender=TelegramUser)
+def update_referrals_count_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Підтримка referrals_count реферера при зміні referred_by"""
+    if update_fields is not None and 'referred_by' not in update_fields:
+        return
+
+    old_referrer = None if created else instance._loaded_referred_by_id
+    new_referrer = instance.referred_by_id
+    if old_referrer != new_referrer:
+        _change_referrals_count(old_referrer, -1)
+        _change_referrals_count(new_referrer, 1)
+    instance._loaded_referred_by_id = new_referrer
+
+@receiver(post_delete, sender=TelegramUser)
+def update_referrals_count_on_delete(sender, instance, **kwargs):
+    _change_referrals_count(instance.referred_by_id, -1)
@@ -0,0 +1,155 @@
+import json
+import time
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .models import Statistics, TelegramUser, UserActivity, UserActivityArchive
+from .services.activity_storage import compact_activity
+from .services.dashboard_stats import compute_dashboard_stats, get_dashboard_stats
+from .services.progress import ProgressTracker, new_task_id
+from .services.statistics_snapshot import build_snapshots
+
+class DashboardQueriesTest(TestCase):
+    """Регресія кількості запитів дашборду: вона не має залежати від кількості користувачів"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        users = []
+        for i in range(1, 61):
+            joined = now - timedelta(days=i % 10)
+            users.append(TelegramUser(
+                user_id=i,
+                language=['en', 'ru', 'ua'][i % 3],
+                join_date=joined,
+                is_active=i % 5 != 0,
+                deleted_bot_at=joined + timedelta(hours=1) if i % 5 == 0 else None,
+                in_chat=i % 2 == 0,
+            ))
+        TelegramUser.objects.bulk_create(users)
+        referrer = TelegramUser.objects.get(user_id=1)
+        TelegramUser.objects.filter(user_id__in=[2, 3, 4]).update(referred_by=referrer)
+        TelegramUser.objects.filter(pk=referrer.pk).update(referrals_count=3)
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stats_queries(self):
+        with self.assertNumQueries(4):
+            stats = compute_dashboard_stats()
+        self.assertEqual(stats['total_users'], 60)
+        self.assertEqual(stats['active_users'], 48)
+        self.assertEqual(stats['chat_stats'], {'in_chat': 30, 'not_in_chat': 30})
+        self.assertEqual(len(stats['daily_activity']), 7)
+        self.assertEqual(stats['referral_stats'][0]['refs_count'], 3)
+
+    def test_stats_are_cached(self):
+        with self.assertNumQueries(4):
+            get_dashboard_stats()
+        with self.assertNumQueries(0):
+            get_dashboard_stats()
+
+    def test_stats_queries_do_not_grow_with_users(self):
+        TelegramUser.objects.bulk_create([TelegramUser(user_id=1000 + i) for i in range(200)])
+        with self.assertNumQueries(4):
+            compute_dashboard_stats()
+
+    def test_dashboard_view_queries(self):
+        self.client.force_login(self.admin)
+        url = reverse('dashboard:index')
+        # Сесія і користувач + статистика
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # Зі статистикою з кешу - лише сесія і користувач
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+class SnapshotAfterCompactionTest(TestCase):
+    """Бекфіл Statistics після compact_activity: видалені події враховуються з DailyActivityRollup"""
+
+    FIELDS = ['date', 'total_bot_users', 'webapp_opens', 'chat_members', 'ru_users', 'ua_users', 'en_users']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.now()
+        cls.today = timezone.localdate(cls.now)
+        users = TelegramUser.objects.bulk_create([
+            TelegramUser(user_id=i, language='ua', join_date=cls.now - timedelta(days=60)) for i in range(1, 11)
+        ])
+        events = []
+        # 45 днів тому - видаляться, 20 днів тому - підуть в архів
+        for days_ago in (45, 20):
+            events += [(user, 'webapp_open', days_ago) for user in users]
+            events += [(user, 'join_chat', days_ago) for user in users[:3]]
+            events.append((users[0], 'leave_chat', days_ago))
+        created = UserActivity.objects.bulk_create(
+            [UserActivity(user=user, action_type=action_type) for user, action_type, _ in events]
+        )
+        for activity, (_, _, days_ago) in zip(created, events):
+            UserActivity.objects.filter(pk=activity.pk).update(created_at=cls.now - timedelta(days=days_ago))
+
+    def backfill(self, days_back):
+        build_snapshots(self.today - timedelta(days=days_back), self.today - timedelta(days=1))
+        return list(Statistics.objects.order_by('date').values(*self.FIELDS))
+
+    def compact(self):
+        compact_activity(
+            archive_after=timedelta(days=10), keep_raw=timedelta(days=30),
+            keep_hourly=timedelta(days=30), now=self.now,
+        )
+
+    def test_backfill_is_unchanged_by_compaction(self):
+        before = self.backfill(50)
+        self.assertEqual(before[-1]['webapp_opens'], 20)
+        self.assertEqual(before[-1]['chat_members'], 4)
+
+        self.compact()
+        self.assertFalse(UserActivity.objects.exists())
+        self.assertEqual(UserActivityArchive.objects.count(), 14)
+        self.assertEqual(self.backfill(50), before)
+
+    def test_baseline_counts_dropped_events(self):
+        # Без попереднього рядка перший день рахується повністю - разом із видаленими подіями
+        before = self.backfill(40)
+        Statistics.objects.all().delete()
+        self.compact()
+        self.assertEqual(self.backfill(40), before)
+        self.assertEqual(before[0]['webapp_opens'], 10)
+
+class ProgressStreamTest(TestCase):
+    """Перша SSE-подія приходить одразу - і під WSGI, і під ASGI"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def setUp(self):
+        self.tracker = ProgressTracker(new_task_id('status'), 'status', 'Перевірка', total=10)
+        self.url = reverse('admin:task_progress_stream', args=[self.tracker.task_id])
+
+    def first_event(self, chunk):
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        self.assertTrue(chunk.startswith('data: '))
+        return json.loads(chunk[len('data: '):])
+
+    def test_first_event_under_wsgi(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url)
+        started = time.monotonic()
+        state = self.first_event(next(iter(response.streaming_content)))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(state['status'], 'running')
+        response.close()
+
+    async def test_first_event_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(self.url)
+        started = time.monotonic()
+        state = self.first_event(await anext(aiter(response.streaming_content)))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(state['id'], self.tracker.task_id)
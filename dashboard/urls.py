@@ -5,4 +5,7 @@ app_name = 'dashboard'
 
 urlpatterns = [
     path('', views.dashboard, name='index'),
-]
\ No newline at end of file
+    path('charts/data', views.chart_data, name='chart_data'),
+    path('metrics', views.metrics, name='metrics'),
+    path('telegram/webhook', views.telegram_webhook, name='telegram_webhook'),
+]
@@ -1,66 +1,87 @@
+import hmac
+import json
+import logging
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from .models import TelegramUser, Statistics
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Count, Q
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .services.bot_app import enqueue_update, webhook_application
+from .services.dashboard_stats import get_dashboard_stats
+from .services.metrics import REGISTRY, collect_snapshots, render_prometheus
+from .services.rollups import chart_series
+
+logger = logging.getLogger(__name__)
 
 @login_required
 def dashboard(request):
-    today = timezone.now().date()
-    yesterday = today - timedelta(days=1)
-    week_ago = today - timedelta(days=7)
+    # Всі лічильники рахуються кількома агрегатними запитами і кешуються
+    context = get_dashboard_stats()
+
+    return render(request, 'dashboard/index.html', context)
 
-    # Активні користувачі (ті, хто не видалив бота)
-    active_users = TelegramUser.objects.filter(is_active=True).count()
+@login_required
+def chart_data(request):
+    """Дані графіків з таблиць агрегатів: ?days=90&granularity=day|hour"""
+    try:
+        days = int(request.GET.get('days', 90))
+    except ValueError:
+        days = 90
+    granularity = 'hour' if request.GET.get('granularity') == 'hour' else 'day'
+    return JsonResponse(chart_series(days, granularity))
 
-    # Нові користувачі за сьогодні
-    new_users_today = TelegramUser.objects.filter(
-        join_date__date=today
-    ).count()
+def metrics(request):
+    """Метрики всіх процесів у текстовому форматі Prometheus"""
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponse(status=401)
+    elif not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse(status=403)
 
-    # Видалені користувачі за сьогодні
-    deleted_users_today = TelegramUser.objects.filter(
-        deleted_bot_at__date=today
-    ).count()
+    if not REGISTRY.enabled:
+        return HttpResponse('Metrics are disabled (METRICS_ENABLED)\n', status=404, content_type='text/plain')
 
-    # Активність за останні 7 днів
-    daily_activity = []
-    for i in range(7):
-        day = today - timedelta(days=i)
-        new_users = TelegramUser.objects.filter(join_date__date=day).count()
-        deleted_users = TelegramUser.objects.filter(deleted_bot_at__date=day).count()
-        daily_activity.append({
-            'date': day,
-            'new_users': new_users,
-            'deleted_users': deleted_users,
-        })
+    return HttpResponse(
+        render_prometheus(collect_snapshots()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
 
-    # Статистика по мовах
-    language_stats = TelegramUser.objects.values('language').annotate(
-        count=Count('id')
-    ).order_by('-count')
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request):
+    """Оновлення від Telegram: перевірка секрету і постановка в чергу бота.
 
-    # Статистика по чату
-    chat_stats = {
-        'in_chat': TelegramUser.objects.filter(in_chat=True).count(),
-        'not_in_chat': TelegramUser.objects.filter(in_chat=False).count(),
-    }
+    Відповідь не чекає обробки. Повна черга - 503, і Telegram повторить
+    оновлення пізніше. На прийняте (200) оновлення Telegram не повторить:
+    доставка не більше одного разу. Під час зупинки сервера черга
+    дообробляється в lifespan (telegram_admin.asgi); якщо процес убито,
+    прийняті, але не оброблені оновлення втрачаються.
+    """
+    if not settings.TELEGRAM_WEBHOOK_SECRET:
+        return HttpResponse(status=404)
+    secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(secret, settings.TELEGRAM_WEBHOOK_SECRET):
+        return HttpResponse(status=403)
+    if not isinstance(request, ASGIRequest):
+        # Під WSGI цикл подій живе лише до кінця запиту - черга б загубилась
+        logger.error("Webhook потребує ASGI-сервера (telegram_admin.asgi)")
+        return HttpResponse(status=503)
 
-    # Статистика рефералів
-    referral_stats = TelegramUser.objects.filter(referrals__isnull=False).annotate(
-        refs_count=Count('referrals')
-    ).order_by('-refs_count')[:5]
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return HttpResponse(status=400)
+    if not isinstance(data, dict):
+        return HttpResponse(status=400)
 
-    context = {
-        'active_users': active_users,
-        'new_users_today': new_users_today,
-        'deleted_users_today': deleted_users_today,
-        'daily_activity': daily_activity,
-        'language_stats': language_stats,
-        'chat_stats': chat_stats,
-        'referral_stats': referral_stats,
-        'total_users': TelegramUser.objects.count(),
-    }
-    
-    return render(request, 'dashboard/index.html', context)
\ No newline at end of file
+    application = await webhook_application()
+    try:
+        accepted = enqueue_update(application, data)
+    except (KeyError, TypeError, ValueError):
+        return HttpResponse(status=400)
+    if not accepted:
+        return HttpResponse(status=503, headers={'Retry-After': '1'})
+    return HttpResponse()
@@ -1,11 +1,44 @@
 """
 ASGI config for telegram_admin project.
+
+Django сам не обробляє повідомлення lifespan, тому application - обгортка:
+під час зупинки сервера (uvicorn, hypercorn) вона дообробляє прийняті
+webhook-оновлення і зупиняє бота. Сервер має працювати з увімкненим
+lifespan (у uvicorn - за замовчуванням, --lifespan auto).
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'telegram_admin.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+django_application = get_asgi_application()
+
+from dashboard.services.bot_app import stop_webhook_application  # noqa: E402 - після налаштування Django
+
+logger = logging.getLogger(__name__)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Бот стартує з першим оновленням (webhook_application)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            try:
+                # Оновлення, на які вже відповіли 200, Telegram не повторить
+                await stop_webhook_application()
+            except Exception as e:
+                logger.exception("Помилка зупинки webhook-обробника")
+                await send({'type': 'lifespan.shutdown.failed', 'message': str(e)})
+            else:
+                await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    else:
+        await django_application(scope, receive, send)
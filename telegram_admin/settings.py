@@ -68,6 +68,25 @@ DATABASES = {
     }
 }
 
+# Cache (Redis, якщо заданий REDIS_URL - тоді кеш спільний для всіх процесів)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Скільки секунд кешувати статистику дашборду
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 60))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -107,4 +126,53 @@ LOGIN_REDIRECT_URL = 'dashboard:index'
 # Telegram Bot settings
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', None)
 if TELEGRAM_BOT_TOKEN is None:
-    raise ValueError("TELEGRAM_BOT_TOKEN не знайдено в змінних середовища")
\ No newline at end of file
+    raise ValueError("TELEGRAM_BOT_TOKEN не знайдено в змінних середовища")
+
+# Адреса Bot API (можна вказати локальний Bot API сервер)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
+
+# Чат, участь у якому перевіряється (@username або числовий id)
+TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '@daodrophelper')
+
+# Додаткові токени ботів-адмінів чату для get_chat_member (через кому).
+# Кожен токен має власний ліміт запитів, тому перевірка чату розподіляється між ними
+TELEGRAM_CHECKER_TOKENS = [
+    token.strip() for token in os.getenv('TELEGRAM_CHECKER_TOKENS', '').split(',') if token.strip()
+]
+
+# Службовий чат (бот - адмін), куди фото розсилки завантажується один раз,
+# щоб далі відправляти його за file_id. Без нього file_id береться з першої відправки
+TELEGRAM_MEDIA_CACHE_CHAT_ID = os.getenv('TELEGRAM_MEDIA_CACHE_CHAT_ID') or None
+
+# Webhook: Telegram надсилає оновлення на TELEGRAM_WEBHOOK_URL (.../telegram/webhook)
+# із секретом у заголовку X-Telegram-Bot-Api-Secret-Token. Без секрету webhook вимкнений
+TELEGRAM_WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL') or None
+TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET') or None
+# Скільки прийнятих оновлень може чекати обробки (далі 503 - Telegram повторить пізніше)
+TELEGRAM_WEBHOOK_QUEUE_SIZE = int(os.getenv('TELEGRAM_WEBHOOK_QUEUE_SIZE', 1000))
+
+# Скільки оновлень бот обробляє одночасно (від одного користувача - завжди по черзі)
+TELEGRAM_BOT_CONCURRENCY = int(os.getenv('TELEGRAM_BOT_CONCURRENCY', 32))
+# Потоки для запитів до бази з бота; кожен тримає своє з'єднання,
+# тож це і кількість з'єднань бота з базою
+BOT_DB_THREADS = int(os.getenv('BOT_DB_THREADS', 8))
+
+# Спільний пул HTTP-з'єднань до Bot API для бота, розсилок і перевірок статусів:
+# максимум з'єднань, скільки секунд тримати простоююче з'єднання, HTTP/2 (якщо встановлено h2)
+TELEGRAM_HTTP_POOL_SIZE = int(os.getenv('TELEGRAM_HTTP_POOL_SIZE', 256))
+TELEGRAM_HTTP_KEEPALIVE = float(os.getenv('TELEGRAM_HTTP_KEEPALIVE', 60))
+TELEGRAM_HTTP2 = os.getenv('TELEGRAM_HTTP2', '1').lower() in ('1', 'true', 'yes')
+
+# Кеш користувачів бота за Telegram id: розмір (LRU) і час життя запису, с.
+# Спільний рівень через CACHES має сенс лише з Redis, тому за замовчуванням - з REDIS_URL
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+USER_CACHE_SHARED = os.getenv('USER_CACHE_SHARED', '1' if REDIS_URL else '').lower() in ('1', 'true', 'yes')
+USER_CACHE_SHARED_TTL = int(os.getenv('USER_CACHE_SHARED_TTL', 600))
+
+# Метрики у форматі Prometheus (/metrics). Вимкнені - хуки нічого не роблять
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+# Токен для збирача метрик (Authorization: Bearer ...); без нього - лише для staff
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or None
+# Як часто бот, воркер і планувальник публікують свої метрики в кеш, с
+METRICS_PUBLISH_INTERVAL = int(os.getenv('METRICS_PUBLISH_INTERVAL', 15))